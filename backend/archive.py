@@ -0,0 +1,410 @@
+"""Archive of old contact submissions in compressed, date-partitioned JSONL segments.
+
+Submissions matching the archive policy (one of some statuses, older than a
+cutoff) are written to segment files under <directory>/<YYYY-MM-DD>/, one
+directory per day of submitted_at, and then deleted from contact_submissions.
+Each segment has a sidecar .idx.json with its day, record count, time range and
+ids, which is all a lookup needs to pick the segments worth decompressing. Only
+the day, count and time range are held in memory; ids are read from the
+sidecars of the days a lookup concerns.
+
+Segments are written, fsynced and renamed into place before anything is
+deleted, and ids already archived are not written twice, so an archive run
+interrupted at any point can simply run again.
+"""
+import argparse
+import asyncio
+import fcntl
+import gzip
+import heapq
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Set
+
+from bson import json_util
+
+from submissions import EXPORT_SORT, SUBMISSION_PROJECTION, _naive_utc
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional, gzip needs nothing
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Segment file suffix per codec
+CODECS = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+SIDECAR_SUFFIX = ".idx.json"
+LOCK_FILE = ".archiver.lock"
+
+
+def _sort_key(doc: Dict[str, Any]):
+    return doc["submitted_at"], doc["id"]
+
+
+def _row(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """An archived document cut down to the fields listings serve"""
+    return {field: doc[field] for field in SUBMISSION_PROJECTION if field in doc}
+
+
+def _day(doc: Dict[str, Any]) -> str:
+    return doc["submitted_at"].date().isoformat()
+
+
+class Sidecar:
+    """What the index says about one segment, without its ids, which stay on disk"""
+
+    __slots__ = ("path", "segment", "codec", "day", "count", "first", "last")
+
+    def __init__(self, path: Path, segment: Path, codec: str, day: str, count: int, first: datetime, last: datetime):
+        self.path = path
+        self.segment = segment
+        self.codec = codec
+        self.day = day
+        self.count = count
+        self.first = first
+        self.last = last
+
+    @classmethod
+    def load(cls, path: Path) -> "Sidecar":
+        data = json.loads(path.read_bytes())
+        return cls(
+            path,
+            path.with_name(data["segment"]),
+            data["codec"],
+            data["day"],
+            data["count"],
+            datetime.fromisoformat(data["first"]),
+            datetime.fromisoformat(data["last"]),
+        )
+
+    def ids(self) -> FrozenSet[str]:
+        """The ids in the segment, read from the sidecar file"""
+        return frozenset(json.loads(self.path.read_bytes())["ids"])
+
+    def dumps(self, ids: Iterable[str]) -> bytes:
+        return json.dumps({
+            "segment": self.segment.name,
+            "codec": self.codec,
+            "day": self.day,
+            "count": self.count,
+            "first": self.first.isoformat(),
+            "last": self.last.isoformat(),
+            "ids": sorted(ids),
+        }).encode()
+
+    def overlaps(self, since: Optional[datetime], until: Optional[datetime]) -> bool:
+        return (since is None or self.last >= since) and (until is None or self.first < until)
+
+
+def _write_atomically(path: Path, data: bytes):
+    temporary = path.with_name(path.name + ".tmp")
+    with open(temporary, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+class SubmissionArchive:
+    """Segments and their sidecars under directory
+
+    What the sidecars say about every segment, apart from the ids, is kept in
+    memory and rescanned at most every rescan_interval seconds, so segments
+    written by another process show up without a restart. The methods below run
+    in worker threads, so that state is only touched under a lock.
+    """
+
+    def __init__(self, directory: Path, codec: str = "gzip", rescan_interval: float = 5.0):
+        if codec not in CODECS:
+            raise ValueError(f"Archive codec must be one of {sorted(CODECS)}, not {codec!r}")
+        if codec == "zstd" and zstandard is None:
+            raise ValueError("The zstd archive codec needs the zstandard package")
+        self.directory = Path(directory)
+        self.codec = codec
+        self.rescan_interval = rescan_interval
+        self._sidecars: Dict[Path, Sidecar] = {}
+        self._scanned_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    # Everything below does blocking file I/O; callers on the event loop use to_thread
+
+    def sidecars(self) -> List[Sidecar]:
+        """Every segment's sidecar, oldest day first"""
+        with self._lock:
+            now = time.monotonic()
+            if self._scanned_at is None or now - self._scanned_at >= self.rescan_interval:
+                self._scan()
+                self._scanned_at = now
+            sidecars = list(self._sidecars.values())
+        return sorted(sidecars, key=lambda sidecar: (sidecar.day, sidecar.segment.name))
+
+    def _of_day(self, day: Optional[str]) -> List[Sidecar]:
+        return [sidecar for sidecar in self.sidecars() if day is None or sidecar.day == day]
+
+    def _scan(self):
+        found = set(self.directory.glob(f"*/*{SIDECAR_SUFFIX}")) if self.directory.is_dir() else set()
+        for path in list(self._sidecars):
+            if path not in found:
+                del self._sidecars[path]
+        for path in found - self._sidecars.keys():
+            try:
+                self._sidecars[path] = Sidecar.load(path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Skipping unreadable archive index {path}: {str(e)}")
+
+    def day_ids(self, day: str) -> Set[str]:
+        """Every id archived for day (a submitted_at date, YYYY-MM-DD)"""
+        ids: Set[str] = set()
+        for sidecar in self._of_day(day):
+            ids |= sidecar.ids()
+        return ids
+
+    def archived(self, docs: Iterable[Dict[str, Any]]) -> Set[str]:
+        """The ids of docs already in the archive; only the sidecars of their days are read"""
+        by_day: Dict[str, Set[str]] = {}
+        for doc in docs:
+            by_day.setdefault(_day(doc), set()).add(doc["id"])
+        return {submission_id for day, ids in by_day.items() for submission_id in ids & self.day_ids(day)}
+
+    def contains(self, submission_id: str, day: Optional[str] = None) -> bool:
+        return any(submission_id in sidecar.ids() for sidecar in self._of_day(day))
+
+    def write(self, docs: Sequence[Dict[str, Any]]) -> List[Sidecar]:
+        """Write docs as one new segment per day and return their sidecars"""
+        by_day: Dict[str, List[Dict[str, Any]]] = {}
+        for doc in docs:
+            by_day.setdefault(_day(doc), []).append(doc)
+        written = []
+        for day, day_docs in sorted(by_day.items()):
+            written.append(self._write_segment(day, sorted(day_docs, key=_sort_key)))
+        return written
+
+    def _write_segment(self, day: str, docs: List[Dict[str, Any]]) -> Sidecar:
+        folder = self.directory / day
+        folder.mkdir(parents=True, exist_ok=True)
+        name = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        segment = folder / f"{name}{CODECS[self.codec]}"
+        data = b"".join(json_util.dumps(doc).encode() + b"\n" for doc in docs)
+        if self.codec == "zstd":
+            data = zstandard.ZstdCompressor(level=10).compress(data)
+        else:
+            data = gzip.compress(data, compresslevel=6, mtime=0)
+        _write_atomically(segment, data)
+        path = folder / f"{name}{SIDECAR_SUFFIX}"
+        sidecar = Sidecar(path, segment, self.codec, day, len(docs), docs[0]["submitted_at"], docs[-1]["submitted_at"])
+        # The sidecar goes last: a segment without one is invisible to readers
+        _write_atomically(path, sidecar.dumps(doc["id"] for doc in docs))
+        with self._lock:
+            self._sidecars[path] = sidecar
+        return sidecar
+
+    def remove(self, docs: Iterable[Dict[str, Any]]):
+        """Rewrite every segment holding one of docs without it"""
+        by_day: Dict[str, Set[str]] = {}
+        for doc in docs:
+            by_day.setdefault(_day(doc), set()).add(doc["id"])
+        for day, ids in by_day.items():
+            for sidecar in self._of_day(day):
+                if sidecar.ids().isdisjoint(ids):
+                    continue
+                kept = [doc for doc in self.read(sidecar) if doc["id"] not in ids]
+                if kept:
+                    self._write_segment(sidecar.day, kept)
+                self._delete(sidecar)
+
+    def _delete(self, sidecar: Sidecar):
+        sidecar.path.unlink(missing_ok=True)
+        sidecar.segment.unlink(missing_ok=True)
+        with self._lock:
+            self._sidecars.pop(sidecar.path, None)
+
+    def read(self, sidecar: Sidecar) -> Iterator[Dict[str, Any]]:
+        """The documents in one segment, oldest first, decompressed as they are read"""
+        if sidecar.codec == "zstd":
+            with open(sidecar.segment, "rb") as raw:
+                reader = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw))
+                for line in reader:
+                    yield json_util.loads(line)
+        else:
+            with gzip.open(sidecar.segment, "rb") as f:
+                for line in f:
+                    yield json_util.loads(line)
+
+    def find(self, submission_id: str, day: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """One archived submission; without its day every sidecar is read"""
+        for sidecar in self._of_day(day):
+            if submission_id in sidecar.ids():
+                for doc in self.read(sidecar):
+                    if doc["id"] == submission_id:
+                        return _row(doc)
+        return None
+
+    def scan(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> Iterator[Dict[str, Any]]:
+        """Archived submissions in [since, until) as listing rows, oldest first
+
+        Segments of the same day written by different runs are merged, so the
+        order is the export order however the archive was built.
+        """
+        since = since and _naive_utc(since)
+        until = until and _naive_utc(until)
+        day_segments: Dict[str, List[Sidecar]] = {}
+        for sidecar in self.sidecars():
+            if sidecar.overlaps(since, until):
+                day_segments.setdefault(sidecar.day, []).append(sidecar)
+        for day in sorted(day_segments):
+            for doc in heapq.merge(*(self.read(sidecar) for sidecar in day_segments[day]), key=_sort_key):
+                if (since is None or doc["submitted_at"] >= since) and (until is None or doc["submitted_at"] < until):
+                    yield _row(doc)
+
+    async def iter_scan(
+        self, since: Optional[datetime] = None, until: Optional[datetime] = None, batch_size: int = 500
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """scan() for the event loop: batches are decompressed in a worker thread"""
+        docs = self.scan(since, until)
+        while True:
+            batch = await asyncio.to_thread(_take, docs, batch_size)
+            for doc in batch:
+                yield doc
+            if len(batch) < batch_size:
+                return
+
+
+def _take(iterator: Iterator, count: int) -> list:
+    batch = []
+    for item in iterator:
+        batch.append(item)
+        if len(batch) == count:
+            break
+    return batch
+
+
+class Archiver:
+    """Move submissions that match the policy from the collection into the archive
+
+    Only one process archives at a time; the others skip their run while the
+    lock file is held.
+    """
+
+    def __init__(
+        self,
+        collection,
+        archive: SubmissionArchive,
+        statuses: Sequence[str] = ("resolved",),
+        after_days: float = 180,
+        batch_size: int = 1000,
+        interval: float = 3600.0,
+        clock: Callable[[], datetime] = datetime.utcnow,
+    ):
+        self.collection = collection
+        self.archive = archive
+        self.statuses = list(statuses)
+        self.after_days = after_days
+        self.batch_size = batch_size
+        self.interval = interval
+        self.clock = clock
+        self._task: Optional[asyncio.Task] = None
+
+    def policy(self) -> Dict[str, Any]:
+        """Filter for the submissions due for the archive now"""
+        cutoff = self.clock() - timedelta(days=self.after_days)
+        return {"status": {"$in": self.statuses}, "submitted_at": {"$lt": cutoff}}
+
+    async def run_once(self) -> int:
+        """Archive everything due; returns how many submissions left the collection"""
+        self.archive.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.archive.directory / LOCK_FILE, "a") as lock:
+            try:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return 0
+            moved = 0
+            while True:
+                batch_moved = await self._move_batch()
+                moved += batch_moved
+                if not batch_moved:
+                    break
+        if moved:
+            logger.info(f"Archived {moved} contact submissions")
+        return moved
+
+    async def _move_batch(self) -> int:
+        policy = self.policy()
+        batch = await (
+            self.collection.find(policy, {"_id": 0}).sort(EXPORT_SORT).limit(self.batch_size).to_list(self.batch_size)
+        )
+        if not batch:
+            return 0
+        archived = await asyncio.to_thread(self.archive.archived, batch)
+        fresh = [doc for doc in batch if doc["id"] not in archived]
+        if fresh:
+            await asyncio.to_thread(self.archive.write, fresh)
+        ids = [doc["id"] for doc in batch]
+        # Re-checking the policy leaves anything whose status changed meanwhile in the collection
+        result = await self.collection.delete_many({**policy, "id": {"$in": ids}})
+        if result.deleted_count < len(ids):
+            remaining = await self.collection.find({"id": {"$in": ids}}, {"_id": 0, "id": 1}).to_list(None)
+            if remaining:
+                # The collection's copy is current; drop every archived copy, including
+                # one written by an earlier, interrupted run
+                kept = {doc["id"] for doc in remaining}
+                await asyncio.to_thread(self.archive.remove, [doc for doc in batch if doc["id"] in kept])
+        return result.deleted_count
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Error archiving contact submissions: {str(e)}")
+
+
+async def _run_from_env():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        db = client[os.environ['DB_NAME']]
+        archiver = Archiver(
+            db.contact_submissions,
+            SubmissionArchive(Path(os.environ['ARCHIVE_DIR']), os.environ.get('ARCHIVE_CODEC', 'gzip')),
+            statuses=os.environ.get('ARCHIVE_STATUSES', 'resolved').split(','),
+            after_days=float(os.environ.get('ARCHIVE_AFTER_DAYS', '180')),
+        )
+        print(f"Archived {await archiver.run_once()} contact submissions")
+    finally:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old contact submissions into the archive")
+    parser.add_argument("command", choices=["run"])
+    parser.parse_args()
+    asyncio.run(_run_from_env())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""Bulk import of contact submissions from NDJSON or CSV uploads.
+
+The upload is parsed as it arrives. Rows are validated and collected into
+batches, and each batch is written with one unordered insert_many before more of
+the body is read, so memory depends on the batch size and the longest row, not
+on the size of the upload. Rows that cannot be read, fail validation or are
+refused by Mongo are reported by row number while the rest are imported.
+"""
+import codecs
+import csv
+import io
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import orjson
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+DUPLICATE_KEY = 11000
+
+# Longest NDJSON line or CSV record accepted, in bytes (characters for CSV)
+MAX_ROW_BYTES = 64 * 1024
+
+
+class RowError(ValueError):
+    """One row could not be read; the import carries on with the next"""
+
+
+class UploadError(ValueError):
+    """The upload cannot be read any further, e.g. a CSV without the required columns"""
+
+
+class ImportReport:
+    """Counts for the whole import and the first max_errors rows that were not imported"""
+
+    def __init__(self, max_errors: int = 1000):
+        self.max_errors = max_errors
+        self.imported = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.truncated = False
+
+    def _note(self, error: Dict[str, Any]):
+        if len(self.errors) < self.max_errors:
+            self.errors.append(error)
+        else:
+            self.truncated = True
+
+    def reject(self, row: int, detail: Any):
+        self.failed += 1
+        self._note({"row": row, "error": "invalid", "detail": detail})
+
+    def duplicate(self, row: int, submission_id: Optional[str]):
+        self.duplicates += 1
+        self._note({"row": row, "error": "duplicate", "id": submission_id})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "imported": self.imported,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.truncated,
+        }
+
+
+def _parse_json_row(line: bytes) -> Any:
+    try:
+        row = orjson.loads(line)
+    except orjson.JSONDecodeError:
+        return RowError("Invalid JSON")
+    if not isinstance(row, dict):
+        return RowError("Expected a JSON object")
+    return row
+
+
+async def ndjson_rows(
+    chunks: AsyncIterable[bytes], max_row_bytes: int = MAX_ROW_BYTES
+) -> AsyncIterator[Tuple[int, Any]]:
+    """(line number, object or RowError) for each non-blank line of an NDJSON body"""
+    pending = bytearray()
+    line_number = 0
+    oversized = False
+    async for chunk in chunks:
+        pending += chunk
+        start = 0
+        while True:
+            end = pending.find(b"\n", start)
+            if end < 0:
+                break
+            line_number += 1
+            if oversized:
+                # The rest of a line already reported as too long
+                oversized = False
+            elif pending[start:end].strip():
+                yield line_number, _parse_json_row(pending[start:end])
+            start = end + 1
+        del pending[:start]
+        if len(pending) > max_row_bytes and not oversized:
+            yield line_number + 1, RowError(f"Row longer than {max_row_bytes} bytes")
+            oversized = True
+        if oversized:
+            pending.clear()
+    if pending.strip() and not oversized:
+        yield line_number + 1, _parse_json_row(pending)
+
+
+def _complete_records(text: str) -> int:
+    """Length of the longest prefix of text made of whole CSV records
+
+    A newline ends a record unless it is inside a quoted field, which is the
+    case when an odd number of quotes precedes it within the record.
+    """
+    boundary = position = 0
+    quoted = False
+    while True:
+        end = text.find("\n", position)
+        if end < 0:
+            return boundary
+        quoted ^= text.count('"', position, end) % 2 == 1
+        position = end + 1
+        if not quoted:
+            boundary = position
+
+
+async def csv_rows(
+    chunks: AsyncIterable[bytes], required: Sequence[str] = (), max_row_bytes: int = MAX_ROW_BYTES
+) -> AsyncIterator[Tuple[int, Any]]:
+    """(record number, dict or RowError) for each data record of a CSV body with a header
+
+    Records are numbered from 2, the header being 1, so they match spreadsheet
+    rows for files without line breaks inside fields.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    header: Optional[List[str]] = None
+    record_number = 0
+    pending = ""
+    final = False
+    chunks = aiter(chunks)
+    while not final:
+        try:
+            text = pending + decoder.decode(await anext(chunks))
+            boundary = _complete_records(text)
+        except StopAsyncIteration:
+            text = pending + decoder.decode(b"", final=True)
+            boundary = len(text)
+            final = True
+        pending = text[boundary:]
+        if len(pending) > max_row_bytes:
+            raise UploadError(f"CSV record longer than {max_row_bytes} characters, or an unclosed quote")
+        for record in csv.reader(io.StringIO(text[:boundary])):
+            record_number += 1
+            if header is None:
+                header = [name.strip() for name in record]
+                missing = [name for name in required if name not in header]
+                if missing:
+                    raise UploadError(f"CSV header is missing {', '.join(missing)}")
+            elif not record:
+                continue
+            elif len(record) != len(header):
+                yield record_number, RowError(f"Expected {len(header)} fields, found {len(record)}")
+            else:
+                yield record_number, dict(zip(header, record))
+
+
+class BulkImporter:
+    """Validate rows with build() and insert them into collection in unordered batches
+
+    build turns a row into the document to store and raises ValidationError for
+    a bad row. Documents carry an idempotency_key, so a row already stored, by
+    an earlier upload or the contact form, is reported as a duplicate of it.
+    release, when given, is awaited with the keys of such rows and frees those
+    whose idempotency window is over, returning how many it freed; the rows are
+    then inserted again, as the contact form does. on_stored is awaited with
+    each batch of documents that were inserted.
+    """
+
+    def __init__(
+        self,
+        collection,
+        build: Callable[[Dict[str, Any]], Dict[str, Any]],
+        on_stored: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None,
+        release: Optional[Callable[[List[str]], Awaitable[int]]] = None,
+        breaker=None,
+        batch_size: int = 1000,
+        max_errors: int = 1000,
+    ):
+        self.collection = collection
+        self.build = build
+        self.on_stored = on_stored
+        self.release = release
+        self.breaker = breaker
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+
+    async def run(self, rows: AsyncIterable[Tuple[int, Any]], report: Optional[ImportReport] = None) -> ImportReport:
+        """Import rows from ndjson_rows() or csv_rows()
+
+        On UploadError the rows read before it are still imported, and report
+        (when passed in) holds the outcome so far.
+        """
+        report = report if report is not None else ImportReport(self.max_errors)
+        batch: List[Tuple[int, Dict[str, Any]]] = []
+        try:
+            async for row_number, row in rows:
+                if isinstance(row, RowError):
+                    report.reject(row_number, str(row))
+                    continue
+                try:
+                    batch.append((row_number, self.build(row)))
+                except ValidationError as e:
+                    report.reject(row_number, e.errors(include_url=False, include_context=False, include_input=False))
+                    continue
+                if len(batch) >= self.batch_size:
+                    await self._insert(batch, report)
+                    batch = []
+        except UploadError:
+            if batch:
+                await self._insert(batch, report)
+            raise
+        if batch:
+            await self._insert(batch, report)
+        return report
+
+    async def _insert(self, batch: List[Tuple[int, Dict[str, Any]]], report: ImportReport, retry: bool = True):
+        documents = [document for _, document in batch]
+
+        async def insert():
+            await self.collection.insert_many(documents, ordered=False)
+
+        refused: Dict[int, Dict[str, Any]] = {}
+        try:
+            await (self.breaker.call(insert) if self.breaker is not None else insert())
+        except BulkWriteError as e:
+            refused = {error["index"]: error for error in e.details.get("writeErrors", [])}
+
+        duplicates = [index for index, error in refused.items() if error.get("code") == DUPLICATE_KEY]
+        keys = [documents[index]["idempotency_key"] for index in duplicates]
+        retried = set()
+        if keys and retry and self.release is not None and await self.release(keys):
+            # Rows whose key is still held are refused again and reported by that call
+            await self._insert([batch[index] for index in duplicates], report, retry=False)
+            retried, keys = set(duplicates), []
+        originals = {}
+        if keys:
+            projection = {"_id": 0, "id": 1, "idempotency_key": 1}
+            async for doc in self.collection.find({"idempotency_key": {"$in": keys}}, projection):
+                originals[doc["idempotency_key"]] = doc["id"]
+
+        stored = []
+        for index, (row_number, document) in enumerate(batch):
+            error = refused.get(index)
+            if index in retried:
+                continue
+            if error is None:
+                stored.append(document)
+            elif error.get("code") == DUPLICATE_KEY:
+                report.duplicate(row_number, originals.get(document["idempotency_key"]))
+            else:
+                report.reject(row_number, error.get("errmsg", "Write failed"))
+        report.imported += len(stored)
+        if stored and self.on_stored is not None:
+            await self.on_stored(stored)
@@ -0,0 +1,91 @@
+"""Circuit breaker that fails database calls fast while Mongo is unreachable."""
+import time
+from typing import Awaitable, Callable, Tuple, Type, TypeVar
+
+from pymongo.errors import ConnectionFailure
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Errors that mean the database could not be reached, as opposed to the database
+# answering with an error (duplicate key, validation, ...)
+UNAVAILABLE: Tuple[Type[BaseException], ...] = (ConnectionFailure,)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the database while the circuit is open"""
+
+
+# Everything a caller sees when the database cannot take a write right now
+DATABASE_DOWN: Tuple[Type[BaseException], ...] = (CircuitOpenError,) + UNAVAILABLE
+
+
+class CircuitBreaker:
+    """Closed, open after failure_threshold consecutive failures, half-open after reset_timeout
+
+    While open every call fails at once with CircuitOpenError. Once reset_timeout
+    has passed a single probe call is let through: success closes the circuit,
+    failure opens it for another reset_timeout.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 15.0,
+        failures: Tuple[Type[BaseException], ...] = UNAVAILABLE,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = failures
+        self.clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return CLOSED
+        if self.clock() - self._opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return OPEN
+
+    def allows(self) -> bool:
+        """Whether a call made now would reach the database"""
+        state = self.state
+        return state == CLOSED or (state == HALF_OPEN and not self._probing)
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+
+    def record_failure(self):
+        self._failures += 1
+        if self._opened_at is not None or self._failures >= self.failure_threshold:
+            self._opened_at = self.clock()
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        state = self.state
+        if state == OPEN or (state == HALF_OPEN and self._probing):
+            raise CircuitOpenError("Database circuit is open")
+        probing = state == HALF_OPEN
+        if probing:
+            self._probing = True
+        try:
+            result = await fn()
+        except self.failures:
+            self.record_failure()
+            raise
+        except Exception:
+            # The database answered, so it is reachable
+            self.record_success()
+            raise
+        finally:
+            if probing:
+                self._probing = False
+        self.record_success()
+        return result
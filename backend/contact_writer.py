@@ -0,0 +1,148 @@
+"""Write-behind batching of contact submission inserts."""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+# Acknowledgement levels for BatchedWriter.submit
+ACK_ENQUEUE = "enqueue"
+ACK_FLUSH = "flush"
+
+_STOP = object()
+
+
+class BatchedWriter:
+    """Queue documents and write them with insert_many(ordered=False)
+
+    A batch is flushed when it reaches max_batch documents or when its oldest
+    document has waited max_delay seconds, whichever comes first. The queue is
+    bounded, so producers wait once max_queue documents are pending.
+
+    on_stored is awaited with the documents of each batch that were inserted,
+    before any ACK_FLUSH submitter is released. on_failed is awaited with the
+    ACK_ENQUEUE documents a flush could not insert, whose submitters have
+    already been answered, so they are not lost. With a breaker, every flush
+    goes through breaker.call, so an outage opens the circuit and, while it is
+    open, batches fail at once instead of waiting on the database.
+    """
+
+    def __init__(
+        self,
+        collection,
+        max_batch: int = 100,
+        max_delay: float = 0.05,
+        max_queue: int = 10000,
+        on_stored: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None,
+        on_failed: Optional[Callable[[List[Dict[str, Any]], Exception], Awaitable[None]]] = None,
+        breaker=None,
+    ):
+        self.collection = collection
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_queue = max_queue
+        self.on_stored = on_stored
+        self.on_failed = on_failed
+        self.breaker = breaker
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def submit(self, document: Dict[str, Any], ack: str = ACK_FLUSH):
+        """Queue a document; with ACK_FLUSH, wait until its batch has been written"""
+        if self._task is None or self._closing:
+            raise RuntimeError("Batched writer is not running")
+        future = asyncio.get_running_loop().create_future() if ack == ACK_FLUSH else None
+        await self._queue.put((document, future))
+        if future is not None:
+            await future
+
+    async def close(self):
+        """Stop accepting documents and flush everything already queued"""
+        if self._task is None:
+            return
+        self._closing = True
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[Dict[str, Any], Optional[asyncio.Future]]]):
+        errors: Dict[int, Exception] = {}
+        duplicates = set()
+
+        async def insert():
+            await self.collection.insert_many([document for document, _ in batch], ordered=False)
+
+        try:
+            await (self.breaker.call(insert) if self.breaker is not None else insert())
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                errors[error["index"]] = BulkWriteError({"writeErrors": [error]})
+                if error.get("code") == 11000:
+                    duplicates.add(error["index"])
+            # Duplicate keys are retried submissions that were already stored
+            if len(errors) > len(duplicates):
+                logger.error(f"Batched insert failed for {len(errors) - len(duplicates)} of {len(batch)} documents")
+            if duplicates:
+                logger.info(f"Batched insert skipped {len(duplicates)} duplicate documents")
+        except Exception as e:
+            errors = {index: e for index in range(len(batch))}
+            logger.error(f"Batched insert of {len(batch)} documents failed: {str(e)}")
+
+        stored = [document for index, (document, _) in enumerate(batch) if index not in errors]
+        if stored and self.on_stored is not None:
+            try:
+                await self.on_stored(stored)
+            except Exception as e:
+                logger.error(f"Error handling stored batch: {str(e)}")
+        unacknowledged = [
+            index for index, (_, future) in enumerate(batch)
+            if future is None and index in errors and index not in duplicates
+        ]
+        if unacknowledged and self.on_failed is not None:
+            try:
+                await self.on_failed([batch[index][0] for index in unacknowledged], errors[unacknowledged[0]])
+            except Exception as e:
+                logger.error(f"Lost {len(unacknowledged)} batched documents: {str(e)}")
+
+        for index, (_, future) in enumerate(batch):
+            if future is None or future.done():
+                continue
+            if index in errors:
+                future.set_exception(errors[index])
+            else:
+                future.set_result(None)
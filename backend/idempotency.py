@@ -0,0 +1,104 @@
+"""Idempotency keys for contact submissions: a bounded TTL/LRU cache plus in-flight deduplication."""
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+_MISSING = object()
+
+
+def content_key(email: str, service: str, message: str) -> str:
+    """Fallback key for clients that send no Idempotency-Key header"""
+    digest = hashlib.sha256("\x1f".join([email.strip().lower(), service, message]).encode()).hexdigest()
+    return f"content:{digest}"
+
+
+def header_key(value: str) -> str:
+    return f"key:{value}"
+
+
+def body_hash(body: Dict[str, Any]) -> str:
+    """Fingerprint of a request body, stored with its key to spot a key reused for another request"""
+    return hashlib.sha256(json.dumps(body, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class IdempotencyKeyReused(ValueError):
+    """An idempotency key arrived again with a different request body"""
+
+
+class TTLCache:
+    """LRU mapping whose entries also expire ttl seconds after they were stored"""
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 86400.0, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        self._entries[key] = (self.clock() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class IdempotencyGuard:
+    """Run an operation at most once per key within this process
+
+    Completed results are remembered in a TTLCache; concurrent calls with a key
+    that is still in flight wait for the first call instead of repeating it. A
+    call whose fingerprint differs from the first call's raises IdempotencyKeyReused.
+    """
+
+    def __init__(self, cache: TTLCache):
+        self.cache = cache
+        self._inflight: Dict[Hashable, Tuple[Any, asyncio.Future]] = {}
+
+    async def run(
+        self, key: Hashable, operation: Callable[[], Awaitable[Any]], fingerprint: Any = None
+    ) -> Tuple[Any, bool]:
+        """Return (result, replayed), where replayed means operation was not called"""
+        cached = self.cache.get(key, _MISSING)
+        if cached is not _MISSING:
+            first_fingerprint, result = cached
+            if first_fingerprint != fingerprint:
+                raise IdempotencyKeyReused(key)
+            return result, True
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            first_fingerprint, future = inflight
+            if first_fingerprint != fingerprint:
+                raise IdempotencyKeyReused(key)
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = (fingerprint, future)
+        try:
+            result = await operation()
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody may be waiting; retrieving the exception silences asyncio's warning
+            future.exception()
+            raise
+        else:
+            self.cache.set(key, (fingerprint, result))
+            future.set_result(result)
+            return result, False
+        finally:
+            del self._inflight[key]
@@ -0,0 +1,232 @@
+"""Lead statistics kept as a rollup of submission counts per day, service, status and tenant.
+
+Every write to contact_submissions or tenant_contact_submissions that creates
+a submission or changes its status applies a matching $inc upsert to the
+lead_stats collection, so reading the dashboard touches one document per (day,
+service, status, tenant) instead of scanning submissions. The main site's
+buckets have no tenant. rebuild() recomputes the rollup from both collections,
+and the archive when ARCHIVE_DIR is set, to repair drift, e.g. after a crash
+between the two writes.
+
+    python lead_stats.py rebuild
+"""
+import argparse
+import asyncio
+import os
+from collections import Counter
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import OperationFailure
+
+# Days are UTC calendar dates as ISO strings, so they sort and compare as text
+ROLLUP_INDEXES = [
+    ([("day", ASCENDING), ("service", ASCENDING), ("status", ASCENDING), ("tenant", ASCENDING)], {"unique": True}),
+]
+
+# Unique index from before buckets were kept per tenant; it would refuse a
+# tenant's bucket for a day, service and status the main site already has
+LEGACY_ROLLUP_INDEX = "day_1_service_1_status_1"
+
+REBUILD_BATCH_SIZE = 1000
+
+
+def day_of(submitted_at: datetime) -> str:
+    return submitted_at.strftime("%Y-%m-%d")
+
+
+def rollup_key(submission: Dict[str, Any], status: Optional[str] = None) -> Tuple[str, str, str, Optional[str]]:
+    return (
+        day_of(submission["submitted_at"]),
+        submission["service"],
+        status or submission["status"],
+        submission.get("tenant"),
+    )
+
+
+def _bucket(key: Tuple[str, str, str, Optional[str]]) -> Dict[str, Optional[str]]:
+    # A tenant of None also matches main-site buckets written without the field
+    day, service, status, tenant = key
+    return {"day": day, "service": service, "status": status, "tenant": tenant}
+
+
+def _in_key_order(counts: Counter):
+    """counts' items sorted by bucket, the main site's before any tenant's"""
+    return sorted(counts.items(), key=lambda item: (*item[0][:3], item[0][3] or ""))
+
+
+async def record_submission(collection, submission: Dict[str, Any]):
+    """Count a newly stored submission"""
+    await collection.update_one(_bucket(rollup_key(submission)), {"$inc": {"count": 1}}, upsert=True)
+
+
+async def record_submissions(collection, submissions: Iterable[Dict[str, Any]]):
+    """Count many newly stored submissions with one $inc per bucket"""
+    counts = Counter(rollup_key(submission) for submission in submissions)
+    requests = [
+        UpdateOne(_bucket(key), {"$inc": {"count": amount}}, upsert=True) for key, amount in _in_key_order(counts)
+    ]
+    if requests:
+        await collection.bulk_write(requests, ordered=False)
+
+
+async def record_status_changes(collection, changes: Iterable[Tuple[Dict[str, Any], str, str]]):
+    """Move submissions between status buckets in one bulk_write
+
+    changes holds (submission, old_status, new_status); moves within the same
+    day, service and tenant are netted out before anything is written.
+    """
+    deltas: Counter = Counter()
+    for submission, old_status, new_status in changes:
+        if old_status != new_status:
+            deltas[rollup_key(submission, old_status)] -= 1
+            deltas[rollup_key(submission, new_status)] += 1
+    requests = [
+        UpdateOne(_bucket(key), {"$inc": {"count": amount}}, upsert=True)
+        for key, amount in _in_key_order(deltas) if amount
+    ]
+    if requests:
+        await collection.bulk_write(requests, ordered=False)
+
+
+async def record_status_change(collection, submission: Dict[str, Any], old_status: str, new_status: str):
+    """Move one submission from its old status bucket to the new one"""
+    await record_status_changes(collection, [(submission, old_status, new_status)])
+
+
+async def read_stats(
+    collection,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    service: Optional[str] = None,
+    tenant: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Totals per service, status and day from the rollup; until is exclusive
+
+    Without a tenant only the main site's submissions are counted.
+    """
+    query: Dict[str, Any] = {"count": {"$gt": 0}, "tenant": tenant}
+    if since is not None or until is not None:
+        query["day"] = {}
+        if since is not None:
+            query["day"]["$gte"] = since.isoformat()
+        if until is not None:
+            query["day"]["$lt"] = until.isoformat()
+    if service is not None:
+        query["service"] = service
+
+    by_service, by_status, by_day = Counter(), Counter(), {}
+    rows = await (
+        collection.find(query, {"_id": 0, "day": 1, "service": 1, "status": 1, "count": 1})
+        .sort([("day", ASCENDING), ("service", ASCENDING), ("status", ASCENDING)])
+        .to_list(None)
+    )
+    for row in rows:
+        by_service[row["service"]] += row["count"]
+        by_status[row["status"]] += row["count"]
+        day = by_day.setdefault(
+            row["day"], {"day": row["day"], "total": 0, "by_service": Counter(), "by_status": Counter()}
+        )
+        day["total"] += row["count"]
+        day["by_service"][row["service"]] += row["count"]
+        day["by_status"][row["status"]] += row["count"]
+    return {
+        "total": sum(by_status.values()),
+        "by_service": dict(by_service),
+        "by_status": dict(by_status),
+        "by_day": [
+            {**day, "by_service": dict(day["by_service"]), "by_status": dict(day["by_status"])}
+            for day in by_day.values()
+        ],
+    }
+
+
+async def rebuild(
+    submissions, rollup, batch_size: int = REBUILD_BATCH_SIZE, archive=None, tenant_submissions=None
+) -> int:
+    """Recompute the rollup from contact_submissions; returns the number of buckets
+
+    tenant_submissions, when given, is counted as well. Submissions are streamed and counted in memory, one entry per bucket.
+    Archived submissions still count towards the dashboard, so when archive (a
+    SubmissionArchive) is given its segments are counted too, and a submission
+    left in the collection by an interrupted archive run is counted only once;
+    the archive's ids are read one day at a time.
+    Each bucket's count is then overwritten in place, and buckets no submission
+    falls into any more are set to zero, so the dashboard never reads an empty
+    or half-written rollup. Writes that land while the rebuild runs may be
+    counted twice or not at all, so run it when the contact form is quiet or
+    run it again afterwards.
+    """
+    counts: Counter = Counter()
+    if archive is not None:
+        async for doc in archive.iter_scan(batch_size=batch_size):
+            counts[rollup_key(doc)] += 1
+    projection = {"_id": 0, "id": 1, "submitted_at": 1, "service": 1, "status": 1, "tenant": 1}
+    # Walked in day order, so only one day's archived ids are held at a time
+    day, archived = None, set()
+    cursor = submissions.find({}, projection).sort([("submitted_at", ASCENDING), ("id", ASCENDING)])
+    async for doc in cursor.batch_size(batch_size):
+        if archive is not None and day_of(doc["submitted_at"]) != day:
+            day = day_of(doc["submitted_at"])
+            archived = await asyncio.to_thread(archive.day_ids, day)
+        if doc["id"] not in archived:
+            counts[rollup_key(doc)] += 1
+    if tenant_submissions is not None:
+        async for doc in tenant_submissions.find({}, projection).batch_size(batch_size):
+            counts[rollup_key(doc)] += 1
+
+    requests = [
+        UpdateOne(_bucket(key), {"$set": {"count": count}}, upsert=True) for key, count in _in_key_order(counts)
+    ]
+    projection = {"_id": 0, "day": 1, "service": 1, "status": 1, "tenant": 1}
+    async for row in rollup.find({"count": {"$ne": 0}}, projection):
+        key = (row["day"], row["service"], row["status"], row.get("tenant"))
+        if key not in counts:
+            requests.append(UpdateOne(_bucket(key), {"$set": {"count": 0}}))
+    for start in range(0, len(requests), batch_size):
+        await rollup.bulk_write(requests[start:start + batch_size], ordered=False)
+    return len(counts)
+
+
+async def ensure_rollup_indexes(collection):
+    try:
+        await collection.drop_index(LEGACY_ROLLUP_INDEX)
+    except OperationFailure:
+        pass  # already dropped, or never created
+    for keys, options in ROLLUP_INDEXES:
+        await collection.create_index(keys, **options)
+
+
+async def _rebuild_from_env():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        db = client[os.environ['DB_NAME']]
+        archive = None
+        if os.environ.get('ARCHIVE_DIR'):
+            from archive import SubmissionArchive
+
+            archive = SubmissionArchive(Path(os.environ['ARCHIVE_DIR']), os.environ.get('ARCHIVE_CODEC', 'gzip'))
+        await ensure_rollup_indexes(db.lead_stats)
+        buckets = await rebuild(
+            db.contact_submissions, db.lead_stats, archive=archive, tenant_submissions=db.tenant_contact_submissions
+        )
+        print(f"Rebuilt lead_stats: {buckets} buckets")
+    finally:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the lead_stats rollup collection")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+    asyncio.run(_rebuild_from_env())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""Server-sent event feed of new contact submissions, fanned out by an in-process broker.
+
+Each stored submission is encoded once and offered to every subscriber's
+bounded queue. A subscriber that falls queue_size events behind is dropped
+rather than slowing the others down, and its stream ends. Event ids are
+listing cursors, so the browser's automatic reconnect sends the last one back
+as Last-Event-ID and the gap is backfilled from the database. Delivery is
+at-least-once; clients dedupe on the event id.
+
+A broker only hears about submissions stored by its own worker. While it has
+subscribers it also polls the collection for recently inserted submissions,
+which picks up those stored by other workers. The poll goes by the time in each
+document's _id, which the driver sets when the document is written, so a
+submission written late, replayed from the spool or in a slow batch, is found
+whatever its submitted_at, as long as worker clocks agree to within lookback.
+"""
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional, Set
+
+import orjson
+from bson import ObjectId
+from pymongo import ASCENDING
+
+from submissions import EXPORT_SORT, SUBMISSION_FIELDS, SUBMISSION_PROJECTION, build_filter, cursor_for
+
+logger = logging.getLogger(__name__)
+
+# Ids remembered so a submission seen both locally and by the poll is sent once
+RECENT_IDS = 10000
+
+
+class FeedFullError(Exception):
+    """Raised by subscribe() when max_subscribers streams are already open"""
+
+
+class FeedEvent:
+    """A submission encoded as one SSE frame, shared by every subscriber"""
+
+    __slots__ = ("id", "frame")
+
+    def __init__(self, doc: Dict[str, Any]):
+        self.id = doc["id"]
+        self.frame = encode_event(doc)
+
+
+def encode_event(doc: Dict[str, Any]) -> bytes:
+    row = {field: doc[field] for field in SUBMISSION_FIELDS if field in doc}
+    return b"id: " + cursor_for(doc).encode() + b"\nevent: submission\ndata: " + orjson.dumps(row) + b"\n\n"
+
+
+class Subscription:
+    """One stream's queue of at most size events"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.closed = False
+        self._events: Deque[FeedEvent] = deque()
+        self._ready = asyncio.Event()
+
+    def offer(self, event: FeedEvent) -> bool:
+        """Queue event without waiting; False closes a subscriber that has fallen behind"""
+        if len(self._events) >= self.size:
+            self.close()
+            return False
+        self._events.append(event)
+        self._ready.set()
+        return True
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    async def next(self) -> Optional[FeedEvent]:
+        """The next queued event, or None once the subscription is closed"""
+        while not self._events and not self.closed:
+            self._ready.clear()
+            await self._ready.wait()
+        if self.closed:
+            # Dropped for falling behind, or shutting down: the reconnect backfills
+            return None
+        return self._events.popleft()
+
+
+class SubmissionBroker:
+    """Fan new submissions out to the open feed streams of this worker"""
+
+    def __init__(
+        self,
+        collection=None,
+        queue_size: int = 100,
+        max_subscribers: int = 100,
+        poll_interval: float = 2.0,
+        lookback: float = 10.0,
+        clock: Callable[[], datetime] = datetime.utcnow,
+    ):
+        self.collection = collection
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.poll_interval = poll_interval
+        self.lookback = lookback
+        self.clock = clock
+        self._subscribers: Set[Subscription] = set()
+        self._recent: "OrderedDict[str, None]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def subscribe(self) -> Subscription:
+        if len(self._subscribers) >= self.max_subscribers:
+            raise FeedFullError("Too many feed subscribers")
+        subscription = Subscription(self.queue_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    def publish(self, doc: Dict[str, Any]):
+        """Offer a stored submission to every subscriber; never waits"""
+        if doc["id"] in self._recent:
+            return
+        self._recent[doc["id"]] = None
+        if len(self._recent) > RECENT_IDS:
+            self._recent.popitem(last=False)
+        if not self._subscribers:
+            return
+        event = FeedEvent(doc)
+        lagging = [subscription for subscription in self._subscribers if not subscription.offer(event)]
+        for subscription in lagging:
+            logger.warning("Dropped a feed subscriber that fell behind")
+            self._subscribers.discard(subscription)
+
+    async def poll(self):
+        """Publish submissions inserted in the last lookback seconds, by any worker"""
+        since = ObjectId.from_datetime(self.clock() - timedelta(seconds=self.lookback))
+        async for doc in self.collection.find({"_id": {"$gte": since}}, SUBMISSION_PROJECTION).sort(
+            "_id", ASCENDING
+        ):
+            self.publish(doc)
+
+    async def start(self):
+        if self.poll_interval:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop polling and end every open stream"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for subscription in self._subscribers:
+            subscription.close()
+        self._subscribers.clear()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if not self._subscribers:
+                continue
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.warning(f"Feed poll failed: {str(e)}")
+
+
+async def stream_events(
+    broker: SubmissionBroker,
+    subscription: Subscription,
+    last_event_id: Optional[str],
+    backfill_limit: int = 1000,
+    heartbeat: float = 15.0,
+) -> AsyncIterator[bytes]:
+    """SSE body: missed submissions after last_event_id, then live ones
+
+    The subscription is taken before the backfill query so nothing stored in
+    between is lost. A backfill of more than backfill_limit rows sends the first
+    backfill_limit and ends the stream; the reconnect continues from there.
+    """
+    try:
+        sent = set()
+        if last_event_id is not None:
+            query = build_filter(after=last_event_id, ascending=True)
+            missed = await (
+                broker.collection.find(query, SUBMISSION_PROJECTION)
+                .sort(EXPORT_SORT)
+                .limit(backfill_limit + 1)
+                .to_list(backfill_limit + 1)
+            )
+            for doc in missed[:backfill_limit]:
+                sent.add(doc["id"])
+                yield encode_event(doc)
+            if len(missed) > backfill_limit:
+                return
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.next(), heartbeat)
+            except asyncio.TimeoutError:
+                # Keeps proxies from timing out an idle stream
+                yield b": keepalive\n\n"
+                continue
+            if event is None:
+                return
+            if event.id not in sent:
+                yield event.frame
+    finally:
+        broker.unsubscribe(subscription)
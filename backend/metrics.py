@@ -0,0 +1,253 @@
+"""Prometheus metrics for HTTP routes and the Mongo client, in text exposition format."""
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import monitoring
+from starlette.routing import Match
+
+HTTP_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# (method, raw path) pairs remembered with their route template, least recently used evicted first
+ROUTE_CACHE_SIZE = 1024
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect and three increments"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def exposition(self, name: str, labels: str) -> Iterable[str]:
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f"{name}_sum{{{labels}}} {self.sum}"
+        yield f"{name}_count{{{labels}}} {self.count}"
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class HTTPMetrics:
+    """Per-route request counters, latency histograms and in-flight gauges
+
+    Only ever touched from the event loop thread, so it needs no locking.
+    """
+
+    def __init__(self):
+        self.requests: Dict[Tuple[str, str, int], int] = {}
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.in_flight: Dict[Tuple[str, str], int] = {}
+
+    def clear(self):
+        self.requests.clear()
+        self.latency.clear()
+        self.in_flight.clear()
+
+    def exposition(self) -> Iterable[str]:
+        yield "# HELP http_requests_total HTTP requests by route and status."
+        yield "# TYPE http_requests_total counter"
+        for (method, route, status), count in sorted(self.requests.items()):
+            yield f'http_requests_total{{method="{method}",route="{_label(route)}",status="{status}"}} {count}'
+        yield "# HELP http_request_duration_seconds HTTP request latency by route."
+        yield "# TYPE http_request_duration_seconds histogram"
+        for (method, route), histogram in sorted(self.latency.items()):
+            yield from histogram.exposition("http_request_duration_seconds", f'method="{method}",route="{_label(route)}"')
+        yield "# HELP http_requests_in_flight HTTP requests currently being served."
+        yield "# TYPE http_requests_in_flight gauge"
+        for (method, route), count in sorted(self.in_flight.items()):
+            yield f'http_requests_in_flight{{method="{method}",route="{_label(route)}"}} {count}'
+
+
+class MetricsMiddleware:
+    """Time every HTTP request against its route template, not its raw path"""
+
+    def __init__(self, app, metrics: HTTPMetrics, routes: Optional[List] = None):
+        self.app = app
+        self.metrics = metrics
+        # Routes to resolve templates from; read lazily since routers are filled after setup
+        self.routes = routes
+        self._route_cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+
+    def route_for(self, method: str, path: str) -> str:
+        """The template of the route that serves method and path, as the router would pick it"""
+        key = (method, path)
+        route = self._route_cache.get(key)
+        if route is not None:
+            self._route_cache.move_to_end(key)
+            return route
+        scope = {"type": "http", "method": method, "path": path, "root_path": ""}
+        for candidate in self.routes or ():
+            # A path that matches for another method only is a PARTIAL match
+            match, _ = candidate.matches(scope)
+            if match == Match.FULL:
+                route = candidate.path
+                break
+        else:
+            # Not cached, so probes of random paths cannot push out real routes
+            return "unmatched"
+        self._route_cache[key] = route
+        if len(self._route_cache) > ROUTE_CACHE_SIZE:
+            self._route_cache.popitem(last=False)
+        return route
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        metrics = self.metrics
+        key = (scope["method"], self.route_for(scope["method"], scope["path"]))
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics.in_flight[key] = metrics.in_flight.get(key, 0) + 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.in_flight[key] -= 1
+            histogram = metrics.latency.get(key)
+            if histogram is None:
+                histogram = metrics.latency[key] = Histogram(HTTP_BUCKETS)
+            histogram.observe(elapsed)
+            counter = (key[0], key[1], status)
+            metrics.requests[counter] = metrics.requests.get(counter, 0) + 1
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Command durations by command name, fed by pymongo's command monitoring
+
+    pymongo calls listeners from Motor's executor threads, hence the lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations: Dict[str, Histogram] = {}
+        self.failures: Dict[str, int] = {}
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._observe(event.command_name, event.duration_micros / 1e6)
+
+    def failed(self, event):
+        self._observe(event.command_name, event.duration_micros / 1e6)
+        with self._lock:
+            self.failures[event.command_name] = self.failures.get(event.command_name, 0) + 1
+
+    def _observe(self, command: str, seconds: float):
+        with self._lock:
+            histogram = self.durations.get(command)
+            if histogram is None:
+                histogram = self.durations[command] = Histogram(MONGO_BUCKETS)
+            histogram.observe(seconds)
+
+    def exposition(self) -> Iterable[str]:
+        with self._lock:
+            durations = sorted(self.durations.items())
+            failures = sorted(self.failures.items())
+        yield "# HELP mongodb_command_duration_seconds MongoDB command latency by command."
+        yield "# TYPE mongodb_command_duration_seconds histogram"
+        for command, histogram in durations:
+            yield from histogram.exposition("mongodb_command_duration_seconds", f'command="{_label(command)}"')
+        yield "# HELP mongodb_command_failures_total Failed MongoDB commands by command."
+        yield "# TYPE mongodb_command_failures_total counter"
+        for command, count in failures:
+            yield f'mongodb_command_failures_total{{command="{_label(command)}"}} {count}'
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool gauges per server address"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open: Dict[str, int] = {}
+        self.checked_out: Dict[str, int] = {}
+        self.checkout_failures: Dict[str, int] = {}
+        self.cleared: Dict[str, int] = {}
+
+    def _add(self, table: Dict[str, int], address, delta: int):
+        key = "%s:%s" % address
+        with self._lock:
+            table[key] = table.get(key, 0) + delta
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._add(self.cleared, event.address, 1)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._add(self.open, event.address, 1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add(self.open, event.address, -1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._add(self.checkout_failures, event.address, 1)
+
+    def connection_checked_out(self, event):
+        self._add(self.checked_out, event.address, 1)
+
+    def connection_checked_in(self, event):
+        self._add(self.checked_out, event.address, -1)
+
+    def exposition(self) -> Iterable[str]:
+        with self._lock:
+            tables = [
+                ("mongodb_pool_connections", "gauge", "Open pooled connections.", dict(self.open)),
+                ("mongodb_pool_checked_out_connections", "gauge", "Connections in use.", dict(self.checked_out)),
+                ("mongodb_pool_checkout_failures_total", "counter", "Failed connection checkouts.",
+                 dict(self.checkout_failures)),
+                ("mongodb_pool_cleared_total", "counter", "Times the pool was cleared.", dict(self.cleared)),
+            ]
+        for name, kind, help_text, values in tables:
+            yield f"# HELP {name} {help_text}"
+            yield f"# TYPE {name} {kind}"
+            for address, value in sorted(values.items()):
+                yield f'{name}{{address="{_label(address)}"}} {value}'
+
+
+def render(*sources) -> bytes:
+    """Concatenate the exposition of every source into a /metrics body"""
+    lines = []
+    for source in sources:
+        lines.extend(source.exposition())
+    lines.append("")
+    return "\n".join(lines).encode()
@@ -0,0 +1,292 @@
+"""Email notifications for new contact submissions, delivered from a transactional outbox.
+
+The outbox record is a `notification` field written in the same insert as the
+submission, so a stored submission always has its notification queued and the
+request never waits for SMTP. Background workers claim due records in batches,
+send them over pooled SMTP connections and record the outcome in one
+bulk_write per batch. Failures are retried with exponential backoff; records
+that exhaust their attempts, or are refused outright, are dead-lettered with
+their last error and left in place for inspection.
+"""
+import asyncio
+import logging
+import re
+import smtplib
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Any, Callable, Dict, List, Optional
+
+from pymongo import ASCENDING, UpdateOne
+
+from submissions import SUBMISSION_PROJECTION
+
+logger = logging.getLogger(__name__)
+
+# notification.state values
+PENDING = "pending"
+SENT = "sent"
+DEAD = "dead"
+
+# Only pending records are indexed, so the outbox index stays as small as the backlog
+OUTBOX_INDEXES = [
+    ([("notification.next_attempt_at", ASCENDING)], {"partialFilterExpression": {"notification.state": PENDING}}),
+    ([("notification.claim", ASCENDING)], {"partialFilterExpression": {"notification.state": PENDING}}),
+]
+
+_CLAIM_PROJECTION = {**SUBMISSION_PROJECTION, "notification": 1}
+
+_LINE_BREAKS_RE = re.compile(r"[\r\n\v\f\x1c-\x1e\x85\u2028\u2029]+")
+
+
+def outbox_entry(now: datetime) -> Dict[str, Any]:
+    """The notification field stored with a new submission"""
+    return {"state": PENDING, "attempts": 0, "next_attempt_at": now}
+
+
+def _header_value(value: str) -> str:
+    """value on one line; EmailMessage refuses header values containing line breaks"""
+    return _LINE_BREAKS_RE.sub(" ", value)
+
+
+def compose_notification(submission: Dict[str, Any], sender: str, recipient: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = sender
+    message["To"] = recipient
+    message["Reply-To"] = _header_value(submission["email"])
+    message["Subject"] = _header_value(f"New contact from {submission['name']} ({submission['service']})")
+    message.set_content(
+        f"Name: {submission['name']}\n"
+        f"Email: {submission['email']}\n"
+        f"Service: {submission['service']}\n"
+        f"Submitted: {submission['submitted_at'].isoformat()}Z\n"
+        f"\n{submission['message']}\n"
+    )
+    return message
+
+
+def _permanent(error: Exception) -> bool:
+    """A 5xx reply, or a message that cannot be composed, will not succeed on retry"""
+    if isinstance(error, ValueError):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+class SMTPPool:
+    """Up to size open SMTP connections, each lent to one sender at a time
+
+    smtplib blocks, so connecting and sending run in worker threads. A
+    connection is returned to the pool after use unless the failure left it
+    unusable; an idle connection the server has since closed is replaced once.
+    """
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 25,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        starttls: bool = False,
+        size: int = 2,
+        timeout: float = 30.0,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.size = size
+        self.timeout = timeout
+        self._idle: List[smtplib.SMTP] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _connect(self) -> smtplib.SMTP:
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            connection.starttls()
+        if self.username:
+            connection.login(self.username, self.password or "")
+        return connection
+
+    @staticmethod
+    def _close(connection: smtplib.SMTP):
+        try:
+            connection.quit()
+        except (smtplib.SMTPException, OSError):
+            connection.close()
+
+    async def send(self, message: EmailMessage):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else None
+            reused = connection is not None
+            while True:
+                if connection is None:
+                    connection = await asyncio.to_thread(self._connect)
+                try:
+                    await asyncio.to_thread(connection.send_message, message)
+                except (smtplib.SMTPServerDisconnected, OSError):
+                    await asyncio.to_thread(self._close, connection)
+                    connection = None
+                    if reused:
+                        reused = False
+                        continue
+                    raise
+                except smtplib.SMTPException:
+                    # The server answered; the session was reset and can be reused
+                    self._idle.append(connection)
+                    raise
+                self._idle.append(connection)
+                return
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        self._slots = None
+        for connection in idle:
+            await asyncio.to_thread(self._close, connection)
+
+
+class NotificationOutbox:
+    """Background workers that deliver pending notifications from contact_submissions
+
+    Claiming a batch moves its next_attempt_at forward by lease seconds, so a
+    worker that dies mid-batch only delays those records; delivery is
+    at-least-once. wake() lets the request path signal new work without waiting.
+    """
+
+    def __init__(
+        self,
+        collection,
+        smtp: SMTPPool,
+        sender: str,
+        recipient: str,
+        workers: int = 2,
+        batch_size: int = 20,
+        max_attempts: int = 8,
+        retry_base: float = 30.0,
+        retry_max: float = 3600.0,
+        poll_interval: float = 5.0,
+        lease: float = 300.0,
+        clock: Callable[[], datetime] = datetime.utcnow,
+    ):
+        self.collection = collection
+        self.smtp = smtp
+        self.sender = sender
+        self.recipient = recipient
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.clock = clock
+        self._wake: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+
+    def retry_delay(self, attempts: int) -> float:
+        """Seconds to wait after the given number of failed attempts"""
+        return min(self.retry_max, self.retry_base * 2 ** (attempts - 1))
+
+    def wake(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    async def start(self):
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Let every worker finish its current batch, then close the SMTP pool"""
+        if not self._tasks:
+            return
+        self._stopping = True
+        self._wake.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.smtp.close()
+
+    async def _run(self):
+        while not self._stopping:
+            self._wake.clear()
+            try:
+                claimed = await self.process_batch()
+            except Exception as e:
+                logger.error(f"Notification batch failed: {str(e)}")
+                claimed = 0
+            if claimed or self._stopping:
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def claim(self) -> List[Dict[str, Any]]:
+        """Take up to batch_size due records for this worker: a find, an update_many and a find"""
+        now = self.clock()
+        due = {"notification.state": PENDING, "notification.next_attempt_at": {"$lte": now}}
+        candidates = await (
+            self.collection.find(due, {"_id": 0, "id": 1})
+            .sort("notification.next_attempt_at", ASCENDING)
+            .limit(self.batch_size)
+            .to_list(self.batch_size)
+        )
+        if not candidates:
+            return []
+        claim = str(uuid.uuid4())
+        # Re-checking due makes each record go to exactly one claimant
+        await self.collection.update_many(
+            {**due, "id": {"$in": [doc["id"] for doc in candidates]}},
+            {"$set": {
+                "notification.claim": claim,
+                "notification.next_attempt_at": now + timedelta(seconds=self.lease),
+            }},
+        )
+        return await self.collection.find(
+            {"notification.state": PENDING, "notification.claim": claim}, _CLAIM_PROJECTION
+        ).to_list(None)
+
+    async def process_batch(self) -> int:
+        """Deliver one claimed batch; returns how many records were claimed"""
+        batch = await self.claim()
+        if not batch:
+            return 0
+        updates = []
+        for submission in batch:
+            entry = submission["notification"]
+            owned = {"id": submission["id"], "notification.claim": entry["claim"]}
+            try:
+                await self.smtp.send(compose_notification(submission, self.sender, self.recipient))
+            except Exception as e:
+                attempts = entry["attempts"] + 1
+                if attempts >= self.max_attempts or _permanent(e):
+                    logger.error(f"Dead-lettering notification for {submission['id']} after {attempts} attempts: {e}")
+                    change = {
+                        "notification.state": DEAD,
+                        "notification.attempts": attempts,
+                        "notification.last_error": str(e),
+                    }
+                else:
+                    change = {
+                        "notification.attempts": attempts,
+                        "notification.last_error": str(e),
+                        "notification.next_attempt_at": self.clock() + timedelta(seconds=self.retry_delay(attempts)),
+                    }
+                updates.append(UpdateOne(owned, {"$set": change, "$unset": {"notification.claim": ""}}))
+                continue
+            updates.append(UpdateOne(owned, {
+                "$set": {"notification.state": SENT, "notification.sent_at": self.clock()},
+                "$unset": {"notification.claim": "", "notification.next_attempt_at": ""},
+            }))
+        await self.collection.bulk_write(updates, ordered=False)
+        return len(batch)
+
+
+async def ensure_outbox_indexes(collection):
+    for keys, options in OUTBOX_INDEXES:
+        await collection.create_index(keys, **options)
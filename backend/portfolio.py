@@ -0,0 +1,183 @@
+"""Portfolio content store, section lookup and field projection."""
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+# A normalized projection: sorted (section, subfields) pairs, subfields None for the whole section
+Projection = Tuple[Tuple[str, Optional[Tuple[str, ...]]], ...]
+
+# Upper bound on a ?fields= value, checked before any parsing
+MAX_FIELDS_LENGTH = 512
+
+
+class ProjectionError(ValueError):
+    """Raised when a projection names an unknown section or field"""
+
+
+def field_index(data: Dict[str, Any]) -> Dict[str, FrozenSet[str]]:
+    """Map each section to the field names a projection may select from it"""
+    index = {}
+    for section, content in data.items():
+        if isinstance(content, dict):
+            index[section] = frozenset(content)
+        elif isinstance(content, list):
+            index[section] = frozenset(key for item in content if isinstance(item, dict) for key in item)
+        else:
+            index[section] = frozenset()
+    return index
+
+
+def parse_fields(fields: str, index: Dict[str, FrozenSet[str]]) -> Projection:
+    """Normalize a comma separated ?fields= value such as "hero,services.title"
+
+    Unknown names raise ProjectionError; a bare section wins over its subfields.
+    """
+    if len(fields) > MAX_FIELDS_LENGTH:
+        raise ProjectionError("fields parameter is too long")
+    selected: Dict[str, Optional[set]] = {}
+    for raw in fields.split(","):
+        name = raw.strip()
+        if not name:
+            continue
+        section, _, field = name.partition(".")
+        if section not in index:
+            raise ProjectionError(f"Unknown portfolio section: {section}")
+        if not field:
+            selected[section] = None
+            continue
+        if field not in index[section]:
+            raise ProjectionError(f"Unknown field: {name}")
+        if section in selected and selected[section] is None:
+            continue
+        selected.setdefault(section, set()).add(field)
+    if not selected:
+        raise ProjectionError("fields parameter is empty")
+    return tuple(
+        (section, None if subfields is None else tuple(sorted(subfields)))
+        for section, subfields in sorted(selected.items())
+    )
+
+
+def project(data: Dict[str, Any], projection: Projection) -> Dict[str, Any]:
+    """Apply a normalized projection to portfolio data"""
+    result = {}
+    for section, subfields in projection:
+        content = data[section]
+        if subfields is None:
+            result[section] = content
+        elif isinstance(content, list):
+            result[section] = [{key: item[key] for key in subfields if key in item} for item in content]
+        else:
+            result[section] = {key: content[key] for key in subfields if key in content}
+    return result
+
+
+def dump_json(value: Any) -> bytes:
+    """Encode JSON the way FastAPI's JSONResponse does"""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class PortfolioStore:
+    """Read-through, in-memory copy of the portfolio_content collection
+
+    Each section document carries a version that is bumped on every edit. Reads
+    are served from memory only; a background task compares versions at most
+    every max_staleness seconds and reloads just the sections that changed.
+    """
+
+    def __init__(self, collection, defaults: Dict[str, Any], max_staleness: float = 5.0):
+        self.collection = collection
+        self.defaults = defaults
+        self.max_staleness = max_staleness
+        self.sections: Dict[str, Any] = dict(defaults)
+        self.versions: Dict[str, int] = {section: 0 for section in defaults}
+        # False while sections still hold the defaults because Mongo has not been read yet
+        self.loaded = False
+        self._index = (None, {})
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def version(self) -> Tuple[int, ...]:
+        """Version of the whole portfolio, changes whenever any section does"""
+        return tuple(self.versions.values())
+
+    def version_of(self, sections: Iterable[str]) -> Tuple[int, ...]:
+        """Version of a subset of sections"""
+        return tuple(self.versions[section] for section in sections)
+
+    def field_index(self) -> Dict[str, FrozenSet[str]]:
+        """Selectable fields per section, recomputed when the content changes"""
+        if self._index[0] != self.version:
+            self._index = (self.version, field_index(self.sections))
+        return self._index[1]
+
+    async def seed(self):
+        """Insert the default content for any section missing from Mongo"""
+        await self.collection.create_index("section", unique=True)
+        now = datetime.utcnow()
+        for section, content in self.defaults.items():
+            await self.collection.update_one(
+                {"section": section},
+                {"$setOnInsert": {"content": content, "version": 1, "updated_at": now}},
+                upsert=True,
+            )
+
+    async def refresh(self):
+        """Reload the sections whose stored version differs from the cached one"""
+        async with self._lock:
+            stored = await self.collection.find({}, {"_id": 0, "section": 1, "version": 1}).to_list(None)
+            stale = [
+                doc["section"] for doc in stored
+                if doc["section"] in self.versions and doc.get("version") != self.versions[doc["section"]]
+            ]
+            if not stale:
+                self.loaded = True
+                return
+            async for doc in self.collection.find({"section": {"$in": stale}}, {"_id": 0}):
+                self.sections[doc["section"]] = doc["content"]
+                self.versions[doc["section"]] = doc["version"]
+            self.loaded = True
+            logger.info(f"Reloaded portfolio sections: {', '.join(sorted(stale))}")
+
+    async def update_section(self, section: str, content: Any) -> int:
+        """Store new content for a section and return its new version"""
+        doc = await self.collection.find_one_and_update(
+            {"section": section},
+            {"$set": {"content": content, "updated_at": datetime.utcnow()}, "$inc": {"version": 1}},
+            projection={"_id": 0, "version": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        async with self._lock:
+            self.sections[section] = content
+            self.versions[section] = doc["version"]
+        return doc["version"]
+
+    async def start(self):
+        """Seed and load the content, then keep it fresh in the background"""
+        try:
+            await self.seed()
+            await self.refresh()
+        except Exception as e:
+            logger.error(f"Error loading portfolio content, serving defaults: {str(e)}")
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.max_staleness)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Error refreshing portfolio content: {str(e)}")
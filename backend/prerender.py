@@ -0,0 +1,72 @@
+"""The frontend's index.html rendered with the portfolio inlined.
+
+The page carries the whole portfolio as a JSON bootstrap block, which the
+frontend reads instead of calling /api/portfolio, and static markup for the
+hero section, so the first paint has content before any script has run. The
+title and description meta tag are filled in from the hero as well.
+"""
+import html
+import re
+from pathlib import Path
+from typing import Any, Dict
+
+# id of the <script type="application/json"> element holding the portfolio
+BOOTSTRAP_ID = "portfolio-data"
+
+# Characters that could end the script element or trip up older parsers inside it;
+# as JSON string escapes they decode to the same text
+_SCRIPT_ESCAPES = [
+    (b"<", b"\\u003c"),
+    (b">", b"\\u003e"),
+    (b"&", b"\\u0026"),
+    ("\u2028".encode(), b"\\u2028"),
+    ("\u2029".encode(), b"\\u2029"),
+]
+
+_TITLE_RE = re.compile(r"<title>.*?</title>", re.S)
+_DESCRIPTION_RE = re.compile(r'<meta\s+name="description"\s+content="[^"]*"\s*/?>')
+_ROOT_RE = re.compile(r'<div id="root">\s*</div>')
+
+
+def bootstrap_script(portfolio_json: bytes) -> str:
+    for character, escape in _SCRIPT_ESCAPES:
+        portfolio_json = portfolio_json.replace(character, escape)
+    return f'<script id="{BOOTSTRAP_ID}" type="application/json">{portfolio_json.decode()}</script>'
+
+
+def hero_markup(hero: Dict[str, Any]) -> str:
+    """The hero section as HeroSection renders its text, replaced once React renders"""
+    name, tagline, description = (html.escape(str(hero.get(key, ""))) for key in ("name", "tagline", "description"))
+    return (
+        '<section id="home" class="relative min-h-screen flex items-center justify-center pt-20">'
+        '<div class="max-w-7xl mx-auto px-6 text-center relative z-10">'
+        f'<h1 class="text-5xl md:text-7xl font-bold text-slate-800 mb-6 leading-tight">{name}</h1>'
+        f'<p class="text-xl md:text-2xl text-slate-600 max-w-3xl mx-auto mb-6">{tagline}</p>'
+        f'<p class="text-lg text-slate-600 max-w-4xl mx-auto mb-8 leading-relaxed">{description}</p>'
+        '</div></section>'
+    )
+
+
+class ShellTemplate:
+    """index.html, read once; raises ValueError when it has no empty root element or </head>"""
+
+    def __init__(self, path: Path, public_url: str = ""):
+        self.path = Path(path)
+        # A built index.html has this substituted already, the public/ template does not
+        self.template = self.path.read_text(encoding="utf-8").replace("%PUBLIC_URL%", public_url)
+        if not _ROOT_RE.search(self.template) or "</head>" not in self.template:
+            raise ValueError(f'{self.path} needs an empty <div id="root"></div> and a </head>')
+
+    def render(self, portfolio: Dict[str, Any], portfolio_json: bytes) -> bytes:
+        """The page for portfolio, whose serialized form is portfolio_json"""
+        hero = portfolio.get("hero", {})
+        page = self.template
+        if hero.get("name"):
+            title = html.escape(" | ".join(str(hero[key]) for key in ("name", "tagline") if hero.get(key)))
+            page = _TITLE_RE.sub(lambda _: f"<title>{title}</title>", page, count=1)
+        if hero.get("description"):
+            description = html.escape(str(hero["description"]))
+            page = _DESCRIPTION_RE.sub(lambda _: f'<meta name="description" content="{description}" />', page, count=1)
+        page = page.replace("</head>", bootstrap_script(portfolio_json) + "</head>", 1)
+        page = _ROOT_RE.sub(lambda _: f'<div id="root">{hero_markup(hero)}</div>', page, count=1)
+        return page.encode()
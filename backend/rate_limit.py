@@ -0,0 +1,180 @@
+"""Per-client token-bucket rate limiting, applied as ASGI middleware before the body is read."""
+import math
+import re
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# (tokens per second, bucket size)
+Limit = Tuple[float, int]
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+_LIMIT_RE = re.compile(r"^\s*([A-Z]+)\s+(\S+)\s*=\s*(\d+)\s*/\s*(second|minute|hour)\s*(?::\s*(\d+))?\s*$")
+
+
+def parse_limits(spec: str) -> Dict[Tuple[str, str], Limit]:
+    """Parse "POST /api/contact=10/minute:5; ..." into per-route limits
+
+    The number after the colon is the burst size; it defaults to the count. A
+    `*` path segment matches any one segment, as in "POST /api/*/contact".
+    """
+    limits = {}
+    for entry in spec.split(";"):
+        if not entry.strip():
+            continue
+        match = _LIMIT_RE.match(entry)
+        if match is None:
+            raise ValueError(f"Invalid rate limit: {entry.strip()}")
+        method, path, count, period, burst = match.groups()
+        limits[(method, path)] = (int(count) / _PERIODS[period], int(burst or count))
+    return limits
+
+
+class RateLimitBackend:
+    """Where bucket state lives
+
+    The default LocalTokenBuckets keeps it in process memory, so every worker
+    enforces its own limit. A shared implementation (Redis, Mongo, ...) lets
+    several workers cooperate on one limit per client.
+    """
+
+    async def acquire(self, key: str, rate: float, burst: int) -> float:
+        """Take one token for key; return 0 if allowed, else seconds until one is available"""
+        raise NotImplementedError
+
+
+class LocalTokenBuckets(RateLimitBackend):
+    """In-process token buckets, sharded so idle buckets are evicted a slice at a time"""
+
+    def __init__(
+        self,
+        shards: int = 16,
+        idle_ttl: float = 600.0,
+        sweep_interval: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        # key -> [tokens, last refill time]
+        self._shards: List[Dict[str, List[float]]] = [{} for _ in range(shards)]
+        self._next_sweep = clock() + sweep_interval
+        self._sweep_shard = 0
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    def clear(self):
+        for shard in self._shards:
+            shard.clear()
+
+    def take(self, key: str, rate: float, burst: int) -> float:
+        now = self.clock()
+        if now >= self._next_sweep:
+            self._sweep(now)
+        shard = self._shards[hash(key) % len(self._shards)]
+        bucket = shard.get(key)
+        if bucket is None:
+            shard[key] = [burst - 1.0, now]
+            return 0.0
+        tokens = min(float(burst), bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if tokens >= 1.0:
+            bucket[0] = tokens - 1.0
+            return 0.0
+        bucket[0] = tokens
+        return (1.0 - tokens) / rate
+
+    async def acquire(self, key: str, rate: float, burst: int) -> float:
+        return self.take(key, rate, burst)
+
+    def _sweep(self, now: float):
+        """Drop buckets untouched for idle_ttl from one shard; a bucket that idle has refilled anyway"""
+        shard = self._shards[self._sweep_shard]
+        cutoff = now - self.idle_ttl
+        for key in [key for key, bucket in shard.items() if bucket[1] < cutoff]:
+            del shard[key]
+        self._sweep_shard = (self._sweep_shard + 1) % len(self._shards)
+        self._next_sweep = now + self.sweep_interval
+
+
+def _path_pattern(path: str) -> "re.Pattern":
+    return re.compile("^" + "/".join("[^/]+" if part == "*" else re.escape(part) for part in path.split("/")) + "$")
+
+
+def client_id(scope, trusted_proxies: int = 0) -> str:
+    """The address the outermost of trusted_proxies reverse proxies saw, else the peer address
+
+    Each proxy appends the address it received the request from to
+    X-Forwarded-For, so only the last trusted_proxies entries were written by
+    proxies we run; anything to the left of them is whatever the client sent.
+    """
+    if trusted_proxies > 0:
+        forwarded = [
+            address.strip()
+            for name, value in scope["headers"] if name == b"x-forwarded-for"
+            for address in value.decode("latin-1").split(",")
+        ]
+        if len(forwarded) >= trusted_proxies:
+            return forwarded[-trusted_proxies]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class RateLimitMiddleware:
+    """Reject requests over their route's limit with 429 before the app sees them
+
+    trusted_proxies is the number of reverse proxies in front of the app; with
+    the default 0, X-Forwarded-For is ignored and clients are told apart by
+    their peer address.
+    """
+
+    def __init__(
+        self,
+        app,
+        limits: Dict[Tuple[str, str], Limit],
+        backend: Optional[RateLimitBackend] = None,
+        trusted_proxies: int = 0,
+    ):
+        self.app = app
+        self.limits = limits
+        self.backend = backend or LocalTokenBuckets()
+        self.trusted_proxies = trusted_proxies
+        # Wildcard paths are tried in order when no exact path matches; each
+        # matching path still gets its own buckets
+        self._patterns = [
+            (method, _path_pattern(path), limit)
+            for (method, path), limit in limits.items()
+            if "*" in path.split("/")
+        ]
+
+    def limit_for(self, method: str, path: str) -> Optional[Limit]:
+        limit = self.limits.get((method, path))
+        if limit is None:
+            for pattern_method, pattern, pattern_limit in self._patterns:
+                if pattern_method == method and pattern.match(path):
+                    return pattern_limit
+        return limit
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        limit = self.limit_for(scope["method"], scope["path"])
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        key = f'{scope["method"]} {scope["path"]} {client_id(scope, self.trusted_proxies)}'
+        retry_after = await self.backend.acquire(key, *limit)
+        if retry_after <= 0:
+            return await self.app(scope, receive, send)
+
+        body = b'{"detail":"Too many requests"}'
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(math.ceil(retry_after)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,192 @@
+"""Pre-serialized response bodies with precompressed variants and strong ETags."""
+import gzip
+import hashlib
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterable, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, clients fall back to gzip
+    brotli = None
+
+# Bodies smaller than this are not worth a Content-Encoding round trip
+MIN_COMPRESS_SIZE = 512
+
+
+def _accepted_encodings(header: str) -> set:
+    """Parse Accept-Encoding into the set of codings with a non-zero q-value"""
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.lower())
+    return accepted
+
+
+class SerializedBody:
+    """A JSON body encoded once, with gzip/brotli variants and their ETags"""
+
+    __slots__ = ("body", "media_type", "gzip", "br", "etag", "_etags")
+
+    def __init__(self, body: bytes, media_type: str = "application/json"):
+        self.body = body
+        self.media_type = media_type
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.gzip = None
+        self.br = None
+        if len(body) >= MIN_COMPRESS_SIZE:
+            self.gzip = gzip.compress(body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.br = brotli.compress(body, quality=11)
+        # Each representation gets its own strong validator (RFC 9110 8.8.3)
+        self._etags = {
+            None: self.etag,
+            "gzip": f'"{digest}-gzip"',
+            "br": f'"{digest}-br"',
+        }
+
+    @property
+    def size(self) -> int:
+        """Total bytes held by this entry, across all variants"""
+        return len(self.body) + len(self.gzip or b"") + len(self.br or b"")
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """Return True when If-None-Match names any variant of this body"""
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return not tags.isdisjoint(self._etags.values())
+
+    def respond(self, request: Request, cache_control: str) -> Response:
+        """Build a response for this body, honouring conditional and encoding headers"""
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        if self.br is not None and "br" in accepted:
+            coding, content = "br", self.br
+        elif self.gzip is not None and "gzip" in accepted:
+            coding, content = "gzip", self.gzip
+        else:
+            coding, content = None, self.body
+
+        headers = {
+            "ETag": self._etags[coding],
+            "Cache-Control": cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if self.matches(request.headers.get("if-none-match")):
+            return Response(status_code=304, headers=headers)
+        if coding is not None:
+            headers["Content-Encoding"] = coding
+        return Response(content=content, media_type=self.media_type, headers=headers)
+
+
+class SerializedCache:
+    """Serialized bodies keyed by name, rebuilt only when the content version changes
+
+    With max_entries set the cache evicts least recently used entries, which
+    bounds memory when keys come from client input (e.g. field projections).
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, media_type: str = "application/json"):
+        self.max_entries = max_entries
+        self.media_type = media_type
+        self._entries: "OrderedDict[Hashable, Tuple[Hashable, SerializedBody]]" = OrderedDict()
+
+    def get(self, key: Hashable, version: Hashable, build: Callable[[], bytes]) -> SerializedBody:
+        """Return the cached body for key, calling build() if version has moved on"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self._entries.move_to_end(key)
+            return entry[1]
+        body = SerializedBody(build(), self.media_type)
+        self._entries[key] = (version, body)
+        self._entries.move_to_end(key)
+        if self.max_entries is not None and len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return body
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop one entry, or every entry when key is None"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class ByteBudgetCache:
+    """LRU of values with a known size in bytes, holding at most max_bytes in total
+
+    Hits, misses and evictions are counted for /metrics. A value larger than
+    the whole budget is not cached.
+    """
+
+    def __init__(self, max_bytes: int, name: str = "cache"):
+        self.max_bytes = max_bytes
+        self.name = name
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def peek(self, key: Hashable) -> Any:
+        """Like get(), without counting or refreshing the entry"""
+        entry = self._entries.get(key)
+        return None if entry is None else entry[0]
+
+    def put(self, key: Hashable, value: Any, size: int):
+        self.pop(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.bytes -= evicted
+            self.evictions += 1
+
+    def pop(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def exposition(self) -> Iterable[str]:
+        name = self.name
+        yield f"# HELP {name}_bytes Bytes held by the cache."
+        yield f"# TYPE {name}_bytes gauge"
+        yield f"{name}_bytes {self.bytes}"
+        yield f"# HELP {name}_entries Entries held by the cache."
+        yield f"# TYPE {name}_entries gauge"
+        yield f"{name}_entries {len(self._entries)}"
+        for counter, value in (("hits", self.hits), ("misses", self.misses), ("evictions", self.evictions)):
+            yield f"# HELP {name}_{counter}_total Cache {counter}."
+            yield f"# TYPE {name}_{counter}_total counter"
+            yield f"{name}_{counter}_total {value}"
@@ -0,0 +1,161 @@
+"""Ranked full-text search over contact submissions, by message, name and email domain."""
+import base64
+import json
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from pymongo import ASCENDING
+
+from submissions import SUBMISSION_FIELDS, SUBMISSION_PROJECTION, CursorError
+
+# Relative weight of a matching word per field, for both backends
+SEARCH_WEIGHTS = {"name": 5, "email": 3, "message": 1}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words; "@" and "." split emails, so a domain matches as its parts"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def encode_page(offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"o": offset}).encode()).decode().rstrip("=")
+
+
+def decode_page(token: str) -> int:
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))["o"]
+    except (ValueError, TypeError, KeyError) as e:
+        raise CursorError("Invalid cursor") from e
+    if not isinstance(offset, int) or offset < 0:
+        raise CursorError("Invalid cursor")
+    return offset
+
+
+class SearchBackend:
+    """Where submissions are indexed and searched
+
+    MongoTextSearch queries the text index on contact_submissions and needs no
+    feeding. InMemorySearchIndex keeps its own inverted index, filled at startup
+    and from add/set_status, for test environments without a text index.
+    """
+
+    async def start(self, collection):
+        """Prepare the backend once the database is available"""
+
+    def add(self, submission: Dict[str, Any]):
+        """Index a newly stored main-site submission"""
+
+    def set_status(self, submission_id: str, status: str):
+        """Record a status change"""
+
+    async def search(
+        self,
+        collection,
+        query: str,
+        status: Optional[str] = None,
+        service: Optional[str] = None,
+        offset: int = 0,
+        limit: int = 20,
+    ) -> List[Dict[str, Any]]:
+        """Matching submissions, best first, each with a relevance score"""
+        raise NotImplementedError
+
+
+class MongoTextSearch(SearchBackend):
+    """Search the submission_text index; only submissions containing a query word are read"""
+
+    async def start(self, collection):
+        # A collection has at most one text index, so it is created here rather
+        # than with the listing indexes
+        await collection.create_index(
+            [(field, "text") for field in SEARCH_WEIGHTS],
+            name="submission_text",
+            weights=SEARCH_WEIGHTS,
+            default_language="english",
+        )
+
+    async def search(self, collection, query, status=None, service=None, offset=0, limit=20):
+        criteria: Dict[str, Any] = {"$text": {"$search": query}}
+        if status is not None:
+            criteria["status"] = status
+        if service is not None:
+            criteria["service"] = service
+        score = {"$meta": "textScore"}
+        return await (
+            collection.find(criteria, {**SUBMISSION_PROJECTION, "score": score})
+            .sort([("score", score), ("id", ASCENDING)])
+            .skip(offset)
+            .limit(limit)
+            .to_list(limit)
+        )
+
+
+class InMemorySearchIndex(SearchBackend):
+    """Inverted index of word -> {submission id: weight}, held per process
+
+    A query reads only the postings of its own words, so its cost follows the
+    number of matches rather than the size of the collection. Each worker sees
+    only the submissions it loaded at startup or stored itself.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._rows: Dict[str, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    async def start(self, collection):
+        self._postings.clear()
+        self._rows.clear()
+        async for doc in collection.find({}, SUBMISSION_PROJECTION).batch_size(1000):
+            self.add(doc)
+
+    def add(self, submission):
+        row = {field: submission.get(field) for field in SUBMISSION_FIELDS}
+        self._remove(row["id"])
+        self._rows[row["id"]] = row
+        weights: Counter = Counter()
+        for field, weight in SEARCH_WEIGHTS.items():
+            for term in tokenize(row.get(field) or ""):
+                weights[term] += weight
+        for term, weight in weights.items():
+            self._postings.setdefault(term, {})[row["id"]] = weight
+
+    def set_status(self, submission_id, status):
+        row = self._rows.get(submission_id)
+        if row is not None:
+            row["status"] = status
+
+    def _remove(self, submission_id: str):
+        row = self._rows.pop(submission_id, None)
+        if row is None:
+            return
+        for field in SEARCH_WEIGHTS:
+            for term in tokenize(row.get(field) or ""):
+                postings = self._postings.get(term)
+                if postings is not None:
+                    postings.pop(submission_id, None)
+                    if not postings:
+                        del self._postings[term]
+
+    async def search(self, collection, query, status=None, service=None, offset=0, limit=20):
+        scores: Counter = Counter()
+        for term in set(tokenize(query)):
+            for submission_id, weight in self._postings.get(term, {}).items():
+                scores[submission_id] += weight
+        hits = []
+        for submission_id, score in scores.items():
+            row = self._rows[submission_id]
+            if (status is None or row["status"] == status) and (service is None or row["service"] == service):
+                hits.append((-score, submission_id))
+        hits.sort()
+        return [
+            {**self._rows[submission_id], "score": -score} for score, submission_id in hits[offset:offset + limit]
+        ]
+
+
+SEARCH_BACKENDS = {"mongo": MongoTextSearch, "memory": InMemorySearchIndex}
@@ -1,29 +1,114 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, Body, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.staticfiles import StaticFiles
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, EmailStr
-from typing import List, Dict, Any, Optional
+from pydantic import BaseModel, Field, EmailStr, ValidationError
+from typing import List, Dict, Any, Literal, Optional
+import hmac
 import uuid
-from datetime import datetime
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from datetime import date, datetime, timedelta
+from urllib.parse import parse_qs, urlsplit
 
+from archive import Archiver, SubmissionArchive
+from bulk_import import BulkImporter, ImportReport, UploadError, csv_rows, ndjson_rows
+from circuit_breaker import CLOSED, DATABASE_DOWN, CircuitBreaker
+from contact_writer import ACK_FLUSH, BatchedWriter
+from idempotency import IdempotencyGuard, IdempotencyKeyReused, TTLCache, body_hash, content_key, header_key
+from lead_stats import ensure_rollup_indexes, read_stats, record_submission, record_submissions
+from live_feed import FeedFullError, SubmissionBroker, stream_events
+from metrics import HTTPMetrics, MetricsMiddleware, MongoCommandMetrics, MongoPoolMetrics, render
+from notifications import NotificationOutbox, SMTPPool, ensure_outbox_indexes, outbox_entry
+from portfolio import PortfolioStore, ProjectionError, dump_json, parse_fields, project
+from prerender import ShellTemplate
+from rate_limit import LocalTokenBuckets, RateLimitMiddleware, parse_limits
+from response_cache import ByteBudgetCache, SerializedCache
+from search import SEARCH_BACKENDS, decode_page, encode_page
+from spool import DiskSpool, SpoolReplayer
+from status_workflow import StatusChangeError, apply_status_changes
+from submissions import (
+    LISTING_SORT, SUBMISSION_PROJECTION, TENANT_INDEXES, CursorError, build_filter, cursor_for, decode_cursor,
+    ensure_indexes, encode_rows, export_rows,
+)
+from tenants import SLUG_RE, TenantNotFound, TenantPortfolios, ensure_tenant_indexes
+from tracing import TracedRoute, TracingMiddleware, phase
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Metrics exposed on /metrics; the Mongo listeners are fed by pymongo monitoring
+http_metrics = HTTPMetrics()
+mongo_command_metrics = MongoCommandMetrics()
+mongo_pool_metrics = MongoPoolMetrics()
+
+# MongoDB connection, opened by the app lifespan in each worker process so that
+# no client (and none of its monitor threads or sockets) crosses a fork
+client = None
+db = None
+
+# Database calls fail fast once DB_BREAKER_FAILURES in a row could not reach
+# Mongo; a probe is let through every DB_BREAKER_RESET_SECONDS
+db_breaker = CircuitBreaker(
+    failure_threshold=int(os.environ.get('DB_BREAKER_FAILURES', '5')),
+    reset_timeout=float(os.environ.get('DB_BREAKER_RESET_SECONDS', '15')),
+)
+
+# Client timeouts, unless MONGO_URL sets them itself; pymongo waits 30s by default
+MONGO_TIMEOUTS = {
+    'serverSelectionTimeoutMS': int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '3000')),
+    'connectTimeoutMS': int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '3000')),
+    'socketTimeoutMS': int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', '0')) or None,
+}
+
+# Submissions that arrive while the database is unreachable are kept here and
+# replayed in order once it is back; SPOOL_DIR= (empty) turns the spool off
+SPOOL_DIR = os.environ.get('SPOOL_DIR', str(ROOT_DIR / 'spool'))
+contact_spool = None
+if SPOOL_DIR:
+    contact_spool = DiskSpool(
+        Path(SPOOL_DIR),
+        fsync_interval=int(os.environ.get('SPOOL_FSYNC_INTERVAL_MS', '10')) / 1000,
+        fsync_batch=int(os.environ.get('SPOOL_FSYNC_BATCH', '100')),
+    )
+SPOOL_REPLAY_INTERVAL = float(os.environ.get('SPOOL_REPLAY_INTERVAL_SECONDS', '5'))
+
+# Submissions in one of ARCHIVE_STATUSES for longer than ARCHIVE_AFTER_DAYS move
+# from Mongo to compressed segments under ARCHIVE_DIR; unset keeps everything in Mongo
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', '')
+submission_archive = None
+archiver = None
+if ARCHIVE_DIR:
+    submission_archive = SubmissionArchive(Path(ARCHIVE_DIR), codec=os.environ.get('ARCHIVE_CODEC', 'gzip'))
+    archiver = Archiver(
+        None,
+        submission_archive,
+        statuses=os.environ.get('ARCHIVE_STATUSES', 'resolved').split(','),
+        after_days=float(os.environ.get('ARCHIVE_AFTER_DAYS', '180')),
+        batch_size=int(os.environ.get('ARCHIVE_BATCH_SIZE', '1000')),
+        interval=float(os.environ.get('ARCHIVE_INTERVAL_SECONDS', '3600')),
+    )
 
-# Create the main app without a prefix
-app = FastAPI()
+# "eager" prepares everything before a worker reports ready; "lazy" serves the
+# seeded portfolio at once and loads indexes and content in the background
+STARTUP_MODE = os.environ.get('STARTUP_MODE', 'eager')
+if STARTUP_MODE not in ('eager', 'lazy'):
+    raise ValueError(f"STARTUP_MODE must be 'eager' or 'lazy', not {STARTUP_MODE!r}")
 
-# Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
+# Submission search: "mongo" queries the text index, "memory" keeps a per-process
+# inverted index for test environments
+SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'mongo')
+if SEARCH_BACKEND not in SEARCH_BACKENDS:
+    raise ValueError(f"SEARCH_BACKEND must be one of {sorted(SEARCH_BACKENDS)}, not {SEARCH_BACKEND!r}")
+search_backend = SEARCH_BACKENDS[SEARCH_BACKEND]()
+
+# Create a router with the /api prefix; its routes mark endpoint start and end for Server-Timing
+api_router = APIRouter(prefix="/api", route_class=TracedRoute)
 
 
 # Define Models
@@ -42,6 +127,20 @@ class ContactSubmissionCreate(BaseModel):
     service: str
     message: str
 
+# Any state may follow any other
+SubmissionStatus = Literal["new", "contacted", "resolved"]
+
+class StatusUpdate(BaseModel):
+    status: SubmissionStatus
+    # Optimistic concurrency: the status the client last saw
+    expected_status: Optional[SubmissionStatus] = None
+
+class StatusUpdateItem(StatusUpdate):
+    id: str
+
+class BulkStatusUpdate(BaseModel):
+    updates: List[StatusUpdateItem] = Field(min_length=1, max_length=1000)
+
 class PortfolioData(BaseModel):
     hero: Dict[str, Any]
     about: Dict[str, Any]
@@ -51,7 +150,7 @@ class PortfolioData(BaseModel):
     testimonials: List[Dict[str, Any]]
     contact: Dict[str, Any]
 
-# Portfolio Data
+# Portfolio Data, seeded into the portfolio_content collection on first start
 portfolio_data = {
     "hero": {
         "name": "Gunjan Jagtiani",
@@ -197,59 +296,748 @@ portfolio_data = {
     }
 }
 
+# Portfolio content lives in Mongo; reads are served from this in-memory copy,
+# which notices edits made by other workers within PORTFOLIO_MAX_STALENESS seconds
+portfolio_store = PortfolioStore(
+    None,
+    portfolio_data,
+    max_staleness=float(os.environ.get('PORTFOLIO_MAX_STALENESS', '5')),
+)
+
+# Serialized portfolio responses, rebuilt only when the sections they cover change
+portfolio_cache = SerializedCache()
+PORTFOLIO_CACHE_CONTROL = os.environ.get('PORTFOLIO_CACHE_CONTROL', 'public, max-age=60')
+
+def portfolio_cache_control() -> str:
+    """PORTFOLIO_CACHE_CONTROL, but not before the stored portfolio has replaced the seeded one"""
+    # Under lazy startup the first responses may carry the defaults, which no cache should keep
+    return PORTFOLIO_CACHE_CONTROL if portfolio_store.loaded else 'no-cache'
+
+# Client-chosen ?fields= projections, bounded since keys come from the query string
+portfolio_projection_cache = SerializedCache(max_entries=256)
+
+# The frontend's index.html, served at / with the portfolio and hero inlined so
+# the landing page needs no /api/portfolio round trip. Only a production build
+# is picked up by default, as the public/ template loads no bundle; FRONTEND_SHELL
+# names another file and FRONTEND_SHELL= (empty) turns it off. A template that
+# cannot be read leaves / unserved rather than failing the import.
+DEFAULT_SHELL = ROOT_DIR.parent / 'frontend' / 'build' / 'index.html'
+FRONTEND_SHELL = os.environ.get('FRONTEND_SHELL', str(DEFAULT_SHELL) if DEFAULT_SHELL.exists() else '')
+shell_template = None
+if FRONTEND_SHELL:
+    try:
+        shell_template = ShellTemplate(Path(FRONTEND_SHELL), os.environ.get('PUBLIC_URL', ''))
+    except (OSError, ValueError) as e:
+        logging.getLogger(__name__).warning(f"Not serving the frontend shell: {str(e)}")
+shell_cache = SerializedCache(media_type="text/html; charset=utf-8")
+# Browsers revalidate the page on every visit; an unchanged one is a 304
+SHELL_CACHE_CONTROL = os.environ.get('SHELL_CACHE_CONTROL', 'no-cache')
+
+# Other instructors' portfolios, served under /api/{slug}/; only the serialized
+# bodies of recently requested tenants are kept, within TENANT_CACHE_BYTES
+tenant_portfolios = TenantPortfolios(
+    None,
+    ByteBudgetCache(int(os.environ.get('TENANT_CACHE_BYTES', str(64 * 1024 * 1024))), name="tenant_portfolio_cache"),
+    max_staleness=float(os.environ.get('PORTFOLIO_MAX_STALENESS', '5')),
+)
+
+# First path segments of the main site's routes, which no tenant may take
+RESERVED_SLUGS = {"portfolio", "contact", "contact-submissions", "health"}
+
+def serialize_portfolio() -> bytes:
+    """Validate and encode the portfolio once per content version"""
+    return PortfolioData(**portfolio_store.sections).model_dump_json().encode()
+
+def cached_portfolio():
+    return portfolio_cache.get("portfolio", portfolio_store.version, serialize_portfolio)
+
+def cached_shell():
+    return shell_cache.get(
+        "shell",
+        portfolio_store.version,
+        lambda: shell_template.render(portfolio_store.sections, cached_portfolio().body),
+    )
+
+def cached_section(section: str):
+    return portfolio_cache.get(
+        ("section", section),
+        portfolio_store.versions[section],
+        lambda: dump_json(portfolio_store.sections[section]),
+    )
+
+# Contact form writes: "direct" inserts one document per request, "batched"
+# queues submissions for a background insert_many flusher
+CONTACT_WRITE_MODE = os.environ.get('CONTACT_WRITE_MODE', 'direct')
+CONTACT_WRITE_ACK = os.environ.get('CONTACT_WRITE_ACK', ACK_FLUSH)
+contact_writer = None
+if CONTACT_WRITE_MODE == 'batched':
+    contact_writer = BatchedWriter(
+        None,
+        max_batch=int(os.environ.get('CONTACT_BATCH_SIZE', '100')),
+        max_delay=int(os.environ.get('CONTACT_BATCH_MAX_DELAY_MS', '50')) / 1000,
+        max_queue=int(os.environ.get('CONTACT_QUEUE_SIZE', '10000')),
+    )
+
+# New-contact emails: each submission carries its own outbox record, which
+# background workers deliver over pooled SMTP connections off the request path
+NOTIFY_EMAIL_TO = os.environ.get('NOTIFY_EMAIL_TO')
+notification_outbox = None
+if NOTIFY_EMAIL_TO:
+    notification_workers = int(os.environ.get('NOTIFY_WORKERS', '2'))
+    notification_outbox = NotificationOutbox(
+        None,
+        SMTPPool(
+            host=os.environ.get('SMTP_HOST', 'localhost'),
+            port=int(os.environ.get('SMTP_PORT', '25')),
+            username=os.environ.get('SMTP_USERNAME'),
+            password=os.environ.get('SMTP_PASSWORD'),
+            starttls=os.environ.get('SMTP_STARTTLS', 'false').lower() == 'true',
+            size=notification_workers,
+        ),
+        sender=os.environ.get('NOTIFY_EMAIL_FROM', NOTIFY_EMAIL_TO),
+        recipient=NOTIFY_EMAIL_TO,
+        workers=notification_workers,
+        batch_size=int(os.environ.get('NOTIFY_BATCH_SIZE', '20')),
+        max_attempts=int(os.environ.get('NOTIFY_MAX_ATTEMPTS', '8')),
+        retry_base=float(os.environ.get('NOTIFY_RETRY_BASE_SECONDS', '30')),
+        retry_max=float(os.environ.get('NOTIFY_RETRY_MAX_SECONDS', '3600')),
+    )
+
+# Recently seen idempotency keys; the unique index on idempotency_key catches
+# anything this process has forgotten or never saw. A stored key is released
+# for reuse once IDEMPOTENCY_TTL_SECONDS have passed.
+IDEMPOTENCY_TTL_SECONDS = float(os.environ.get('IDEMPOTENCY_TTL_SECONDS', '86400'))
+contact_idempotency = IdempotencyGuard(TTLCache(
+    max_entries=int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', '10000')),
+    ttl=IDEMPOTENCY_TTL_SECONDS,
+))
+
+# Per-route token buckets, checked before the request body is read
+rate_limits = parse_limits(
+    os.environ.get('RATE_LIMITS', 'POST /api/contact=10/minute:5; POST /api/*/contact=10/minute:5')
+)
+rate_limiter = LocalTokenBuckets()
+# Reverse proxies in front of the app that append to X-Forwarded-For; clients
+# are identified by the address the outermost one saw, or by the peer address when 0
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', '0'))
+
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+# Bulk imports insert IMPORT_BATCH_SIZE rows at a time and list at most
+# IMPORT_MAX_ERRORS of the rows they could not import
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', '1000'))
+IMPORT_MAX_ERRORS = int(os.environ.get('IMPORT_MAX_ERRORS', '1000'))
+
+# Live feed of new submissions; a stream more than FEED_QUEUE_SIZE events behind
+# is dropped and resumes from its Last-Event-ID. FEED_POLL_SECONDS=0 stops the
+# poll that brings in other workers' submissions (fine with a single worker)
+submission_feed = SubmissionBroker(
+    queue_size=int(os.environ.get('FEED_QUEUE_SIZE', '100')),
+    max_subscribers=int(os.environ.get('FEED_MAX_SUBSCRIBERS', '100')),
+    poll_interval=float(os.environ.get('FEED_POLL_SECONDS', '2')),
+)
+FEED_BACKFILL_LIMIT = int(os.environ.get('FEED_BACKFILL_LIMIT', '1000'))
+FEED_HEARTBEAT_SECONDS = float(os.environ.get('FEED_HEARTBEAT_SECONDS', '15'))
+
+async def require_database():
+    """Fail fast with 503 instead of waiting out timeouts while the circuit is open"""
+    if not db_breaker.allows():
+        raise HTTPException(
+            status_code=503,
+            detail="Database unavailable",
+            headers={"Retry-After": str(int(db_breaker.reset_timeout))},
+        )
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Allow the request only with the ADMIN_TOKEN configured for this deployment"""
+    admin_token = os.environ.get('ADMIN_TOKEN')
+    if not admin_token:
+        raise HTTPException(status_code=403, detail="Admin API is disabled")
+    # Constant-time, so response timing does not reveal how much of a guess matched
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), admin_token.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
 async def root():
     return {"message": "Gunjan Jagtiani Wellness Portfolio API"}
 
+@api_router.get("/health")
+async def health():
+    """Readiness: the database circuit state and how many submissions wait in the spool
+
+    Always 200: a degraded worker still serves the portfolio and accepts submissions.
+    """
+    state = db_breaker.state
+    depth = contact_spool.pending() if contact_spool is not None else 0
+    return {
+        "status": "ok" if state == CLOSED and not depth else "degraded",
+        "database": state,
+        "spool_depth": depth,
+    }
+
 @api_router.get("/portfolio", response_model=PortfolioData)
-async def get_portfolio():
-    """Get all portfolio data"""
-    return portfolio_data
+async def get_portfolio(request: Request, fields: Optional[str] = None):
+    """Get all portfolio data, or a projection such as ?fields=hero,services.title"""
+    if fields is None:
+        return cached_portfolio().respond(request, portfolio_cache_control())
 
-@api_router.post("/contact")
-async def submit_contact_form(contact_data: ContactSubmissionCreate):
-    """Submit contact form"""
     try:
-        # Create contact submission object
-        contact_submission = ContactSubmission(**contact_data.dict())
-        
-        # Save to database
-        result = await db.contact_submissions.insert_one(contact_submission.dict())
-        
-        if result.inserted_id:
-            return {
-                "success": True,
-                "message": "Thank you for reaching out! I'll get back to you within 24 hours.",
-                "id": contact_submission.id
-            }
-        else:
+        projection = parse_fields(fields, portfolio_store.field_index())
+    except ProjectionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    cached = portfolio_projection_cache.get(
+        projection,
+        portfolio_store.version_of(section for section, _ in projection),
+        lambda: dump_json(project(portfolio_store.sections, projection)),
+    )
+    return cached.respond(request, portfolio_cache_control())
+
+@api_router.get("/portfolio/{section}")
+async def get_portfolio_section(section: str, request: Request):
+    """Get a single portfolio section"""
+    if section not in PortfolioData.model_fields:
+        raise HTTPException(status_code=404, detail="Unknown portfolio section")
+    return cached_section(section).respond(request, portfolio_cache_control())
+
+@api_router.put("/portfolio/{section}", dependencies=[Depends(require_admin)])
+async def update_portfolio_section(section: str, content: Any = Body(...)):
+    """Replace a portfolio section (for admin use)"""
+    if section not in PortfolioData.model_fields:
+        raise HTTPException(status_code=404, detail="Unknown portfolio section")
+    try:
+        validated = PortfolioData(**{**portfolio_store.sections, section: content})
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    try:
+        version = await portfolio_store.update_section(section, getattr(validated, section))
+        return {"success": True, "section": section, "version": version}
+    except Exception as e:
+        logger.error(f"Error updating portfolio section: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+def submission_collection(tenant: Optional[str] = None):
+    """contact_submissions for the main site, tenant_contact_submissions for a tenant"""
+    return db.contact_submissions if tenant is None else db.tenant_contact_submissions
+
+async def store_submission(document: Dict[str, Any]):
+    """Save to database, either directly or through the write-behind batcher
+
+    Both paths go through db_breaker: the batcher runs each flush through it,
+    which also covers submissions acknowledged before their batch is written.
+    The batcher writes the main site's submissions only.
+    """
+    if contact_writer is not None and "tenant" not in document:
+        await contact_writer.submit(document, ack=CONTACT_WRITE_ACK)
+    else:
+        collection = submission_collection(document.get("tenant"))
+        result = await db_breaker.call(lambda: collection.insert_one(document))
+        if not result.inserted_id:
             raise HTTPException(status_code=500, detail="Failed to save contact submission")
-            
+
+async def submission_stored(document: Dict[str, Any]):
+    """Index, announce and count a submission that is now in the database"""
+    if "tenant" not in document:
+        # Search and the live feed cover the main site only
+        search_backend.add(document)
+        submission_feed.publish(document)
+    if notification_outbox is not None:
+        notification_outbox.wake()
+    try:
+        await record_submission(db.lead_stats, document)
+    except Exception as e:
+        # The submission is stored; the rollup is repaired by `python lead_stats.py rebuild`
+        logger.error(f"Error updating lead stats: {str(e)}")
+
+async def store_spooled_submission(document: Dict[str, Any]):
+    """Replay one spooled submission; one already stored is skipped"""
+    # An _id left from the failed write would date the insert to then, out of the live feed's poll
+    document.pop("_id", None)
+    try:
+        await submission_collection(document.get("tenant")).insert_one(document)
+    except DuplicateKeyError:
+        return
+    await submission_stored(document)
+
+async def spool_unwritten(documents: List[Dict[str, Any]], error: Exception):
+    """Spool submissions already acknowledged at enqueue whose batched insert failed"""
+    if contact_spool is None:
+        raise error
+    await asyncio.gather(*(contact_spool.append(document) for document in documents))
+    logger.warning(f"Spooled {len(documents)} contact submissions after a failed batch: {str(error)}")
+
+async def ping_database():
+    await db.command("ping")
+
+def idempotency_fields(key: str, submitted_at: datetime, fingerprint: Optional[str] = None) -> Dict[str, Any]:
+    """Fields that hold key on a stored submission until its idempotency window is over"""
+    fields = {
+        "idempotency_key": key,
+        "idempotency_expires_at": submitted_at + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS),
+    }
+    if fingerprint is not None:
+        fields["idempotency_hash"] = fingerprint
+    return fields
+
+async def release_expired_keys(keys: List[str], tenant: Optional[str] = None) -> int:
+    """Free those of keys whose submission is past its idempotency window; returns how many"""
+    expired = [
+        {"idempotency_expires_at": {"$lte": datetime.utcnow()}},
+        # Stored before keys expired
+        {"idempotency_expires_at": {"$exists": False}},
+    ]
+    result = await submission_collection(tenant).update_many(
+        {"idempotency_key": {"$in": keys}, "$or": expired},
+        {"$unset": {"idempotency_key": "", "idempotency_hash": "", "idempotency_expires_at": ""}},
+    )
+    return result.modified_count
+
+async def save_contact_submission(
+    contact_data: ContactSubmissionCreate,
+    idempotency_key: str,
+    tenant: Optional[str] = None,
+    fingerprint: Optional[str] = None,
+):
+    """Insert a submission and return its id, or the id of the original on a duplicate key
+
+    While the database is unreachable the submission goes to the disk spool instead.
+    Raises IdempotencyKeyReused when the original was stored with another fingerprint.
+    """
+    contact_submission = ContactSubmission(**contact_data.dict())
+    document = {
+        **contact_submission.dict(),
+        **idempotency_fields(idempotency_key, contact_submission.submitted_at, fingerprint),
+    }
+    if tenant is not None:
+        document["tenant"] = tenant
+    elif notification_outbox is not None:
+        # Notifications go to the main site's inbox, so tenant submissions send none
+        document["notification"] = outbox_entry(contact_submission.submitted_at)
+    try:
+        with phase("db"):
+            await store_submission(document)
+    except DATABASE_DOWN as e:
+        if contact_spool is None:
+            raise
+        await contact_spool.append(document)
+        logger.warning(f"Spooled contact submission {contact_submission.id}: {str(e)}")
+        return contact_submission.id
+    except (DuplicateKeyError, BulkWriteError) as e:
+        if isinstance(e, BulkWriteError) and any(
+            error.get("code") != 11000 for error in e.details.get("writeErrors", [])
+        ):
+            raise
+        if await release_expired_keys([idempotency_key], tenant):
+            # The submission holding the key is past its window, so this one is new
+            return await save_contact_submission(contact_data, idempotency_key, tenant, fingerprint)
+        # Another worker, or an earlier retry, already stored this submission
+        original = await submission_collection(tenant).find_one(
+            {"idempotency_key": idempotency_key}, {"_id": 0, "id": 1, "idempotency_hash": 1}
+        )
+        if original is None:
+            raise
+        if original.get("idempotency_hash") != fingerprint:
+            raise IdempotencyKeyReused(idempotency_key)
+        return original["id"]
+
+    if contact_writer is None or tenant is not None:
+        # The batched writer calls submissions_stored once the batch is written
+        await submission_stored(document)
+    return contact_submission.id
+
+@api_router.post("/contact")
+async def submit_contact_form(
+    contact_data: ContactSubmissionCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+):
+    """Submit contact form
+
+    Retries carrying the same Idempotency-Key header, or the same email, service
+    and message when there is no header, return the original response. A key
+    reused with a different body is rejected with 422.
+    """
+    return await accept_contact_submission(contact_data, response, idempotency_key)
+
+async def accept_contact_submission(
+    contact_data: ContactSubmissionCreate,
+    response: Response,
+    idempotency_key: Optional[str],
+    tenant: Optional[str] = None,
+):
+    fingerprint = None
+    if idempotency_key:
+        key = header_key(idempotency_key)
+        # Header keys are chosen by clients, so a retry must also carry the same body
+        fingerprint = body_hash(contact_data.dict())
+    else:
+        key = content_key(contact_data.email, contact_data.service, contact_data.message)
+    if tenant is not None:
+        # Keys are unique within a tenant, not across tenants
+        key = f"tenant:{tenant}:{key}"
+    try:
+        submission_id, replayed = await contact_idempotency.run(
+            key, lambda: save_contact_submission(contact_data, key, tenant, fingerprint), fingerprint
+        )
+    except IdempotencyKeyReused:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
     except Exception as e:
         logger.error(f"Error submitting contact form: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-@api_router.get("/contact-submissions")
-async def get_contact_submissions():
-    """Get all contact submissions (for admin use)"""
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return {
+        "success": True,
+        "message": "Thank you for reaching out! I'll get back to you within 24 hours.",
+        "id": submission_id
+    }
+
+def imported_submission(row: Dict[str, Any]) -> Dict[str, Any]:
+    """The document stored for one imported row; raises ValidationError"""
+    # Validated once; model_construct only fills in id, submitted_at and status
+    contact_submission = ContactSubmission.model_construct(**ContactSubmissionCreate(**row).dict())
+    # Keyed like a form submission without a header, so a lead already stored is not stored again
+    key = content_key(contact_submission.email, contact_submission.service, contact_submission.message)
+    return {**contact_submission.dict(), **idempotency_fields(key, contact_submission.submitted_at)}
+
+async def submissions_stored(documents: List[Dict[str, Any]]):
+    """Index, announce and count a batch of submissions that are now in the database
+
+    Imported submissions carry no outbox record, so no notification emails are sent for them.
+    """
+    for document in documents:
+        if "tenant" not in document:
+            search_backend.add(document)
+            submission_feed.publish(document)
+    if notification_outbox is not None and any("notification" in document for document in documents):
+        notification_outbox.wake()
+    try:
+        await record_submissions(db.lead_stats, documents)
+    except Exception as e:
+        logger.error(f"Error updating lead stats: {str(e)}")
+
+@api_router.post(
+    "/contact-submissions/import", dependencies=[Depends(require_admin), Depends(require_database)]
+)
+async def import_contact_submissions(request: Request, format: str = Query("ndjson", pattern="^(ndjson|csv)$")):
+    """Import a lead list uploaded as NDJSON or CSV (for admin use)
+
+    The body is read, validated and inserted in batches as it arrives. The
+    response counts imported, duplicate and failed rows and lists the rows that
+    were not imported. Uploading a list again imports only the rows that are new.
+    """
+    if format == "csv":
+        rows = csv_rows(request.stream(), required=list(ContactSubmissionCreate.model_fields))
+    else:
+        rows = ndjson_rows(request.stream())
+    importer = BulkImporter(
+        db.contact_submissions,
+        imported_submission,
+        submissions_stored,
+        release=release_expired_keys,
+        breaker=db_breaker,
+        batch_size=IMPORT_BATCH_SIZE,
+        max_errors=IMPORT_MAX_ERRORS,
+    )
+    report = ImportReport(IMPORT_MAX_ERRORS)
+    try:
+        await importer.run(rows, report)
+    except UploadError as e:
+        return ORJSONResponse(status_code=400, content={"detail": str(e), **report.as_dict()})
+    except DATABASE_DOWN as e:
+        logger.warning(f"Contact submission import interrupted: {str(e)}")
+        return ORJSONResponse(
+            status_code=503,
+            content={"detail": "Database unavailable", **report.as_dict()},
+            headers={"Retry-After": str(int(db_breaker.reset_timeout))},
+        )
+    except Exception as e:
+        logger.error(f"Error importing contact submissions: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    return report.as_dict()
+
+@api_router.get("/contact-submissions", dependencies=[Depends(require_admin), Depends(require_database)])
+async def get_contact_submissions(
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status: Optional[SubmissionStatus] = None,
+    service: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """Get contact submissions newest first, one page at a time (for admin use)
+
+    The continuation token for the next page is returned in the X-Next-Cursor
+    header and passed back as ?cursor=; it is absent on the last page. Rows are
+    projected by Mongo and encoded as-is, without a model per document.
+    """
     try:
-        submissions = await db.contact_submissions.find().sort("submitted_at", -1).to_list(100)
-        return [ContactSubmission(**submission) for submission in submissions]
+        query = build_filter(status=status, service=service, since=since, until=until, after=cursor)
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await list_submissions(query, limit)
+
+async def list_submissions(query: Dict[str, Any], limit: int, tenant: Optional[str] = None):
+    try:
+        submissions = await (
+            submission_collection(tenant).find(query, SUBMISSION_PROJECTION)
+            .sort(LISTING_SORT)
+            .limit(limit + 1)
+            .to_list(limit + 1)
+        )
+        headers = {}
+        if len(submissions) > limit:
+            submissions = submissions[:limit]
+            headers["X-Next-Cursor"] = cursor_for(submissions[-1])
+        return ORJSONResponse(submissions, headers=headers)
     except Exception as e:
         logger.error(f"Error fetching contact submissions: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-# Include the router in the main app
-app.include_router(api_router)
+@api_router.get("/contact-submissions/search", dependencies=[Depends(require_admin), Depends(require_database)])
+async def search_contact_submissions(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    status: Optional[SubmissionStatus] = None,
+    service: Optional[str] = None,
+):
+    """Find submissions by words in their message, name or email, best match first (for admin use)
+
+    Each row carries a relevance score. As with the listing, the next page's
+    token is returned in X-Next-Cursor and passed back as ?cursor=.
+    """
+    try:
+        offset = decode_page(cursor) if cursor is not None else 0
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        rows = await search_backend.search(
+            db.contact_submissions, q, status=status, service=service, offset=offset, limit=limit + 1
+        )
+    except Exception as e:
+        logger.error(f"Error searching contact submissions: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = encode_page(offset + limit)
+    return ORJSONResponse(rows, headers=headers)
+
+@api_router.get("/contact-submissions/stats", dependencies=[Depends(require_admin), Depends(require_database)])
+async def get_contact_submission_stats(
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    service: Optional[str] = None,
+):
+    """Submission counts per service, status and day, from the lead_stats rollup (for admin use)
+
+    Days are UTC dates; since is inclusive and until exclusive.
+    """
+    try:
+        return await read_stats(db.lead_stats, since=since, until=until, service=service)
+    except Exception as e:
+        logger.error(f"Error fetching lead stats: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+def index_status_changes(changes, updated):
+    statuses = {submission_id: status for submission_id, status, _ in changes}
+    for submission_id in updated:
+        search_backend.set_status(submission_id, statuses[submission_id])
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
+@api_router.patch("/contact-submissions", dependencies=[Depends(require_admin), Depends(require_database)])
+async def update_contact_submission_statuses(batch: BulkStatusUpdate):
+    """Change the status of many submissions in one round trip (for admin use)
+
+    Rows are reported as updated, unchanged (already in that status), conflicts
+    (changed by someone else, with their current status) or not_found; the rest
+    of the batch is applied either way.
+    """
+    changes = [(update.id, update.status, update.expected_status) for update in batch.updates]
+    try:
+        outcome = await apply_status_changes(db.contact_submissions, db.lead_stats, changes)
+    except StatusChangeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error updating contact submission statuses: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    index_status_changes(changes, outcome["updated"])
+    return {"success": True, **outcome}
+
+@api_router.patch(
+    "/contact-submissions/{submission_id}", dependencies=[Depends(require_admin), Depends(require_database)]
 )
+async def update_contact_submission_status(submission_id: str, update: StatusUpdate):
+    """Change the status of a submission (for admin use)"""
+    try:
+        outcome = await apply_status_changes(
+            db.contact_submissions, db.lead_stats, [(submission_id, update.status, update.expected_status)]
+        )
+    except Exception as e:
+        logger.error(f"Error updating contact submission status: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    if outcome["not_found"]:
+        raise HTTPException(status_code=404, detail="Contact submission not found")
+    if outcome["conflicts"]:
+        current = outcome["conflicts"][0]["status"]
+        raise HTTPException(status_code=409, detail=f"Contact submission status is {current!r}")
+    index_status_changes([(submission_id, update.status, None)], outcome["updated"])
+    return {"success": True, "id": submission_id, "status": update.status, "changed": bool(outcome["updated"])}
+
+@api_router.get("/contact-submissions/export", dependencies=[Depends(require_admin), Depends(require_database)])
+async def export_contact_submissions(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    resume: Optional[str] = None,
+    include_cursor: bool = False,
+    status: Optional[SubmissionStatus] = None,
+    service: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """Stream every matching submission oldest first as NDJSON or CSV (for admin use)
+
+    With include_cursor=true each row carries a cursor; passing the last one
+    received as ?resume= continues an interrupted export after that row.
+    """
+    try:
+        query = build_filter(status=status, service=service, since=since, until=until, after=resume, ascending=True)
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        export_rows(db.contact_submissions, query, format, include_cursor, EXPORT_BATCH_SIZE),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="contact-submissions.{format}"'},
+    )
+
+def require_archive():
+    if submission_archive is None:
+        raise HTTPException(status_code=404, detail="The submission archive is not enabled")
+
+@api_router.get("/contact-submissions/archive", dependencies=[Depends(require_admin), Depends(require_archive)])
+async def export_archived_submissions(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """Stream archived submissions oldest first as NDJSON or CSV, like the export (for admin use)"""
+    return StreamingResponse(
+        encode_rows(submission_archive.iter_scan(since, until), format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="archived-submissions.{format}"'},
+    )
+
+@api_router.get("/contact-submissions/archive/{submission_id}", dependencies=[Depends(require_admin), Depends(require_archive)])
+async def get_archived_submission(submission_id: str, day: Optional[date] = None):
+    """One archived submission by id; day, its UTC submission date, narrows the sidecars read"""
+    try:
+        doc = await asyncio.to_thread(submission_archive.find, submission_id, day and day.isoformat())
+    except Exception as e:
+        logger.error(f"Error reading the submission archive: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Archived contact submission not found")
+    return doc
+
+@api_router.get("/contact-submissions/feed", dependencies=[Depends(require_admin), Depends(require_database)])
+async def stream_contact_submissions(
+    cursor: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None),
+):
+    """Server-sent events for each new submission, as it is stored (for admin use)
+
+    Each event id is a listing cursor. A reconnecting EventSource sends the last
+    one as Last-Event-ID, and ?cursor= does the same for a new page, so anything
+    stored in between is sent first.
+    """
+    after = last_event_id or cursor
+    if after is not None:
+        try:
+            decode_cursor(after)
+        except CursorError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    try:
+        subscription = submission_feed.subscribe()
+    except FeedFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    return StreamingResponse(
+        stream_events(submission_feed, subscription, after, FEED_BACKFILL_LIMIT, FEED_HEARTBEAT_SECONDS),
+        media_type="text/event-stream",
+        # Proxies must pass events through as they are written
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Tenant routes come last, so that the main site's routes win over /api/{slug}/...
+async def tenant_portfolio(slug: str):
+    """The tenant's serialized portfolio, or 404"""
+    if not SLUG_RE.match(slug):
+        raise HTTPException(status_code=404, detail="Unknown tenant")
+    try:
+        return await tenant_portfolios.get(slug)
+    except TenantNotFound:
+        raise HTTPException(status_code=404, detail="Unknown tenant")
+    except Exception as e:
+        logger.error(f"Error loading tenant portfolio: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@api_router.get("/{slug}/portfolio")
+async def get_tenant_portfolio(request: Request, portfolio=Depends(tenant_portfolio)):
+    """Get a tenant's portfolio, from the serialized LRU when it is there"""
+    return portfolio.respond(request, PORTFOLIO_CACHE_CONTROL)
+
+@api_router.put("/{slug}/portfolio", dependencies=[Depends(require_admin)])
+async def put_tenant_portfolio(slug: str, content: PortfolioData):
+    """Create or replace a tenant's whole portfolio (for admin use)"""
+    if not SLUG_RE.match(slug) or slug in RESERVED_SLUGS:
+        raise HTTPException(
+            status_code=400, detail="Tenant slugs are lowercase letters, digits and dashes, and not reserved"
+        )
+    try:
+        version = await tenant_portfolios.put(slug, content.model_dump())
+        return {"success": True, "slug": slug, "version": version}
+    except Exception as e:
+        logger.error(f"Error updating tenant portfolio: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@api_router.post("/{slug}/contact")
+async def submit_tenant_contact_form(
+    contact_data: ContactSubmissionCreate,
+    response: Response,
+    slug: str,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    _portfolio=Depends(tenant_portfolio),
+):
+    """Submit a tenant's contact form; the submission is stored with its tenant"""
+    return await accept_contact_submission(contact_data, response, idempotency_key, tenant=slug)
+
+@api_router.get("/{slug}/contact-submissions", dependencies=[Depends(require_admin), Depends(require_database)])
+async def get_tenant_contact_submissions(
+    slug: str,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status: Optional[SubmissionStatus] = None,
+    service: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """Get one tenant's contact submissions newest first, paged like /contact-submissions (for admin use)"""
+    try:
+        query = build_filter(tenant=slug, status=status, service=service, since=since, until=until, after=cursor)
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await list_submissions(query, limit, tenant=slug)
+
+async def get_metrics():
+    """Prometheus metrics for routes and the Mongo client"""
+    return Response(
+        content=render(http_metrics, mongo_command_metrics, mongo_pool_metrics, tenant_portfolios.cache),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+async def get_shell(request: Request):
+    """The frontend's index.html with the current portfolio inlined"""
+    return cached_shell().respond(request, SHELL_CACHE_CONTROL)
 
 # Configure logging
 logging.basicConfig(
@@ -258,6 +1046,182 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
+def connect_database():
+    """Open the Motor client for this worker process"""
+    # Imported here to keep motor off the import path of server.py
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    url = os.environ['MONGO_URL']
+    in_url = {option.lower() for option in parse_qs(urlsplit(url).query)}
+    timeouts = {option: value for option, value in MONGO_TIMEOUTS.items() if option.lower() not in in_url}
+    mongo_client = AsyncIOMotorClient(url, event_listeners=[mongo_command_metrics, mongo_pool_metrics], **timeouts)
+    return mongo_client, mongo_client[os.environ['DB_NAME']]
+
+def bind_database(database):
+    """Point the request handlers and background components at database"""
+    global db
+    db = database
+    portfolio_store.collection = database.portfolio_content
+    if contact_writer is not None:
+        contact_writer.collection = database.contact_submissions
+        contact_writer.on_stored = submissions_stored
+        contact_writer.on_failed = spool_unwritten
+        contact_writer.breaker = db_breaker
+    if notification_outbox is not None:
+        notification_outbox.collection = database.contact_submissions
+    submission_feed.collection = database.contact_submissions
+    if archiver is not None:
+        archiver.collection = database.contact_submissions
+    tenant_portfolios.collection = database.tenant_portfolios
+
+def warm_portfolio_cache():
+    """Serialize the portfolio, every section and the page before the first request arrives"""
+    cached_portfolio()
+    for section in PortfolioData.model_fields:
+        cached_section(section)
+    if shell_template is not None:
+        cached_shell()
+
+async def prepare_database():
+    """Ensure indexes and load the stored portfolio"""
+    try:
+        await ensure_indexes(db.contact_submissions)
+        await ensure_indexes(db.tenant_contact_submissions, TENANT_INDEXES)
+    except Exception as e:
+        logger.error(f"Error creating contact submission indexes: {str(e)}")
+    try:
+        await ensure_rollup_indexes(db.lead_stats)
+    except Exception as e:
+        logger.error(f"Error creating lead stats indexes: {str(e)}")
+    if notification_outbox is not None:
+        try:
+            await ensure_outbox_indexes(db.contact_submissions)
+        except Exception as e:
+            logger.error(f"Error creating notification outbox indexes: {str(e)}")
+    try:
+        await search_backend.start(db.contact_submissions)
+    except Exception as e:
+        logger.error(f"Error preparing submission search: {str(e)}")
+    try:
+        await ensure_tenant_indexes(db.tenant_portfolios)
+    except Exception as e:
+        logger.error(f"Error creating tenant portfolio indexes: {str(e)}")
+    await portfolio_store.start()
+
 async def shutdown_db_client():
+    await portfolio_store.stop()
+    # Ends open feed streams, which would otherwise hold up a graceful shutdown
+    await submission_feed.stop()
+    if archiver is not None:
+        # A run cut short leaves nothing half done; the next one picks it up
+        await archiver.stop()
+    if contact_writer is not None:
+        # Drain queued submissions before the client goes away
+        await contact_writer.close()
+    if notification_outbox is not None:
+        await notification_outbox.stop()
+    if contact_spool is not None:
+        # Unreplayed segments stay on disk for the next worker
+        await contact_spool.close()
     client.close()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Per-worker startup and graceful shutdown"""
+    global client
+    client, database = connect_database()
+    bind_database(database)
+    if contact_writer is not None:
+        await contact_writer.start()
+    if notification_outbox is not None:
+        await notification_outbox.start()
+    await submission_feed.start()
+    if archiver is not None:
+        await archiver.start()
+    replayer = None
+    if contact_spool is not None:
+        # spool_depth starts from the records already on disk
+        await contact_spool.recount()
+        # Also picks up segments left behind by workers that have exited
+        replayer = SpoolReplayer(
+            contact_spool, db_breaker, ping_database, store_spooled_submission, SPOOL_REPLAY_INTERVAL
+        )
+        await replayer.start()
+    preparing = None
+    if STARTUP_MODE == 'lazy':
+        # Caches fill on first use; the portfolio is swapped in once loaded
+        preparing = asyncio.create_task(prepare_database())
+    else:
+        await prepare_database()
+        warm_portfolio_cache()
+    logger.info(f"Worker {os.getpid()} ready ({STARTUP_MODE} startup)")
+    yield
+    if preparing is not None and not preparing.done():
+        preparing.cancel()
+        with suppress(asyncio.CancelledError):
+            await preparing
+    if replayer is not None:
+        await replayer.stop()
+    await shutdown_db_client()
+
+def create_app() -> FastAPI:
+    """Build the ASGI app
+
+    Safe to call before forking worker processes: nothing here opens a
+    connection, the Mongo client is created by the lifespan in each worker.
+    """
+    # Create the main app without a prefix; orjson encodes responses that
+    # handlers do not render themselves
+    app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+    app.add_api_route("/metrics", get_metrics, include_in_schema=False)
+    if shell_template is not None:
+        app.add_api_route("/", get_shell, include_in_schema=False)
+        # A production build's scripts and styles, for deployments without a separate static host
+        assets = shell_template.path.parent / 'static'
+        if assets.is_dir():
+            app.mount("/static", StaticFiles(directory=assets), name="static")
+
+    # Include the router in the main app
+    app.include_router(api_router)
+
+    # Shed abusive clients before their request body is read or validated;
+    # added before CORS so that 429 responses still carry CORS headers
+    app.add_middleware(
+        RateLimitMiddleware, limits=rate_limits, backend=rate_limiter, trusted_proxies=TRUSTED_PROXY_COUNT
+    )
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "Retry-After", "Server-Timing"],
+    )
+
+    # Its timings include rate limiting and CORS handling
+    app.add_middleware(MetricsMiddleware, metrics=http_metrics, routes=app.routes)
+
+    # Outermost: per-phase Server-Timing and request logs, and a sampling profile
+    # of the request for admins sending X-Profile
+    app.add_middleware(
+        TracingMiddleware,
+        admin_token=lambda: os.environ.get('ADMIN_TOKEN'),
+        sample_interval=int(os.environ.get('PROFILE_SAMPLE_INTERVAL_US', '1000')) / 1e6,
+    )
+    return app
+
+app = create_app()
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # Worker processes come from WEB_CONCURRENCY; each builds its own app and client
+    uvicorn.run(
+        "server:create_app",
+        factory=True,
+        host=os.environ.get('HOST', '0.0.0.0'),
+        port=int(os.environ.get('PORT', '8001')),
+        workers=int(os.environ.get('WEB_CONCURRENCY', '1')),
+        timeout_graceful_shutdown=int(os.environ.get('GRACEFUL_SHUTDOWN_SECONDS', '20')),
+    )
@@ -0,0 +1,257 @@
+"""Append-only disk spool that keeps contact submissions while the database is unreachable.
+
+Each worker appends to its own segment file, holding an exclusive flock on it
+for as long as the segment is open. Appends are acknowledged only after an
+fsync, and concurrent appends share one fsync (group commit). Replay reads the
+segments oldest first and re-inserts every record in order. Inserts are
+idempotent on the submission id, so a replay interrupted part way can simply
+run again. A segment whose worker has died is unlocked, so any worker can
+replay it.
+"""
+import asyncio
+import fcntl
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Type
+
+from bson import json_util
+
+from circuit_breaker import CLOSED, DATABASE_DOWN
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".spool"
+REJECTED_FILE = "rejected.ndjson"
+
+
+class DiskSpool:
+    """Segments of newline-delimited extended JSON in directory
+
+    An append waits at most fsync_interval seconds, or until fsync_batch
+    appends are waiting, before the shared fsync that makes it durable.
+    """
+
+    def __init__(self, directory: Path, fsync_interval: float = 0.01, fsync_batch: int = 100):
+        self.directory = Path(directory)
+        self.fsync_interval = fsync_interval
+        self.fsync_batch = fsync_batch
+        self._file = None
+        self._path: Optional[Path] = None
+        self._sealed: List[Tuple[Path, Any]] = []
+        self._waiting: List[asyncio.Future] = []
+        self._sync_task: Optional[asyncio.Task] = None
+        self._batch_full: Optional[asyncio.Event] = None
+        self._replay_lock: Optional[asyncio.Lock] = None
+        # Records in each of this worker's segments
+        self._counts: Dict[Path, int] = {}
+        # Records in every segment, as of the last recount plus this worker's appends since
+        self._pending = 0
+
+    @property
+    def depth(self) -> int:
+        """Records appended by this worker and not replayed yet"""
+        return sum(self._counts.values())
+
+    def segments(self) -> List[Path]:
+        """Every segment in the directory, oldest first"""
+        if not self.directory.is_dir():
+            return []
+        return sorted(self.directory.glob(f"*{SEGMENT_SUFFIX}"))
+
+    def pending(self) -> int:
+        """Records waiting in every segment in the directory, including other workers'
+
+        Kept as a running count: recount() reads the segments, which replay()
+        does when it finishes, and this worker's appends are added as they
+        happen. Other workers' appends since the last recount are not included.
+        """
+        return self._pending
+
+    async def recount(self) -> int:
+        """Count the records in every segment again"""
+        self._pending = await asyncio.to_thread(self._count_records)
+        return self._pending
+
+    def _count_records(self) -> int:
+        total = 0
+        for path in self.segments():
+            try:
+                with open(path, "rb") as f:
+                    total += sum(1 for line in f if line.strip())
+            except FileNotFoundError:
+                pass
+        return total
+
+    def _open_segment(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Named by creation time so segments sort oldest first; locked under a
+        # temporary name so no replayer can see it unlocked
+        name = f"{time.time_ns():020d}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        temporary = self.directory / f"{name}.tmp"
+        self._file = open(temporary, "ab")
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._path = self.directory / f"{name}{SEGMENT_SUFFIX}"
+        os.replace(temporary, self._path)
+
+    async def append(self, document: Dict[str, Any]):
+        """Write document and wait until it is on disk"""
+        if self._file is None:
+            self._open_segment()
+        self._file.write(json_util.dumps(document).encode() + b"\n")
+        self._counts[self._path] = self._counts.get(self._path, 0) + 1
+        self._pending += 1
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.append(future)
+        if self._sync_task is None or self._sync_task.done():
+            self._batch_full = asyncio.Event()
+            self._sync_task = asyncio.create_task(self._sync())
+        elif len(self._waiting) >= self.fsync_batch:
+            self._batch_full.set()
+        await future
+
+    async def _sync(self):
+        while self._waiting:
+            try:
+                await asyncio.wait_for(self._batch_full.wait(), self.fsync_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_full.clear()
+            waiting, self._waiting = self._waiting, []
+            try:
+                self._file.flush()
+                await asyncio.to_thread(os.fsync, self._file.fileno())
+            except Exception as e:
+                for future in waiting:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for future in waiting:
+                if not future.done():
+                    future.set_result(None)
+
+    async def _seal(self):
+        """Stop appending to the current segment; it stays locked until replayed"""
+        if self._file is None:
+            return
+        if self._sync_task is not None:
+            await self._sync_task
+        self._sealed.append((self._path, self._file))
+        self._file = self._path = None
+
+    async def replay(
+        self,
+        insert: Callable[[Dict[str, Any]], Awaitable[Any]],
+        retry_on: Tuple[Type[BaseException], ...] = DATABASE_DOWN,
+    ) -> int:
+        """Insert every spooled record, oldest first; returns how many were handled
+
+        An exception in retry_on stops the replay and leaves the segment for the
+        next one. Any other failure, including a line torn by a crash, means the
+        record can never be inserted, so it is moved to rejected.ndjson rather
+        than blocking the records behind it.
+        """
+        if self._replay_lock is None:
+            self._replay_lock = asyncio.Lock()
+        async with self._replay_lock:
+            await self._seal()
+            own = dict(self._sealed)
+            replayed = 0
+            for path in self.segments():
+                handle = own.get(path)
+                if handle is None:
+                    handle = self._lock_orphan(path)
+                    if handle is None:
+                        continue
+                with open(path, "rb") as f:
+                    lines = [line for line in f if line.strip()]
+                for line in lines:
+                    try:
+                        await insert(json_util.loads(line))
+                    except retry_on:
+                        raise
+                    except Exception as e:
+                        logger.error(f"Rejected spooled submission: {str(e)}")
+                        with open(self.directory / REJECTED_FILE, "ab") as rejected:
+                            rejected.write(line)
+                    replayed += 1
+                path.unlink()
+                handle.close()
+                self._pending = max(0, self._pending - len(lines))
+                if path in own:
+                    self._sealed.remove((path, handle))
+                    self._counts.pop(path, None)
+            # Picks up segments other workers have appended to since the last count
+            await self.recount()
+            return replayed
+
+    @staticmethod
+    def _lock_orphan(path: Path):
+        """Open a segment left by a worker that is gone, or None if its worker holds it"""
+        try:
+            handle = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            handle.close()
+            return None
+        if not path.exists():
+            # Replayed and removed by another worker in the meantime
+            handle.close()
+            return None
+        return handle
+
+    async def close(self):
+        await self._seal()
+        for _, handle in self._sealed:
+            handle.close()
+        self._sealed = []
+
+
+class SpoolReplayer:
+    """Probe the database while the circuit is not closed, and replay the spool once it is"""
+
+    def __init__(self, spool: DiskSpool, breaker, probe, insert, interval: float = 5.0):
+        self.spool = spool
+        self.breaker = breaker
+        self.probe = probe
+        self.insert = insert
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run_once(self) -> int:
+        if self.breaker.state != CLOSED:
+            if not self.breaker.allows():
+                return 0
+            await self.breaker.call(self.probe)
+        if not self.spool.segments():
+            return 0
+        replayed = await self.spool.replay(lambda document: self.breaker.call(lambda: self.insert(document)))
+        if replayed:
+            logger.info(f"Replayed {replayed} spooled submissions")
+        return replayed
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.warning(f"Spool replay deferred: {str(e)}")
@@ -0,0 +1,87 @@
+"""Status changes for contact submissions, applied as compare-and-set updates in one bulk_write."""
+import logging
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from pymongo import UpdateOne
+
+from lead_stats import record_status_changes
+
+logger = logging.getLogger(__name__)
+
+_STATE_PROJECTION = {"_id": 0, "id": 1, "status": 1, "service": 1, "submitted_at": 1, "tenant": 1}
+
+
+class StatusChangeError(ValueError):
+    """Raised for a batch of changes that cannot be applied as a whole"""
+
+
+async def apply_status_changes(
+    submissions,
+    rollup,
+    changes: Sequence[Tuple[str, str, Optional[str]]],
+) -> Dict[str, List[Any]]:
+    """Apply (id, status, expected_status) changes and sort the ids by outcome
+
+    Each update only matches the status that was read just before it, so a
+    submission changed by someone else in between is reported as a conflict
+    rather than overwritten; expected_status, when given, must also match what
+    was read. The whole batch costs one find and one bulk_write, plus one more
+    find when a row was lost to a concurrent change.
+    """
+    ids = [submission_id for submission_id, _, _ in changes]
+    if len(set(ids)) != len(ids):
+        raise StatusChangeError("Each submission may appear only once")
+
+    current = {
+        doc["id"]: doc
+        for doc in await submissions.find({"id": {"$in": ids}}, _STATE_PROJECTION).to_list(None)
+    }
+    outcome: Dict[str, List[Any]] = {"updated": [], "unchanged": [], "conflicts": [], "not_found": []}
+    # Tags the rows this call writes, so a partial match can tell them apart
+    change_id = str(uuid.uuid4())
+    requests, pending = [], []
+    for submission_id, status, expected_status in changes:
+        doc = current.get(submission_id)
+        if doc is None:
+            outcome["not_found"].append(submission_id)
+        elif expected_status is not None and doc["status"] != expected_status:
+            outcome["conflicts"].append({"id": submission_id, "status": doc["status"]})
+        elif doc["status"] == status:
+            outcome["unchanged"].append(submission_id)
+        else:
+            requests.append(UpdateOne(
+                {"id": submission_id, "status": doc["status"]},
+                {"$set": {"status": status, "status_change_id": change_id}},
+            ))
+            pending.append((doc, status))
+    if not requests:
+        return outcome
+
+    result = await submissions.bulk_write(requests, ordered=False)
+    applied = pending
+    if result.matched_count < len(requests):
+        after = {
+            doc["id"]: doc
+            for doc in await submissions.find(
+                {"id": {"$in": [doc["id"] for doc, _ in pending]}},
+                {"_id": 0, "id": 1, "status": 1, "status_change_id": 1},
+            ).to_list(None)
+        }
+        applied = []
+        for doc, status in pending:
+            now = after.get(doc["id"])
+            if now is not None and now.get("status_change_id") == change_id:
+                applied.append((doc, status))
+            elif now is None:
+                outcome["not_found"].append(doc["id"])
+            else:
+                outcome["conflicts"].append({"id": doc["id"], "status": now["status"]})
+    outcome["updated"] = [doc["id"] for doc, _ in applied]
+
+    try:
+        await record_status_changes(rollup, [(doc, doc["status"], status) for doc, status in applied])
+    except Exception as e:
+        # The statuses are stored; the rollup is repaired by `python lead_stats.py rebuild`
+        logger.error(f"Error updating lead stats: {str(e)}")
+    return outcome
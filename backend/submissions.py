@@ -0,0 +1,186 @@
+"""Keyset pagination, filtering, export and indexes for the contact submission collections.
+
+The main site's submissions are in contact_submissions and those sent to a
+tenant's site in tenant_contact_submissions, so tenant volume never adds to the
+index ranges the main site's listings walk.
+"""
+import base64
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Optional, Tuple
+
+import orjson
+from pymongo import ASCENDING, DESCENDING
+
+# Fields served to admins; projecting them drops _id (not JSON serializable)
+# and anything else stored alongside a submission before it leaves mongod
+SUBMISSION_FIELDS = ["id", "name", "email", "service", "message", "submitted_at", "status"]
+# tenant is only stored on submissions to a tenant's site, so only their rows carry it
+SUBMISSION_PROJECTION = {"_id": 0, **{field: 1 for field in SUBMISSION_FIELDS}, "tenant": 1}
+
+# Listings walk the collection newest first; id breaks ties between equal timestamps
+LISTING_SORT = [("submitted_at", DESCENDING), ("id", DESCENDING)]
+
+# Exports walk oldest first so a resume token always points forward; the listing
+# indexes serve this order by being scanned backwards
+EXPORT_SORT = [("submitted_at", ASCENDING), ("id", ASCENDING)]
+
+# Rows are buffered into chunks of roughly this many bytes before being sent
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+# Leading characters that make a spreadsheet treat a CSV cell as a formula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+INDEXES = [
+    ([("id", ASCENDING)], {"unique": True}),
+    (
+        [("idempotency_key", ASCENDING)],
+        {"unique": True, "partialFilterExpression": {"idempotency_key": {"$exists": True}}},
+    ),
+    ([("submitted_at", DESCENDING), ("id", DESCENDING)], {}),
+    ([("status", ASCENDING), ("submitted_at", DESCENDING), ("id", DESCENDING)], {}),
+    # Triage lists filter on status and service together
+    ([("status", ASCENDING), ("service", ASCENDING), ("submitted_at", DESCENDING), ("id", DESCENDING)], {}),
+    ([("service", ASCENDING), ("submitted_at", DESCENDING), ("id", DESCENDING)], {}),
+]
+
+# tenant_contact_submissions: every listing is scoped to one tenant
+TENANT_INDEXES = [
+    ([("id", ASCENDING)], {"unique": True}),
+    (
+        [("idempotency_key", ASCENDING)],
+        {"unique": True, "partialFilterExpression": {"idempotency_key": {"$exists": True}}},
+    ),
+    ([("tenant", ASCENDING), ("submitted_at", DESCENDING), ("id", DESCENDING)], {}),
+    ([("tenant", ASCENDING), ("status", ASCENDING), ("submitted_at", DESCENDING), ("id", DESCENDING)], {}),
+]
+
+
+class CursorError(ValueError):
+    """Raised for a continuation token that was not produced by encode_cursor"""
+
+
+def _naive_utc(value: datetime) -> datetime:
+    """Submissions store naive UTC timestamps; normalize aware inputs to match"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def encode_cursor(submitted_at: datetime, submission_id: str) -> str:
+    """Opaque continuation token for the row at (submitted_at, id)"""
+    raw = json.dumps([submitted_at.isoformat(), submission_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        submitted_at, submission_id = json.loads(raw)
+        return _naive_utc(datetime.fromisoformat(submitted_at)), str(submission_id)
+    except (ValueError, TypeError) as e:
+        raise CursorError("Invalid cursor") from e
+
+
+def cursor_for(doc: Dict[str, Any]) -> str:
+    return encode_cursor(doc["submitted_at"], doc["id"])
+
+
+def build_filter(
+    tenant: Optional[str] = None,
+    status: Optional[str] = None,
+    service: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    after: Optional[str] = None,
+    ascending: bool = False,
+) -> Dict[str, Any]:
+    """Mongo filter for a listing page; after is a cursor from a previous page"""
+    query: Dict[str, Any] = {}
+    if tenant is not None:
+        query["tenant"] = tenant
+    if status is not None:
+        query["status"] = status
+    if service is not None:
+        query["service"] = service
+    if since is not None or until is not None:
+        query["submitted_at"] = {}
+        if since is not None:
+            query["submitted_at"]["$gte"] = _naive_utc(since)
+        if until is not None:
+            query["submitted_at"]["$lt"] = _naive_utc(until)
+    if after is not None:
+        submitted_at, submission_id = decode_cursor(after)
+        op = "$gt" if ascending else "$lt"
+        query["$or"] = [
+            {"submitted_at": {op: submitted_at}},
+            {"submitted_at": submitted_at, "id": {op: submission_id}},
+        ]
+    return query
+
+
+async def export_rows(
+    collection,
+    query: Dict[str, Any],
+    fmt: str = "ndjson",
+    include_cursor: bool = False,
+    batch_size: int = 1000,
+) -> AsyncIterator[bytes]:
+    """Stream submissions matching query as NDJSON or CSV chunks
+
+    Documents are read straight off the cursor and never collected, so memory
+    stays flat however large the export is. With include_cursor each row carries
+    the token that resumes the export right after it.
+    """
+    docs = collection.find(query, SUBMISSION_PROJECTION).sort(EXPORT_SORT).batch_size(batch_size)
+    async for chunk in encode_rows(docs, fmt, include_cursor):
+        yield chunk
+
+
+def csv_cell(value: Any) -> Any:
+    """value as written to a CSV export; text that would run as a formula is quoted with a leading '"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+async def encode_rows(
+    docs: AsyncIterable[Dict[str, Any]], fmt: str = "ndjson", include_cursor: bool = False
+) -> AsyncIterator[bytes]:
+    """NDJSON or CSV chunks for submissions from any async source, in the order given"""
+    fields = SUBMISSION_FIELDS + (["cursor"] if include_cursor else [])
+    chunk = bytearray()
+    text = io.StringIO()
+    writer = None
+    if fmt == "csv":
+        writer = csv.writer(text)
+        writer.writerow(fields)
+
+    async for doc in docs:
+        if include_cursor:
+            doc["cursor"] = cursor_for(doc)
+        if writer is not None:
+            writer.writerow([csv_cell(doc.get(field)) for field in fields])
+            chunk += text.getvalue().encode()
+            text.seek(0)
+            text.truncate()
+        else:
+            chunk += orjson.dumps(doc, option=orjson.OPT_APPEND_NEWLINE)
+        if len(chunk) >= EXPORT_CHUNK_SIZE:
+            yield bytes(chunk)
+            chunk.clear()
+
+    if writer is not None and text.tell():
+        chunk += text.getvalue().encode()
+    if chunk:
+        yield bytes(chunk)
+
+
+async def ensure_indexes(collection, indexes=INDEXES):
+    """Create the indexes that back listing sorts and filters"""
+    for keys, options in indexes:
+        await collection.create_index(keys, **options)
@@ -0,0 +1,123 @@
+"""Portfolios for many tenants, served from a byte-budgeted LRU of serialized documents.
+
+Each tenant is one tenant_portfolios document, {slug, content, version,
+updated_at}. Only the serialized body of recently requested tenants is kept in
+memory, never the parsed content. A cached body is trusted for max_staleness
+seconds. After that, the next request checks the stored version with a
+projected read, and the body is reloaded only if the version has moved on.
+"""
+import asyncio
+import logging
+import re
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict
+
+from pymongo import ReturnDocument
+
+from idempotency import TTLCache
+from portfolio import dump_json
+from response_cache import ByteBudgetCache, SerializedBody
+
+logger = logging.getLogger(__name__)
+
+SLUG_RE = re.compile(r"^[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?$")
+
+# Charged per cache entry on top of the body sizes, for the entry objects and key
+ENTRY_OVERHEAD = 512
+
+
+class TenantNotFound(LookupError):
+    """Raised for a slug with no stored portfolio"""
+
+
+class TenantEntry:
+    __slots__ = ("version", "checked_at", "body")
+
+    def __init__(self, version: int, checked_at: float, body: SerializedBody):
+        self.version = version
+        self.checked_at = checked_at
+        self.body = body
+
+
+class TenantPortfolios:
+    """Read-through cache of tenant portfolios over the tenant_portfolios collection
+
+    Slugs found missing are remembered for max_staleness seconds, so requests
+    for unknown tenants do not each reach Mongo. Concurrent requests for a
+    tenant that has to be loaded share one load.
+    """
+
+    def __init__(
+        self,
+        collection,
+        cache: ByteBudgetCache,
+        max_staleness: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.collection = collection
+        self.cache = cache
+        self.max_staleness = max_staleness
+        self.clock = clock
+        self._missing = TTLCache(max_entries=10000, ttl=max_staleness, clock=clock)
+        self._loading: Dict[str, asyncio.Task] = {}
+
+    async def get(self, slug: str) -> SerializedBody:
+        """The tenant's serialized portfolio; raises TenantNotFound"""
+        entry = self.cache.get(slug)
+        if entry is not None and self.clock() - entry.checked_at < self.max_staleness:
+            return entry.body
+        if entry is None and self._missing.get(slug):
+            raise TenantNotFound(slug)
+        task = self._loading.get(slug)
+        if task is None:
+            task = asyncio.ensure_future(self._load(slug, entry))
+            self._loading[slug] = task
+            task.add_done_callback(lambda _: self._loading.pop(slug, None))
+        # One caller giving up must not cancel the load the others wait on
+        return await asyncio.shield(task)
+
+    async def _load(self, slug: str, entry) -> SerializedBody:
+        if entry is not None:
+            try:
+                stored = await self.collection.find_one({"slug": slug}, {"_id": 0, "version": 1})
+            except Exception as e:
+                # Keep serving what we have; the next request past max_staleness retries
+                logger.warning(f"Error revalidating tenant {slug}, serving cached portfolio: {str(e)}")
+                return entry.body
+            if stored is not None and stored["version"] == entry.version:
+                entry.checked_at = self.clock()
+                return entry.body
+        doc = await self.collection.find_one({"slug": slug}, {"_id": 0, "content": 1, "version": 1})
+        if doc is None:
+            self.cache.pop(slug)
+            self._missing.set(slug, True)
+            raise TenantNotFound(slug)
+        return await self._store(slug, doc["version"], doc["content"])
+
+    async def _store(self, slug: str, version: int, content: Dict[str, Any]) -> SerializedBody:
+        # Compressing at the highest levels takes milliseconds, which would stall the event loop
+        body = await asyncio.to_thread(SerializedBody, dump_json(content))
+        current = self.cache.peek(slug)
+        if current is not None and current.version > version:
+            # An edit landed while this load was in flight
+            return current.body
+        self.cache.put(slug, TenantEntry(version, self.clock(), body), body.size + ENTRY_OVERHEAD)
+        return body
+
+    async def put(self, slug: str, content: Dict[str, Any]) -> int:
+        """Create or replace a tenant's portfolio and return its new version"""
+        doc = await self.collection.find_one_and_update(
+            {"slug": slug},
+            {"$set": {"content": content, "updated_at": datetime.utcnow()}, "$inc": {"version": 1}},
+            projection={"_id": 0, "version": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self._missing.set(slug, False)
+        await self._store(slug, doc["version"], content)
+        return doc["version"]
+
+
+async def ensure_tenant_indexes(collection):
+    await collection.create_index("slug", unique=True)
@@ -0,0 +1,259 @@
+"""Per-request phase timings as a Server-Timing header, and on-demand sampling profiles.
+
+Every request gets a Trace in a context variable. The middleware records the
+time spent reading the body and the time to the first response byte; the
+route class marks where the endpoint starts and ends, so decoding and
+validation (before the endpoint) and serialization (after it) fall out as the
+gaps. Code inside an endpoint adds its own phases with `phase("db")`.
+
+With the profile header and a valid admin token, a background thread samples
+the event loop thread's stack for the duration of the request and the
+response body is replaced by the samples in collapsed-stack format.
+"""
+import functools
+import hmac
+import inspect
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+ADMIN_HEADER = b"x-admin-token"
+
+# Server-Timing metric name and description, in header order
+PHASES = (
+    ("body", "Request body read"),
+    ("validate", "Decoding and validation"),
+    ("handler", "Endpoint"),
+    ("db", "Database"),
+    ("serialize", "Response serialization"),
+    ("total", "Total"),
+)
+
+_current: ContextVar[Optional["Trace"]] = ContextVar("trace", default=None)
+
+
+class Trace:
+    """perf_counter marks and accumulated phase durations for one request"""
+
+    __slots__ = ("start", "body_done", "handler_start", "handler_end", "phases")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.body_done = 0.0
+        self.handler_start = 0.0
+        self.handler_end = 0.0
+        self.phases: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def timings(self, now: float) -> Dict[str, float]:
+        """Phase durations in milliseconds, as far as the request has got"""
+        timings = {name: seconds * 1000 for name, seconds in self.phases.items()}
+        if self.handler_start:
+            timings["validate"] = (self.handler_start - (self.body_done or self.start)) * 1000
+        if self.handler_end:
+            timings["handler"] = (self.handler_end - self.handler_start) * 1000
+            timings["serialize"] = (now - self.handler_end) * 1000
+        timings["total"] = (now - self.start) * 1000
+        return timings
+
+
+def server_timing(timings: Dict[str, float]) -> bytes:
+    return ", ".join(
+        f'{name};desc="{description}";dur={timings[name]:.2f}' for name, description in PHASES if name in timings
+    ).encode()
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Add the time spent in the block to the current request's phase name"""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, time.perf_counter() - start)
+
+
+def _traced(endpoint: Callable) -> Callable:
+    @functools.wraps(endpoint)
+    async def traced(*args, **kwargs):
+        trace = _current.get()
+        if trace is None:
+            return await endpoint(*args, **kwargs)
+        trace.handler_start = time.perf_counter()
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            trace.handler_end = time.perf_counter()
+
+    return traced
+
+
+class TracedRoute(APIRoute):
+    """APIRoute that marks when its endpoint starts and ends
+
+    FastAPI reads the body, decodes it and validates parameters before calling
+    the endpoint and serializes the return value after, all inside the route.
+    Sync endpoints run in a thread pool and are left alone.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if inspect.iscoroutinefunction(endpoint):
+            endpoint = _traced(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+class StackSampler:
+    """Sample one thread's Python stack every interval seconds from a daemon thread
+
+    Samples show whatever the event loop is running, which includes other
+    requests served concurrently with the profiled one.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> bytes:
+        """One `frame;frame;frame count` line per distinct stack, most frequent first"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common()).encode()
+
+
+class TracingMiddleware:
+    """Time the phases of every HTTP request; profile one on request from an admin
+
+    admin_token is called per request, so ADMIN_TOKEN can change without a
+    rebuild. A profile is only taken while no other is running in the process.
+    """
+
+    def __init__(self, app, admin_token: Callable[[], Optional[str]], sample_interval: float = 0.001):
+        self.app = app
+        self.admin_token = admin_token
+        self.sample_interval = sample_interval
+        self._profiling = False
+
+    def _wants_profile(self, headers: List[Tuple[bytes, bytes]]) -> bool:
+        if self._profiling:
+            return False
+        profile = token = None
+        for name, value in headers:
+            if name == PROFILE_HEADER:
+                profile = value
+            elif name == ADMIN_HEADER:
+                token = value
+        if not profile or token is None:
+            return False
+        expected = self.admin_token()
+        return bool(expected) and hmac.compare_digest(token, expected.encode())
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        trace = Trace()
+        reset = _current.set(trace)
+        status = 500
+
+        async def receive_wrapper():
+            if trace.body_done:
+                # Streaming responses keep receiving to watch for a disconnect
+                return await receive()
+            start = time.perf_counter()
+            message = await receive()
+            now = time.perf_counter()
+            trace.add("body", now - start)
+            if message["type"] == "http.request" and not message.get("more_body", False):
+                trace.body_done = now
+            return message
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing = server_timing(trace.timings(time.perf_counter()))
+                message = {**message, "headers": [*message.get("headers", ()), (b"server-timing", timing)]}
+            await send(message)
+
+        sampler = None
+        if self._wants_profile(scope["headers"]):
+            self._profiling = True
+            sampler = StackSampler(threading.get_ident(), self.sample_interval)
+            sampler.start()
+        try:
+            if sampler is None:
+                await self.app(scope, receive_wrapper, send_wrapper)
+            else:
+                await self._profile(scope, receive_wrapper, send_wrapper, sampler)
+        finally:
+            if sampler is not None:
+                self._profiling = False
+            _current.reset(reset)
+            if logger.isEnabledFor(logging.INFO):
+                timings = trace.timings(time.perf_counter())
+                logger.info(
+                    f"{scope['method']} {scope['path']} {status} "
+                    + " ".join(f"{name}={timings[name]:.2f}ms" for name, _ in PHASES if name in timings),
+                    extra={"method": scope["method"], "path": scope["path"], "status": status, "timings": timings},
+                )
+
+    async def _profile(self, scope, receive, send, sampler: StackSampler):
+        """Run the request to completion, then answer with its status and the profile as the body"""
+        start = None
+
+        async def capture(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            sampler.stop()
+        body = sampler.collapsed()
+        await send({
+            "type": "http.response.start",
+            "status": start["status"] if start is not None else 500,
+            "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
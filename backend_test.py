@@ -16,11 +16,8 @@ load_dotenv('/app/frontend/.env')
 
 # Get backend URL from environment
 BACKEND_URL = os.getenv('REACT_APP_BACKEND_URL')
-if not BACKEND_URL:
-    print("❌ ERROR: REACT_APP_BACKEND_URL not found in environment")
-    sys.exit(1)
-
-print(f"🔗 Testing backend at: {BACKEND_URL}")
+# Admin reads such as the submission listing need the deployment's admin token
+ADMIN_HEADERS = {'X-Admin-Token': os.getenv('ADMIN_TOKEN', '')}
 
 class WellnessAPITester:
     def __init__(self, base_url):
@@ -261,7 +258,7 @@ class WellnessAPITester:
     def test_contact_submissions_retrieval(self):
         """Test GET /api/contact-submissions endpoint"""
         try:
-            response = requests.get(f"{self.base_url}/api/contact-submissions", timeout=10)
+            response = requests.get(f"{self.base_url}/api/contact-submissions", headers=ADMIN_HEADERS, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -343,6 +340,11 @@ class WellnessAPITester:
         return passed == total
 
 if __name__ == "__main__":
+    if not BACKEND_URL:
+        print("❌ ERROR: REACT_APP_BACKEND_URL not found in environment")
+        sys.exit(1)
+
+    print(f"🔗 Testing backend at: {BACKEND_URL}")
     tester = WellnessAPITester(BACKEND_URL)
     success = tester.run_all_tests()
     
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Rows per second for importing a lead list, one request per lead versus bulk import.
+
+Drives the ASGI app in-process against the in-memory Mongo stand-in from
+tests/fake_mongo.py (without unique indexes, whose checks it does by scanning),
+so the numbers are the backend's own cost per row: parsing, validation and
+building the writes. The bulk upload is streamed in 64 KiB chunks, and its
+peak allocation shows that memory does not grow with the size of the list.
+
+Usage: python benchmarks/bench_bulk_import.py [--rows 20000] [--batch-size 1000]
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import logging
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+sys.path.insert(0, str(ROOT_DIR / "backend"))
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+from tests.fake_mongo import FakeDatabase  # noqa: E402
+
+FIELDS = ["name", "email", "service", "message"]
+CHUNK_SIZE = 64 * 1024
+
+
+def make_leads(count, offset=0):
+    return [
+        {
+            "name": f"Studio lead {i}",
+            "email": f"lead{i}@example.com",
+            "service": "Prenatal & Postnatal Yoga",
+            "message": f"Interested in the partner studio programme, reference {i}.",
+        }
+        for i in range(offset, offset + count)
+    ]
+
+
+def ndjson_body(leads):
+    return "".join(json.dumps(lead) + "\n" for lead in leads).encode()
+
+
+def csv_body(leads):
+    text = io.StringIO()
+    writer = csv.DictWriter(text, FIELDS)
+    writer.writeheader()
+    writer.writerows(leads)
+    return text.getvalue().encode()
+
+
+async def chunks(body):
+    for start in range(0, len(body), CHUNK_SIZE):
+        yield body[start:start + CHUNK_SIZE]
+
+
+def fresh_database():
+    db = FakeDatabase()
+    server.bind_database(db)
+    return db
+
+
+async def one_request_per_lead(client, leads, concurrency):
+    queue = list(reversed(leads))
+
+    async def worker():
+        while queue:
+            response = await client.post("/api/contact", json=queue.pop())
+            response.raise_for_status()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def bulk_import(client, body, fmt):
+    response = await client.post(
+        f"/api/contact-submissions/import?format={fmt}", content=chunks(body), headers={"X-Admin-Token": "benchmark"}
+    )
+    response.raise_for_status()
+    report = response.json()
+    assert report["failed"] == 0 and report["duplicates"] == 0, report
+
+
+def measure(name, rows, run):
+    fresh_database()
+    start = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {rows / elapsed:>10.0f} rows/s   ({elapsed:6.2f} s)")
+    return rows / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--per-request-rows", type=int, default=2000,
+                        help="leads sent one request each (slower, so fewer by default)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    server.os.environ["ADMIN_TOKEN"] = "benchmark"
+    server.IMPORT_BATCH_SIZE = args.batch_size
+    server.rate_limits.clear()
+    server.contact_writer = None
+    server.notification_outbox = None
+
+    def client():
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://benchmark")
+
+    async def per_request():
+        async with client() as c:
+            await one_request_per_lead(c, make_leads(args.per_request_rows), args.concurrency)
+
+    def bulk(body, fmt):
+        async def run():
+            async with client() as c:
+                await bulk_import(c, body, fmt)
+        return run
+
+    print(f"Importing leads, bulk batches of {args.batch_size}\n")
+    slow = measure("POST /api/contact per lead", args.per_request_rows, per_request)
+    leads = make_leads(args.rows)
+    ndjson, csv_data = ndjson_body(leads), csv_body(leads)
+    fast = measure("bulk import, NDJSON", args.rows, bulk(ndjson, "ndjson"))
+    measure("bulk import, CSV", args.rows, bulk(csv_data, "csv"))
+    print(f"\nSpeedup (NDJSON): {fast / slow:.1f}x")
+
+    # Peak memory while importing, excluding the stand-in database, which keeps every row
+    for rows in (args.rows // 10, args.rows):
+        body = ndjson_body(make_leads(rows))
+        db = fresh_database()
+        db.contact_submissions.docs = _Discard()
+        tracemalloc.start()
+        asyncio.run(bulk(body, "ndjson")())
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"peak alloc importing {rows:>7} rows: {peak / 1024 / 1024:7.2f} MiB")
+
+
+class _Discard(list):
+    """A collection's document list that forgets what is appended"""
+
+    def append(self, doc):
+        pass
+
+
+if __name__ == "__main__":
+    main()
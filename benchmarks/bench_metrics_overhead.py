@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Per-request overhead of MetricsMiddleware and TracingMiddleware.
+
+Calls a minimal ASGI endpoint directly (no HTTP client, no sockets) with and
+without the middleware, so the difference is the cost of instrumentation alone.
+Also times a full GET /api/portfolio through the app for scale.
+
+Usage: python benchmarks/bench_metrics_overhead.py [--iterations 200000]
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from starlette.applications import Starlette  # noqa: E402
+from starlette.responses import Response  # noqa: E402
+from starlette.routing import Route  # noqa: E402
+
+import server  # noqa: E402
+from metrics import HTTPMetrics, MetricsMiddleware  # noqa: E402
+from tracing import TracingMiddleware  # noqa: E402
+
+
+async def endpoint(request):
+    return Response(b"{}", media_type="application/json")
+
+
+def make_scope(path):
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"bench"), (b"accept-encoding", b"br")], "client": ("127.0.0.1", 1),
+        "server": ("bench", 80),
+    }
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+async def time_app(app, path, iterations):
+    for _ in range(1000):
+        await app(make_scope(path), receive, send)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await app(make_scope(path), receive, send)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def main(iterations):
+    routes = [Route("/items/{item_id}", endpoint)]
+    bare = Starlette(routes=routes)
+    instrumented = MetricsMiddleware(bare, HTTPMetrics(), routes=routes)
+
+    without = await time_app(bare, "/items/42", iterations)
+    with_metrics = await time_app(instrumented, "/items/42", iterations)
+    print(f"minimal endpoint   without metrics {without:7.2f} us/req")
+    print(f"minimal endpoint   with metrics    {with_metrics:7.2f} us/req")
+    print(f"overhead                           {with_metrics - without:7.2f} us/req "
+          f"({(with_metrics - without) / without * 100:.1f}%)")
+
+    logging.getLogger("tracing").setLevel(logging.WARNING)
+    traced = TracingMiddleware(bare, admin_token=lambda: None)
+    with_tracing = await time_app(traced, "/items/42", iterations)
+    print(f"minimal endpoint   with tracing    {with_tracing:7.2f} us/req")
+    print(f"overhead                           {with_tracing - without:7.2f} us/req "
+          f"({(with_tracing - without) / without * 100:.1f}%)")
+
+    server.rate_limits.clear()
+    full = await time_app(server.app, "/api/portfolio", iterations // 10)
+    print(f"\nGET /api/portfolio through the full app {full:7.2f} us/req")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-request overhead of the instrumentation middleware")
+    parser.add_argument("--iterations", type=int, default=200000)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations))
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for serializing a page of contact submissions.
+
+Compares the previous listing path (a ContactSubmission model per row, then
+FastAPI's jsonable_encoder and JSONResponse) with the fast path (Mongo-projected
+documents encoded directly by ORJSONResponse).
+
+Usage: python benchmarks/bench_submission_listing.py [--rows 10000] [--repeat 20]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+
+from server import ContactSubmission  # noqa: E402
+
+
+def make_rows(count, with_mongo_id):
+    base = datetime(2025, 1, 1)
+    rows = []
+    for i in range(count):
+        row = {
+            "id": str(uuid.uuid4()),
+            "name": f"Lead {i}",
+            "email": f"lead{i}@example.com",
+            "service": "Prenatal & Postnatal Yoga",
+            "message": "I would love to join a weekly prenatal class near Seattle.",
+            "submitted_at": base + timedelta(seconds=i),
+            "status": "new",
+        }
+        if with_mongo_id:
+            row["_id"] = object()
+        rows.append(row)
+    return rows
+
+
+def before(rows):
+    return JSONResponse(jsonable_encoder([ContactSubmission(**row) for row in rows])).body
+
+
+def after(rows):
+    return ORJSONResponse(rows).body
+
+
+def measure(name, fn, rows, repeat):
+    fn(rows)  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(rows)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    fn(rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{name:<8} median {statistics.median(timings):8.2f} ms   "
+          f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:8.2f} ms   "
+          f"peak alloc {peak / 1024 / 1024:7.2f} MiB")
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"Serializing one page of {args.rows} submissions, {args.repeat} runs each\n")
+    # The old path received full documents including _id, the new one projected rows
+    slow = measure("before", before, make_rows(args.rows, with_mongo_id=True), args.repeat)
+    fast = measure("after", after, make_rows(args.rows, with_mongo_id=False), args.repeat)
+    print(f"\nSpeedup: {slow / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Cold-start profile of the backend.
+
+Measures, each in a fresh interpreter:
+  import   time to `import server`, with the slowest modules from -X importtime
+  startup  time from launching uvicorn to the first 200 from GET /api/portfolio
+
+No database is needed: MONGO_URL points at a closed port, which is the worst
+case for eager startup (it waits out server selection) and shows what lazy
+startup defers.
+
+Usage:
+  python benchmarks/import_profile.py [--top 25] [--startup-mode lazy] [--output profile.json]
+"""
+
+import argparse
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+# Nothing listens on port 1; server selection gives up after the timeout
+UNREACHABLE_MONGO_URL = "mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=10000"
+
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def backend_env(**overrides):
+    env = dict(os.environ, MONGO_URL=UNREACHABLE_MONGO_URL, DB_NAME="cold_start", RATE_LIMITS="")
+    env.update(overrides)
+    return env
+
+
+def import_profile():
+    """Return (seconds to import server, [(module, self_us, cumulative_us, depth)])"""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR, env=backend_env(), capture_output=True, text=True, check=True,
+    )
+    elapsed = time.perf_counter() - started
+    modules = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return elapsed, modules
+
+
+def import_seconds(runs=3):
+    """Best wall time of `import server` in a fresh interpreter, minus interpreter startup"""
+    def timed(code):
+        best = float("inf")
+        for _ in range(runs):
+            started = time.perf_counter()
+            subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=backend_env(), check=True)
+            best = min(best, time.perf_counter() - started)
+        return best
+
+    return timed("import server") - timed("pass")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_response(startup_mode="lazy", timeout=60.0):
+    """Seconds from launching a uvicorn worker to its first 200 on GET /api/portfolio"""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/api/portfolio"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:create_app", "--factory",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=backend_env(STARTUP_MODE=startup_mode),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                if httpx.get(url, timeout=1).status_code == 200:
+                    return time.perf_counter() - started
+            except httpx.HTTPError:
+                pass
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with {process.returncode}")
+            time.sleep(0.01)
+        raise TimeoutError(f"no response within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def package_totals(modules):
+    """Self import time summed per top-level package, slowest first"""
+    totals = {}
+    for name, self_us, _, _ in modules:
+        package = name.split(".", 1)[0]
+        totals[package] = totals.get(package, 0) + self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time and startup profile of server.py")
+    parser.add_argument("--top", type=int, default=25, help="modules and packages to list")
+    parser.add_argument("--startup-mode", choices=["eager", "lazy"], default="lazy")
+    parser.add_argument("--skip-startup", action="store_true", help="only profile imports")
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    args = parser.parse_args()
+
+    _, modules = import_profile()
+    seconds = import_seconds()
+    total_us = sum(self_us for _, self_us, _, _ in modules)
+
+    print(f"import server: {seconds * 1000:.1f} ms wall, {total_us / 1000:.1f} ms in {len(modules)} modules\n")
+    print(f"{'package':<28} {'ms':>8}")
+    packages = package_totals(modules)
+    for package, self_us in packages[:args.top]:
+        print(f"{package:<28} {self_us / 1000:>8.1f}")
+    print(f"\n{'module (cumulative)':<48} {'ms':>8}")
+    slowest = sorted(modules, key=lambda module: module[2], reverse=True)
+    for name, _, cumulative_us, _ in slowest[:args.top]:
+        print(f"{name:<48} {cumulative_us / 1000:>8.1f}")
+
+    report = {
+        "import_ms": round(seconds * 1000, 1),
+        "packages_ms": {package: round(self_us / 1000, 1) for package, self_us in packages},
+    }
+    if not args.skip_startup:
+        first_response = time_to_first_response(args.startup_mode)
+        report["startup_mode"] = args.startup_mode
+        report["first_response_ms"] = round(first_response * 1000, 1)
+        print(f"\ntime to first response ({args.startup_mode} startup): {first_response * 1000:.1f} ms")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
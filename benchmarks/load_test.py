@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Concurrent load scenarios for the Wellness Portfolio backend.
+
+Drives the ASGI app in-process (default) or through a local uvicorn server
+(--uvicorn), with the in-memory Mongo stand-in from tests/fake_mongo.py in
+place of a real database. In uvicorn mode the functional checks from
+backend_test.WellnessAPITester run first, so a broken build is not benchmarked.
+
+Scenarios:
+  portfolio_read_storm  GET /api/portfolio with brotli/gzip negotiation
+  contact_write_burst   POST /api/contact with distinct submissions
+  admin_listing         GET /api/contact-submissions, walking pages by cursor
+
+Usage:
+  python benchmarks/load_test.py --concurrency 50 --requests 2000 --output run.json
+  python benchmarks/load_test.py --compare baseline.json --tolerance 0.2
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import platform
+import socket
+import statistics
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+sys.path.insert(0, str(ROOT_DIR / "backend"))
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+from submissions import ensure_indexes  # noqa: E402
+from tests.fake_mongo import FakeDatabase  # noqa: E402
+
+SCENARIOS = ["portfolio_read_storm", "contact_write_burst", "admin_listing"]
+ADMIN_TOKEN = "benchmark"
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def install_stand_in(seed_submissions):
+    """Point the app at a fresh in-memory database holding seed_submissions leads"""
+    db = FakeDatabase()
+    asyncio.run(ensure_indexes(db.contact_submissions))
+    base = datetime(2025, 1, 1)
+    for i in range(seed_submissions):
+        db.contact_submissions.docs.append({
+            "_id": f"seed-{i}",
+            "id": str(uuid.uuid4()),
+            "name": f"Seed lead {i}",
+            "email": f"seed{i}@example.com",
+            "service": "Sound Healing",
+            "message": "Looking for weekly sessions.",
+            "submitted_at": base + timedelta(seconds=i),
+            "status": "new",
+        })
+    server.bind_database(db)
+    server.os.environ["ADMIN_TOKEN"] = ADMIN_TOKEN
+    # A load generator is a single abusive client as far as the limiter is concerned
+    server.rate_limits.clear()
+    return db
+
+
+def make_request(scenario, state):
+    if scenario == "portfolio_read_storm":
+        return "GET", "/api/portfolio", {"headers": {"Accept-Encoding": "br, gzip"}}
+    if scenario == "contact_write_burst":
+        n = next(state["counter"])
+        return "POST", "/api/contact", {"json": {
+            "name": f"Load test {n}",
+            "email": f"load{n}@example.com",
+            "service": "Prenatal & Postnatal Yoga",
+            "message": f"Benchmark submission {n}",
+        }}
+    if scenario == "admin_listing":
+        params = {"limit": 100}
+        if state.get("cursor"):
+            params["cursor"] = state["cursor"]
+        return "GET", "/api/contact-submissions", {"params": params, "headers": {"X-Admin-Token": ADMIN_TOKEN}}
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+
+async def run_scenario(client, scenario, concurrency, total):
+    state = {"counter": itertools.count()}
+    latencies, errors = [], 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            method, path, kwargs = make_request(scenario, state)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                ok = response.status_code < 400
+                if scenario == "admin_listing":
+                    state["cursor"] = response.headers.get("x-next-cursor")
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 4),
+        "throughput_rps": round(total / elapsed, 1),
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies) * 1000, 3),
+            "p50": round(percentile(latencies, 0.50) * 1000, 3),
+            "p95": round(percentile(latencies, 0.95) * 1000, 3),
+            "p99": round(percentile(latencies, 0.99) * 1000, 3),
+        },
+    }
+
+
+def start_uvicorn():
+    """Serve the app from a background thread on a free local port"""
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    config = uvicorn.Config(server.app, host="127.0.0.1", port=port, log_level="warning", lifespan="off")
+    uvicorn_server = uvicorn.Server(config)
+    thread = threading.Thread(target=uvicorn_server.run, daemon=True)
+    thread.start()
+    while not uvicorn_server.started:
+        time.sleep(0.01)
+    return uvicorn_server, thread, f"http://127.0.0.1:{port}"
+
+
+def run_functional_checks(base_url):
+    from backend_test import WellnessAPITester
+
+    tester = WellnessAPITester(base_url)
+    if not tester.run_all_tests():
+        raise SystemExit("Functional checks failed, not benchmarking")
+
+
+async def run_all(args, base_url):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    if base_url is None:
+        transport = httpx.ASGITransport(app=server.app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://benchmark")
+    else:
+        client = httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30)
+    results = {}
+    async with client:
+        for scenario in args.scenarios:
+            results[scenario] = await run_scenario(client, scenario, args.concurrency, args.requests)
+            summary = results[scenario]
+            print(f"{scenario:<22} {summary['throughput_rps']:>9.1f} req/s   "
+                  f"p50 {summary['latency_ms']['p50']:>8.2f} ms   "
+                  f"p95 {summary['latency_ms']['p95']:>8.2f} ms   "
+                  f"p99 {summary['latency_ms']['p99']:>8.2f} ms   "
+                  f"errors {summary['errors']}")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return the regressions of results against a previous run's scenarios"""
+    regressions = []
+    for scenario, current in results.items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if previous is None:
+            continue
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{scenario}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} req/s")
+        for key in ("p95", "p99"):
+            if current["latency_ms"][key] > previous["latency_ms"][key] * (1 + tolerance):
+                regressions.append(
+                    f"{scenario}: {key} {previous['latency_ms'][key]} -> {current['latency_ms'][key]} ms"
+                )
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{scenario}: errors {previous['errors']} -> {current['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load scenarios for the backend")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per scenario")
+    parser.add_argument("--seed-submissions", type=int, default=1000)
+    parser.add_argument("--uvicorn", action="store_true", help="serve over HTTP from a local uvicorn")
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    parser.add_argument("--compare", type=Path, help="previous --output to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    # httpx logs every request at INFO under the server's logging config, and so
+    # does the tracing middleware; neither belongs in the measured path
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("tracing").setLevel(logging.WARNING)
+    install_stand_in(args.seed_submissions)
+    base_url = None
+    uvicorn_server = None
+    if args.uvicorn:
+        uvicorn_server, thread, base_url = start_uvicorn()
+        run_functional_checks(base_url)
+
+    mode = "uvicorn" if args.uvicorn else "in-process"
+    print(f"\nRunning {', '.join(args.scenarios)} ({mode}, concurrency {args.concurrency})\n")
+    try:
+        results = asyncio.run(run_all(args, base_url))
+    finally:
+        if uvicorn_server is not None:
+            uvicorn_server.should_exit = True
+            thread.join()
+
+    report = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "mode": mode,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "concurrency": args.concurrency,
+        "requests_per_scenario": args.requests,
+        "scenarios": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        if baseline.get("mode") != mode or baseline.get("concurrency") != args.concurrency:
+            print(f"\nWarning: baseline ran {baseline.get('mode')} at concurrency {baseline.get('concurrency')}")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            sys.exit(1)
+        print("\nNo regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
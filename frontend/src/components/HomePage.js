@@ -13,11 +13,42 @@ import Footer from "./Footer";
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// The page served by the backend carries the portfolio inline; the dev server's does not
+const readBootstrap = () => {
+  const element = document.getElementById("portfolio-data");
+  if (!element) {
+    return null;
+  }
+  try {
+    return JSON.parse(element.textContent);
+  } catch (error) {
+    console.error("Error reading inlined portfolio data:", error);
+    return null;
+  }
+};
+
 const HomePage = () => {
-  const [data, setData] = useState(null);
-  const [loading, setLoading] = useState(true);
+  const [bootstrap] = useState(readBootstrap);
+  const [data, setData] = useState(bootstrap);
+  const [hero, setHero] = useState(bootstrap && bootstrap.hero);
+  const [loading, setLoading] = useState(!bootstrap);
 
   useEffect(() => {
+    // The hero is already on screen from the server, so there is nothing to fetch or fade in
+    if (bootstrap) {
+      return;
+    }
+
+    // The hero section is a tiny payload, so it can paint before the full portfolio arrives
+    const fetchHero = async () => {
+      try {
+        const response = await axios.get(`${API}/portfolio/hero`);
+        setHero(response.data);
+      } catch (error) {
+        console.error("Error fetching hero section:", error);
+      }
+    };
+
     const fetchPortfolioData = async () => {
       try {
         const response = await axios.get(`${API}/portfolio`);
@@ -29,6 +60,7 @@ const HomePage = () => {
       }
     };
 
+    fetchHero();
     fetchPortfolioData();
 
     // Animation on load
@@ -37,9 +69,9 @@ const HomePage = () => {
       document.body.style.opacity = "1";
       document.body.style.transition = "opacity 0.8s ease-in-out";
     }, 100);
-  }, []);
+  }, [bootstrap]);
 
-  if (loading) {
+  if (loading && !hero) {
     return (
       <div className="min-h-screen bg-gradient-to-br from-green-50 via-white to-blue-50 flex items-center justify-center">
         <div className="text-center">
@@ -50,6 +82,15 @@ const HomePage = () => {
     );
   }
 
+  if (loading) {
+    return (
+      <div className="min-h-screen bg-gradient-to-br from-green-50 via-white to-blue-50">
+        <Header />
+        <HeroSection data={hero} />
+      </div>
+    );
+  }
+
   if (!data) {
     return (
       <div className="min-h-screen bg-gradient-to-br from-green-50 via-white to-blue-50 flex items-center justify-center">
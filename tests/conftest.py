@@ -0,0 +1,10 @@
+import os
+import sys
+from pathlib import Path
+
+# The backend is served as a flat module directory (uvicorn server:app)
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Tests post freely; rate limiting is exercised in test_rate_limit.py
+os.environ.setdefault("RATE_LIMITS", "")
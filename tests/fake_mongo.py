@@ -0,0 +1,351 @@
+"""In-memory stand-in for the subset of Motor used by the backend.
+
+Documents are deep-copied in and out so callers cannot mutate stored state,
+which keeps the behaviour close enough to a real mongod for unit tests.
+"""
+import copy
+import re
+
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+_MISSING = object()
+
+
+def _get(doc, path):
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        else:
+            return _MISSING
+    return value
+
+
+def _compare(value, op, operand):
+    if op == "$eq":
+        return value == operand
+    if op == "$ne":
+        return value != operand
+    if op == "$in":
+        return value in operand
+    if op == "$nin":
+        return value not in operand
+    if op == "$exists":
+        return (value is not _MISSING) == bool(operand)
+    if op == "$regex":
+        return value is not _MISSING and re.search(operand, value) is not None
+    if value is _MISSING or value is None:
+        return False
+    if op == "$gt":
+        return value > operand
+    if op == "$gte":
+        return value >= operand
+    if op == "$lt":
+        return value < operand
+    if op == "$lte":
+        return value <= operand
+    raise NotImplementedError(op)
+
+
+def matches(doc, query):
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        else:
+            value = _get(doc, key)
+            if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+                if not all(_compare(value, op, operand) for op, operand in condition.items()):
+                    return False
+            elif (value if value is not _MISSING else None) != condition:
+                return False
+    return True
+
+
+def _project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    if include:
+        result = {k: copy.deepcopy(doc[k]) for k in include if k in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+    return {k: copy.deepcopy(v) for k, v in doc.items() if projection.get(k, 1)}
+
+
+def _parent(doc, path, create):
+    """The dict holding the last part of a dotted path, and that part"""
+    *parents, last = path.split(".")
+    for part in parents:
+        if part not in doc and create:
+            doc[part] = {}
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return None, last
+    return doc, last
+
+
+def _apply_update(doc, update, inserting):
+    for op, fields in update.items():
+        if op == "$set" or (op == "$setOnInsert" and inserting):
+            for key, value in fields.items():
+                parent, last = _parent(doc, key, create=True)
+                parent[last] = copy.deepcopy(value)
+        elif op == "$inc":
+            for key, value in fields.items():
+                parent, last = _parent(doc, key, create=True)
+                parent[last] = parent.get(last, 0) + value
+        elif op == "$unset":
+            for key in fields:
+                parent, last = _parent(doc, key, create=False)
+                if parent is not None:
+                    parent.pop(last, None)
+        elif op != "$setOnInsert":
+            raise NotImplementedError(op)
+
+
+class FakeInsertOneResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+
+
+class FakeInsertManyResult:
+    def __init__(self, inserted_ids):
+        self.inserted_ids = inserted_ids
+
+
+class FakeUpdateResult:
+    def __init__(self, matched_count, modified_count, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+
+
+class FakeBulkWriteResult:
+    def __init__(self, matched_count, modified_count, upserted_count):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_count = upserted_count
+
+
+class FakeDeleteResult:
+    def __init__(self, deleted_count):
+        self.deleted_count = deleted_count
+
+
+class FakeCursor:
+    def __init__(self, collection, query, projection):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort = []
+        self._skip = 0
+        self._limit = 0
+        self._batch_size = None
+        self._results = None
+
+    def sort(self, key, direction=None):
+        self._sort = [(key, direction or 1)] if isinstance(key, str) else list(key)
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def batch_size(self, size):
+        self._batch_size = size
+        return self
+
+    def _evaluate(self):
+        docs = [doc for doc in self._collection.docs if matches(doc, self._query)]
+        for key, direction in reversed(self._sort):
+            docs.sort(key=lambda doc: (_get(doc, key) is _MISSING, _get(doc, key)), reverse=direction < 0)
+        docs = docs[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return [_project(doc, self._projection) for doc in docs]
+
+    async def to_list(self, length=None):
+        self._collection.database.operations.append(("find", self._collection.name))
+        docs = self._evaluate()
+        return docs if length is None else docs[:length]
+
+    def __aiter__(self):
+        self._collection.database.operations.append(("find", self._collection.name))
+        self._results = iter(self._evaluate())
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._results)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self.docs = []
+        self.indexes = []
+
+    def _check_unique(self, doc, ignore=None):
+        for keys, options in self.indexes:
+            if not options.get("unique"):
+                continue
+            fields = [key for key, _ in keys]
+            partial = options.get("partialFilterExpression")
+            if partial and not matches(doc, partial):
+                continue
+            if options.get("sparse") and all(_get(doc, f) is _MISSING for f in fields):
+                continue
+            value = [_get(doc, f) for f in fields]
+            for other in self.docs:
+                if other is ignore or (partial and not matches(other, partial)):
+                    continue
+                if [_get(other, f) for f in fields] == value:
+                    raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name}", 11000)
+
+    def _insert(self, document):
+        doc = copy.deepcopy(document)
+        # Assigned on the client when the document is written, as the driver does
+        doc.setdefault("_id", ObjectId())
+        self._check_unique(doc)
+        self.docs.append(doc)
+        document.setdefault("_id", doc["_id"])
+        return doc["_id"]
+
+    async def create_index(self, keys, **options):
+        if isinstance(keys, str):
+            keys = [(keys, 1)]
+        self.indexes.append((list(keys), options))
+        return "_".join(f"{key}_{direction}" for key, direction in keys)
+
+    async def drop_index(self, name):
+        for index in self.indexes:
+            if "_".join(f"{key}_{direction}" for key, direction in index[0]) == name:
+                self.indexes.remove(index)
+                return
+        raise OperationFailure(f"index not found with name [{name}]", code=27)
+
+    async def insert_one(self, document):
+        self.database.operations.append(("insert_one", self.name))
+        return FakeInsertOneResult(self._insert(document))
+
+    async def insert_many(self, documents, ordered=True):
+        self.database.operations.append(("insert_many", self.name))
+        inserted, errors = [], []
+        for index, document in enumerate(documents):
+            try:
+                inserted.append(self._insert(document))
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": 11000, "errmsg": str(e), "op": document})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(inserted)})
+        return FakeInsertManyResult(inserted)
+
+    def find(self, filter=None, projection=None, **kwargs):
+        return FakeCursor(self, filter or {}, projection or kwargs.get("projection"))
+
+    async def find_one(self, filter=None, projection=None, **kwargs):
+        docs = await self.find(filter, projection, **kwargs).limit(1).to_list(1)
+        return docs[0] if docs else None
+
+    async def count_documents(self, filter):
+        return sum(1 for doc in self.docs if matches(doc, filter))
+
+    async def update_one(self, filter, update, upsert=False):
+        self.database.operations.append(("update_one", self.name))
+        return self._update_one(filter, update, upsert)
+
+    def _update_one(self, filter, update, upsert):
+        for doc in self.docs:
+            if matches(doc, filter):
+                _apply_update(doc, update, inserting=False)
+                return FakeUpdateResult(1, 1)
+        if not upsert:
+            return FakeUpdateResult(0, 0)
+        doc = {k: v for k, v in filter.items() if not k.startswith("$") and not isinstance(v, dict)}
+        _apply_update(doc, update, inserting=True)
+        return FakeUpdateResult(0, 0, self._insert(doc))
+
+    async def update_many(self, filter, update):
+        self.database.operations.append(("update_many", self.name))
+        matched = [doc for doc in self.docs if matches(doc, filter)]
+        for doc in matched:
+            _apply_update(doc, update, inserting=False)
+        return FakeUpdateResult(len(matched), len(matched))
+
+    async def bulk_write(self, requests, ordered=True):
+        self.database.operations.append(("bulk_write", self.name))
+        matched = modified = upserted = 0
+        for request in requests:
+            if not isinstance(request, UpdateOne):
+                raise NotImplementedError(type(request).__name__)
+            result = self._update_one(request._filter, request._doc, request._upsert)
+            matched += result.matched_count
+            modified += result.modified_count
+            upserted += result.upserted_id is not None
+        return FakeBulkWriteResult(matched, modified, upserted)
+
+    async def find_one_and_update(self, filter, update, projection=None, upsert=False,
+                                  return_document=ReturnDocument.BEFORE):
+        self.database.operations.append(("find_one_and_update", self.name))
+        for doc in self.docs:
+            if matches(doc, filter):
+                before = _project(doc, projection)
+                _apply_update(doc, update, inserting=False)
+                return _project(doc, projection) if return_document == ReturnDocument.AFTER else before
+        if not upsert:
+            return None
+        doc = {k: v for k, v in filter.items() if not k.startswith("$") and not isinstance(v, dict)}
+        _apply_update(doc, update, inserting=True)
+        self._insert(doc)
+        return _project(doc, projection) if return_document == ReturnDocument.AFTER else None
+
+    async def delete_many(self, filter):
+        before = len(self.docs)
+        self.docs = [doc for doc in self.docs if not matches(doc, filter)]
+        return FakeDeleteResult(before - len(self.docs))
+
+
+class FakeDatabase:
+    def __init__(self):
+        self._collections = {}
+        self.operations = []
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(self, name)
+        return self._collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+
+class FakeClient:
+    """Stands in for AsyncIOMotorClient in tests that run the app lifespan"""
+
+    def __init__(self, database=None):
+        self.database = database if database is not None else FakeDatabase()
+        self.closed = False
+
+    def __getitem__(self, name):
+        return self.database
+
+    def close(self):
+        self.closed = True
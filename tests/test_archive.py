@@ -0,0 +1,170 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from archive import Archiver, Sidecar, SubmissionArchive
+from tests.fake_mongo import FakeDatabase
+
+NOW = datetime(2025, 6, 1, 12, 0)
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+def submission(number, days_old, status="resolved", **extra):
+    return {
+        "id": f"s{number:03d}",
+        "name": "Asha",
+        "email": "asha@example.com",
+        "service": "Sound Healing",
+        "message": f"Message {number}",
+        "submitted_at": NOW - timedelta(days=days_old, minutes=number),
+        "status": status,
+        "idempotency_key": f"key-{number}",
+        **extra,
+    }
+
+
+@pytest.fixture
+def setup(tmp_path):
+    db = FakeDatabase()
+    db.contact_submissions.docs = [
+        submission(1, 200),
+        submission(2, 200),
+        submission(3, 201, service="Yoga for Beginners"),
+        submission(4, 200, status="contacted"),
+        submission(5, 10),
+    ]
+    archive = SubmissionArchive(tmp_path / "archive", rescan_interval=0)
+    archiver = Archiver(db.contact_submissions, archive, after_days=180, batch_size=2, clock=lambda: NOW)
+    return db, archive, archiver
+
+
+def test_due_submissions_move_to_day_segments(setup):
+    db, archive, archiver = setup
+    assert asyncio.run(archiver.run_once()) == 3
+    assert sorted(doc["id"] for doc in db.contact_submissions.docs) == ["s004", "s005"]
+
+    sidecars = archive.sidecars()
+    assert [sidecar.day for sidecar in sidecars] == ["2024-11-12", "2024-11-13", "2024-11-13"]
+    assert sum(sidecar.count for sidecar in sidecars) == 3
+    index = json.loads(next(archive.directory.glob("2024-11-12/*.idx.json")).read_text())
+    assert index["ids"] == ["s003"] and index["codec"] == "gzip"
+
+    # Rows are cut down to the listing fields
+    assert archive.find("s003") == {
+        key: value for key, value in submission(3, 201, service="Yoga for Beginners").items()
+        if key != "idempotency_key"
+    }
+    assert archive.find("s004") is None
+    assert asyncio.run(archiver.run_once()) == 0
+
+
+def test_range_scans_merge_segments_in_export_order(setup):
+    db, archive, archiver = setup
+    asyncio.run(archiver.run_once())
+    # Segments from separate runs share a day
+    assert [doc["id"] for doc in archive.scan()] == ["s003", "s002", "s001"]
+    day = datetime(2024, 11, 13)
+    assert [doc["id"] for doc in archive.scan(since=day)] == ["s002", "s001"]
+    assert [doc["id"] for doc in archive.scan(until=day)] == ["s003"]
+
+    async def collect():
+        return [doc["id"] async for doc in archive.iter_scan(batch_size=2)]
+
+    assert asyncio.run(collect()) == ["s003", "s002", "s001"]
+
+
+def test_an_interrupted_run_does_not_archive_twice(setup):
+    db, archive, archiver = setup
+    batch = [doc for doc in db.contact_submissions.docs if doc["id"] in ("s001", "s002")]
+    # Written, but the process died before deleting
+    archive.write(batch)
+    assert asyncio.run(archiver.run_once()) == 3
+    assert sorted(doc["id"] for doc in archive.scan()) == ["s001", "s002", "s003"]
+
+
+def test_submissions_reopened_mid_run_stay_in_mongo_only(setup):
+    db, archive, archiver = setup
+    collection = db.contact_submissions
+    delete_many = collection.delete_many
+
+    async def reopen_then_delete(filter):
+        next(doc for doc in collection.docs if doc["id"] == "s002")["status"] = "contacted"
+        return await delete_many(filter)
+
+    collection.delete_many = reopen_then_delete
+    assert asyncio.run(archiver.run_once()) == 2
+    assert [doc["id"] for doc in collection.docs] == ["s002", "s004", "s005"]
+    assert [doc["id"] for doc in archive.scan()] == ["s003", "s001"]
+    assert not archive.contains("s002")
+
+
+def test_reopened_submissions_leave_segments_from_earlier_runs(setup):
+    db, archive, archiver = setup
+    collection = db.contact_submissions
+    # Written by a run that died before deleting, so this run does not write it again
+    archive.write([doc for doc in collection.docs if doc["id"] == "s002"])
+    delete_many = collection.delete_many
+
+    async def reopen_then_delete(filter):
+        next(doc for doc in collection.docs if doc["id"] == "s002")["status"] = "contacted"
+        return await delete_many(filter)
+
+    collection.delete_many = reopen_then_delete
+    asyncio.run(archiver.run_once())
+    assert "s002" in [doc["id"] for doc in collection.docs]
+    assert not archive.contains("s002")
+
+
+def test_lookups_read_only_the_sidecars_of_their_day(setup, monkeypatch):
+    db, archive, archiver = setup
+    asyncio.run(archiver.run_once())
+    read = []
+    ids = Sidecar.ids
+    monkeypatch.setattr(Sidecar, "ids", lambda sidecar: read.append(sidecar.day) or ids(sidecar))
+
+    assert archive.archived([submission(1, 200), submission(9, 200)]) == {"s001"}
+    assert read == ["2024-11-13", "2024-11-13"]
+    read.clear()
+    assert archive.find("s003", day="2024-11-12")["id"] == "s003"
+    assert archive.find("s003", day="2024-11-13") is None
+    assert read == ["2024-11-12", "2024-11-13", "2024-11-13"]
+
+
+def test_zstd_segments(setup, tmp_path):
+    pytest.importorskip("zstandard")
+    db, _, _ = setup
+    archive = SubmissionArchive(tmp_path / "zstd", codec="zstd")
+    asyncio.run(Archiver(db.contact_submissions, archive, clock=lambda: NOW).run_once())
+    assert next(archive.directory.glob("*/*.jsonl.zst"))
+    assert [doc["id"] for doc in archive.scan()] == ["s003", "s002", "s001"]
+
+
+def test_unknown_codecs_are_refused(tmp_path):
+    with pytest.raises(ValueError):
+        SubmissionArchive(tmp_path, codec="lz4")
+
+
+def test_archive_routes(setup, monkeypatch):
+    db, archive, archiver = setup
+    asyncio.run(archiver.run_once())
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    client = TestClient(server.app, headers=ADMIN)
+    assert client.get("/api/contact-submissions/archive/s001").status_code == 404
+
+    monkeypatch.setattr(server, "submission_archive", archive)
+    assert client.get("/api/contact-submissions/archive/s001", headers={"X-Admin-Token": "wrong"}).status_code == 401
+    assert client.get("/api/contact-submissions/archive", headers={"X-Admin-Token": "wrong"}).status_code == 401
+    row = client.get("/api/contact-submissions/archive/s001").json()
+    assert row["status"] == "resolved" and row["submitted_at"] == "2024-11-13T11:59:00"
+    assert client.get("/api/contact-submissions/archive/s001", params={"day": "2024-11-13"}).json() == row
+    assert client.get("/api/contact-submissions/archive/s001", params={"day": "2024-11-12"}).status_code == 404
+    assert client.get("/api/contact-submissions/archive/s004").status_code == 404
+
+    response = client.get("/api/contact-submissions/archive", params={"since": "2024-11-13T00:00:00Z"})
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == ["s002", "s001"]
+    csv = client.get("/api/contact-submissions/archive", params={"format": "csv"}).text.splitlines()
+    assert csv[0] == "id,name,email,service,message,submitted_at,status" and len(csv) == 4
@@ -0,0 +1,131 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from bulk_import import RowError, UploadError, csv_rows, ndjson_rows
+from circuit_breaker import CircuitBreaker
+from idempotency import content_key
+from search import InMemorySearchIndex
+from submissions import ensure_indexes
+from tests.fake_mongo import FakeDatabase
+
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+async def chunked(data, size):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def collect(rows):
+    async def run():
+        return [(number, str(row) if isinstance(row, RowError) else row) async for number, row in rows]
+
+    return asyncio.run(run())
+
+
+def lead(number, **overrides):
+    return {
+        "name": f"Lead {number}",
+        "email": f"lead{number}@example.com",
+        "service": "Yoga",
+        "message": f"Hello {number}",
+        **overrides,
+    }
+
+
+@pytest.mark.parametrize("size", [1, 7, 4096])
+def test_ndjson_rows_survive_any_chunking(size):
+    body = b'{"a": 1}\n\n[1]\n{"a": "\xc3\xa9"}\nnot json\n{"a": 3}'
+    assert collect(ndjson_rows(chunked(body, size))) == [
+        (1, {"a": 1}), (3, "Expected a JSON object"), (4, {"a": "é"}), (5, "Invalid JSON"), (6, {"a": 3}),
+    ]
+
+
+def test_overlong_ndjson_rows_are_skipped():
+    body = b'{"a": 1}\n' + b"x" * 100 + b'\n{"a": 2}\n'
+    assert collect(ndjson_rows(chunked(body, 16), max_row_bytes=32)) == [
+        (1, {"a": 1}), (2, "Row longer than 32 bytes"), (3, {"a": 2}),
+    ]
+
+
+@pytest.mark.parametrize("size", [1, 5, 4096])
+def test_csv_rows_keep_quoted_line_breaks(size):
+    body = '﻿name,message\r\nAsha,"Hi,\r\n""there"""\r\n\r\nBela\r\nCara,Bye'.encode()
+    assert collect(csv_rows(chunked(body, size), required=["name"])) == [
+        (2, {"name": "Asha", "message": 'Hi,\r\n"there"'}), (4, "Expected 2 fields, found 1"),
+        (5, {"name": "Cara", "message": "Bye"}),
+    ]
+
+
+def test_csv_without_required_columns_is_refused():
+    with pytest.raises(UploadError):
+        collect(csv_rows(chunked(b"name,email\nAsha,a@example.com\n", 64), required=["name", "service"]))
+
+
+@pytest.fixture
+def client(monkeypatch):
+    db = FakeDatabase()
+    asyncio.run(ensure_indexes(db.contact_submissions))
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "db_breaker", CircuitBreaker())
+    monkeypatch.setattr(server, "search_backend", InMemorySearchIndex())
+    monkeypatch.setattr(server, "IMPORT_BATCH_SIZE", 2)
+    return TestClient(server.app), db
+
+
+def test_imports_report_each_row_that_was_not_imported(client):
+    client, db = client
+    asyncio.run(server.save_contact_submission(server.ContactSubmissionCreate(**lead(1)), "content:x"))
+    body = "\n".join(server.dump_json(row).decode() for row in [
+        lead(2), lead(3, email="nope"), lead(4), lead(2), lead(5),
+    ])
+    response = client.post("/api/contact-submissions/import", content=body, headers=ADMIN)
+    report = response.json()
+    assert (report["imported"], report["duplicates"], report["failed"]) == (3, 1, 1)
+    assert [(error["row"], error["error"]) for error in report["errors"]] == [(2, "invalid"), (4, "duplicate")]
+    assert report["errors"][0]["detail"][0]["loc"] == ["email"]
+
+    first = next(doc for doc in db.contact_submissions.docs if doc["name"] == "Lead 2")
+    assert report["errors"][1]["id"] == first["id"]
+    assert db.operations.count(("insert_many", "contact_submissions")) == 2
+    assert {"Lead 2", "Lead 4", "Lead 5"} <= {doc["name"] for doc in db.contact_submissions.docs}
+    assert sum(doc["count"] for doc in db.lead_stats.docs) == 4
+    assert "notification" not in first
+
+    # Importing the same list again adds nothing
+    again = client.post("/api/contact-submissions/import", content=body, headers=ADMIN).json()
+    assert (again["imported"], again["duplicates"]) == (0, 4)
+
+
+def test_csv_imports_and_refusals(client):
+    client, db = client
+    body = "name,email,service,message\nAsha,asha@example.com,Yoga,Hi\n"
+    assert client.post("/api/contact-submissions/import?format=csv", content=body).status_code in (401, 403)
+    response = client.post("/api/contact-submissions/import?format=csv", content=body, headers=ADMIN)
+    assert response.json()["imported"] == 1
+
+    response = client.post("/api/contact-submissions/import?format=csv", content="name\nAsha\n", headers=ADMIN)
+    assert response.status_code == 400 and response.json()["imported"] == 0
+
+
+def test_leads_past_their_idempotency_window_are_imported_again(client):
+    client, db = client
+    for number in (1, 2):
+        asyncio.run(server.save_contact_submission(
+            server.ContactSubmissionCreate(**lead(number)),
+            content_key(f"lead{number}@example.com", "Yoga", f"Hello {number}"),
+        ))
+    old = db.contact_submissions.docs[0]
+    old["idempotency_expires_at"] = datetime.utcnow() - timedelta(days=1)
+
+    body = "\n".join(server.dump_json(row).decode() for row in [lead(1), lead(2)])
+    report = client.post("/api/contact-submissions/import", content=body, headers=ADMIN).json()
+    assert (report["imported"], report["duplicates"]) == (1, 1)
+    assert report["errors"][0]["id"] == db.contact_submissions.docs[1]["id"]
+    assert "idempotency_key" not in old
+    assert [doc["name"] for doc in db.contact_submissions.docs].count("Lead 1") == 2
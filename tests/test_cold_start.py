@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+from benchmarks.import_profile import import_profile, import_seconds, time_to_first_response
+
+pytest.importorskip("uvicorn")
+
+# Generous enough for a loaded CI runner; tighten with the environment variables
+IMPORT_BUDGET = float(os.environ.get("IMPORT_BUDGET_MS", "1500")) / 1000
+FIRST_RESPONSE_BUDGET = float(os.environ.get("FIRST_RESPONSE_BUDGET_MS", "5000")) / 1000
+
+# Never needed to serve a request; importing them would only slow cold starts
+HEAVY_MODULES = {"pandas", "numpy", "boto3", "botocore", "motor"}
+
+
+def test_import_time_within_budget():
+    assert import_seconds() < IMPORT_BUDGET
+
+
+def test_heavy_modules_not_imported():
+    _, modules = import_profile()
+    imported = {name.split(".", 1)[0] for name, _, _, _ in modules}
+    assert not imported & HEAVY_MODULES
+
+
+def test_lazy_startup_first_response_within_budget():
+    # Mongo is unreachable, so this also checks that lazy startup never waits on it
+    assert time_to_first_response("lazy") < FIRST_RESPONSE_BUDGET
@@ -0,0 +1,228 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from pymongo.errors import BulkWriteError, ServerSelectionTimeoutError
+
+import server
+from circuit_breaker import OPEN, CircuitBreaker, CircuitOpenError
+from contact_writer import ACK_ENQUEUE, BatchedWriter
+from tests.fake_mongo import FakeClient, FakeDatabase
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def batches(db):
+    return [op for op in db.operations if op[0] == "insert_many"]
+
+
+def test_flushes_on_batch_size():
+    db = FakeDatabase()
+
+    async def scenario():
+        writer = BatchedWriter(db.contact_submissions, max_batch=10, max_delay=60)
+        await writer.start()
+        waiters = [asyncio.create_task(writer.submit({"id": str(i)})) for i in range(25)]
+        await asyncio.sleep(0.01)
+        # The last partial batch is only written by close()
+        assert len(db.contact_submissions.docs) == 20
+        assert sum(waiter.done() for waiter in waiters) == 20
+        await writer.close()
+        await asyncio.gather(*waiters)
+
+    run(scenario())
+    assert len(db.contact_submissions.docs) == 25
+    assert len(batches(db)) == 3
+
+
+def test_flushes_on_max_delay():
+    db = FakeDatabase()
+
+    async def scenario():
+        writer = BatchedWriter(db.contact_submissions, max_batch=100, max_delay=0.01)
+        await writer.start()
+        await writer.submit({"id": "a"})
+        assert len(db.contact_submissions.docs) == 1
+        await writer.close()
+
+    run(scenario())
+    assert len(batches(db)) == 1
+
+
+def test_enqueue_ack_returns_before_write_and_close_drains():
+    db = FakeDatabase()
+
+    async def scenario():
+        writer = BatchedWriter(db.contact_submissions, max_batch=100, max_delay=60)
+        await writer.start()
+        for i in range(5):
+            await writer.submit({"id": str(i)}, ack=ACK_ENQUEUE)
+        assert db.contact_submissions.docs == []
+        await writer.close()
+
+    run(scenario())
+    assert [doc["id"] for doc in db.contact_submissions.docs] == ["0", "1", "2", "3", "4"]
+
+
+class StalledCollection:
+    """Collection whose inserts wait until released, like a slow primary"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.released = asyncio.Event()
+
+    async def insert_many(self, documents, ordered=True):
+        await self.released.wait()
+        return await self.collection.insert_many(documents, ordered=ordered)
+
+
+def test_bounded_queue_applies_backpressure():
+    db = FakeDatabase()
+
+    async def scenario():
+        stalled = StalledCollection(db.contact_submissions)
+        writer = BatchedWriter(stalled, max_batch=1, max_delay=60, max_queue=2)
+        await writer.start()
+        # One document is stuck in the stalled flush, two more fill the queue
+        for i in range(3):
+            await writer.submit({"id": str(i)}, ack=ACK_ENQUEUE)
+            await asyncio.sleep(0)
+        blocked = asyncio.create_task(writer.submit({"id": "3"}, ack=ACK_ENQUEUE))
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+        stalled.released.set()
+        await blocked
+        await writer.close()
+
+    run(scenario())
+    assert len(db.contact_submissions.docs) == 4
+
+
+def test_failed_documents_surface_to_flush_waiters():
+    db = FakeDatabase()
+
+    async def scenario():
+        collection = db.contact_submissions
+        await collection.create_index("id", unique=True)
+        writer = BatchedWriter(collection, max_batch=3, max_delay=60)
+        await writer.start()
+        results = await asyncio.gather(
+            writer.submit({"id": "a"}), writer.submit({"id": "a"}), writer.submit({"id": "b"}),
+            return_exceptions=True,
+        )
+        await writer.close()
+        return results
+
+    results = run(scenario())
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], BulkWriteError)
+    assert len(db.contact_submissions.docs) == 2
+
+
+class FailingCollection:
+    async def insert_many(self, documents, ordered=True):
+        raise ConnectionError("primary stepped down")
+
+
+def test_stored_hook_sees_only_written_documents_and_failed_enqueues_are_handed_over():
+    db = FakeDatabase()
+    stored, failed = [], []
+
+    async def on_stored(documents):
+        stored.extend(document["id"] for document in documents)
+
+    async def on_failed(documents, error):
+        failed.extend(document["id"] for document in documents)
+
+    async def scenario():
+        collection = db.contact_submissions
+        await collection.create_index("id", unique=True)
+        writer = BatchedWriter(collection, max_batch=2, max_delay=60, on_stored=on_stored, on_failed=on_failed)
+        await writer.start()
+        # A duplicate was stored earlier, so it is neither announced again nor handed over
+        await writer.submit({"id": "a"}, ack=ACK_ENQUEUE)
+        await writer.submit({"id": "a"}, ack=ACK_ENQUEUE)
+        await writer.close()
+
+        writer.collection = FailingCollection()
+        await writer.start()
+        await writer.submit({"id": "b"}, ack=ACK_ENQUEUE)
+        flushed = asyncio.create_task(writer.submit({"id": "c"}))
+        await asyncio.sleep(0)
+        await writer.close()
+        with pytest.raises(ConnectionError):
+            await flushed
+
+    run(scenario())
+    assert stored == ["a"]
+    # The flush-acknowledged submitter saw the error itself
+    assert failed == ["b"]
+
+
+class UnreachableCollection:
+    def __init__(self):
+        self.attempts = 0
+
+    async def insert_many(self, documents, ordered=True):
+        self.attempts += 1
+        raise ServerSelectionTimeoutError("No servers available")
+
+
+def test_flushes_go_through_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: 0.0)
+    collection = UnreachableCollection()
+    failed = []
+
+    async def on_failed(documents, error):
+        failed.append((len(documents), type(error)))
+
+    async def scenario():
+        writer = BatchedWriter(collection, max_batch=1, max_delay=60, on_failed=on_failed, breaker=breaker)
+        await writer.start()
+        await writer.submit({"id": "a"}, ack=ACK_ENQUEUE)
+        await writer.submit({"id": "b"}, ack=ACK_ENQUEUE)
+        await writer.close()
+
+    run(scenario())
+    assert breaker.state == OPEN
+    # The second batch failed fast without reaching the database, and both were handed over
+    assert collection.attempts == 1
+    assert failed == [(1, ServerSelectionTimeoutError), (1, CircuitOpenError)]
+
+
+def test_submit_after_close_is_rejected():
+    db = FakeDatabase()
+
+    async def scenario():
+        writer = BatchedWriter(db.contact_submissions)
+        await writer.start()
+        await writer.close()
+        with pytest.raises(RuntimeError):
+            await writer.submit({"id": "late"})
+
+    run(scenario())
+
+
+def test_contact_endpoint_uses_batched_writer(monkeypatch):
+    db = FakeDatabase()
+    writer = BatchedWriter(db.contact_submissions, max_batch=100, max_delay=60)
+    mongo_client = FakeClient(db)
+    monkeypatch.setattr(server, "connect_database", lambda: (mongo_client, db))
+    monkeypatch.setattr(server, "db", None)
+    monkeypatch.setattr(server.portfolio_store, "collection", None)
+    monkeypatch.setattr(server, "contact_writer", writer)
+    monkeypatch.setattr(server, "CONTACT_WRITE_ACK", ACK_ENQUEUE)
+    monkeypatch.setattr(server.portfolio_store, "start", lambda: asyncio.sleep(0))
+    monkeypatch.setattr(server.portfolio_store, "stop", lambda: asyncio.sleep(0))
+
+    form = {"name": "Asha", "email": "asha@example.com", "service": "Sound Healing", "message": "Hi"}
+    with TestClient(server.app) as client:
+        response = client.post("/api/contact", json=form)
+        assert response.status_code == 200
+        assert response.json()["success"] is True
+        assert db.contact_submissions.docs == []
+    # Shutdown drained the queue before closing the client
+    assert db.contact_submissions.docs[0]["email"] == "asha@example.com"
+    assert mongo_client.closed
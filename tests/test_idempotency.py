@@ -0,0 +1,165 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from contact_writer import BatchedWriter
+from idempotency import IdempotencyGuard, TTLCache, content_key
+from submissions import ensure_indexes
+from tests.fake_mongo import FakeDatabase
+
+FORM = {"name": "Asha", "email": "asha@example.com", "service": "Sound Healing", "message": "Hello"}
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeDatabase()
+    asyncio.run(ensure_indexes(db.contact_submissions))
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "contact_idempotency", IdempotencyGuard(TTLCache(max_entries=100, ttl=60)))
+    return db
+
+
+@pytest.fixture
+def client(db):
+    return TestClient(server.app)
+
+
+def test_retry_with_same_key_is_replayed(client, db):
+    headers = {"Idempotency-Key": "retry-1"}
+    first = client.post("/api/contact", json=FORM, headers=headers)
+    second = client.post("/api/contact", json=FORM, headers=headers)
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json()
+    assert second.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+    assert len(db.contact_submissions.docs) == 1
+
+
+def test_content_hash_fallback(client, db):
+    first = client.post("/api/contact", json=FORM)
+    second = client.post("/api/contact", json={**FORM, "email": "ASHA@example.com "})
+    assert second.json()["id"] == first.json()["id"]
+    other = client.post("/api/contact", json={**FORM, "message": "Something else"})
+    assert other.json()["id"] != first.json()["id"]
+    assert len(db.contact_submissions.docs) == 2
+
+
+def test_unique_index_catches_keys_unknown_to_this_process(client, db, monkeypatch):
+    first = client.post("/api/contact", json=FORM, headers={"Idempotency-Key": "k"}).json()
+    # Another worker (or a restart) has an empty cache
+    monkeypatch.setattr(server, "contact_idempotency", IdempotencyGuard(TTLCache()))
+    db.operations.clear()
+    second = client.post("/api/contact", json=FORM, headers={"Idempotency-Key": "k"})
+    assert second.json()["id"] == first["id"]
+    assert len(db.contact_submissions.docs) == 1
+
+
+def test_key_reused_with_a_different_body_is_rejected(client, db, monkeypatch):
+    headers = {"Idempotency-Key": "shared"}
+    first = client.post("/api/contact", json=FORM, headers=headers)
+    assert first.status_code == 200
+    assert client.post("/api/contact", json={**FORM, "message": "Other"}, headers=headers).status_code == 422
+    # A worker that never saw the key checks the stored body hash instead
+    monkeypatch.setattr(server, "contact_idempotency", IdempotencyGuard(TTLCache()))
+    assert client.post("/api/contact", json={**FORM, "name": "Bela"}, headers=headers).status_code == 422
+    assert client.post("/api/contact", json=FORM, headers=headers).json()["id"] == first.json()["id"]
+    assert len(db.contact_submissions.docs) == 1
+
+
+def test_stored_keys_expire(client, db, monkeypatch):
+    first = client.post("/api/contact", json=FORM).json()["id"]
+    assert db.contact_submissions.docs[0]["idempotency_expires_at"] > datetime.utcnow()
+    db.contact_submissions.docs[0]["idempotency_expires_at"] = datetime.utcnow() - timedelta(seconds=1)
+    monkeypatch.setattr(server, "contact_idempotency", IdempotencyGuard(TTLCache()))
+
+    # The same message after the window is a new lead, and it now holds the key
+    second = client.post("/api/contact", json=FORM)
+    assert second.status_code == 200
+    assert second.json()["id"] != first
+    assert "idempotency_key" not in db.contact_submissions.docs[0]
+    assert db.contact_submissions.docs[1]["id"] == second.json()["id"]
+
+
+def test_replay_does_not_leak_key_into_listing(client, db, monkeypatch):
+    client.post("/api/contact", json=FORM, headers={"Idempotency-Key": "k"})
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    assert "idempotency_key" not in client.get("/api/contact-submissions", headers=ADMIN).json()[0]
+
+
+def test_concurrent_duplicates_write_once(db):
+    async def scenario():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(*(
+                client.post("/api/contact", json=FORM, headers={"Idempotency-Key": "burst"}) for _ in range(20)
+            ))
+        return responses
+
+    responses = asyncio.run(scenario())
+    assert {response.status_code for response in responses} == {200}
+    assert len({response.json()["id"] for response in responses}) == 1
+    assert len(db.contact_submissions.docs) == 1
+    assert [op for op in db.operations if op[0] == "insert_one"] == [("insert_one", "contact_submissions")]
+
+
+def test_concurrent_duplicates_in_batched_mode(db, monkeypatch):
+    async def scenario():
+        writer = BatchedWriter(db.contact_submissions, max_batch=50, max_delay=0.01)
+        monkeypatch.setattr(server, "contact_writer", writer)
+        await writer.start()
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(*(client.post("/api/contact", json=FORM) for _ in range(10)))
+        # Simulate a second worker flushing the same submission
+        monkeypatch.setattr(server, "contact_idempotency", IdempotencyGuard(TTLCache()))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses.append(await client.post("/api/contact", json=FORM))
+        await writer.close()
+        return responses
+
+    responses = asyncio.run(scenario())
+    assert len({response.json()["id"] for response in responses}) == 1
+    assert len(db.contact_submissions.docs) == 1
+
+
+def test_failed_operation_is_not_cached():
+    guard = IdempotencyGuard(TTLCache())
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("mongo down")
+        return "ok"
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await guard.run("k", flaky)
+        return await guard.run("k", flaky)
+
+    assert asyncio.run(scenario()) == ("ok", False)
+
+
+def test_ttl_cache_expiry_and_eviction():
+    now = [0.0]
+    cache = TTLCache(max_entries=2, ttl=10, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    # "b" was least recently used
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    now[0] = 11
+    assert cache.get("a") is None
+    assert len(cache) == 1
+
+
+def test_content_key_ignores_email_case():
+    assert content_key("A@x.com", "s", "m") == content_key(" a@x.com", "s", "m")
+    assert content_key("a@x.com", "s", "m") != content_key("a@x.com", "s", "m2")
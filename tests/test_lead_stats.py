@@ -0,0 +1,127 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from archive import SubmissionArchive
+from idempotency import IdempotencyGuard, TTLCache
+from lead_stats import ensure_rollup_indexes, read_stats, rebuild
+from submissions import ensure_indexes
+from tests.fake_mongo import FakeDatabase
+
+FORM = {"name": "Asha", "email": "asha@example.com", "service": "Sound Healing", "message": "Hello"}
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeDatabase()
+    asyncio.run(ensure_indexes(db.contact_submissions))
+    asyncio.run(ensure_rollup_indexes(db.lead_stats))
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "contact_idempotency", IdempotencyGuard(TTLCache(max_entries=100, ttl=60)))
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    return db
+
+
+@pytest.fixture
+def client(db):
+    return TestClient(server.app)
+
+
+def test_submissions_increment_rollup(client, db):
+    for i in range(3):
+        client.post("/api/contact", json={**FORM, "message": f"Hello {i}"})
+    client.post("/api/contact", json={**FORM, "service": "Yoga for Beginners"})
+    # A replayed retry is not a new lead
+    client.post("/api/contact", json={**FORM, "message": "Hello 0"})
+
+    stats = client.get("/api/contact-submissions/stats", headers=ADMIN).json()
+    assert stats["total"] == 4
+    assert stats["by_service"] == {"Sound Healing": 3, "Yoga for Beginners": 1}
+    assert stats["by_status"] == {"new": 4}
+    assert [day["total"] for day in stats["by_day"]] == [4]
+    assert len(db.lead_stats.docs) == 2
+
+
+def test_status_change_moves_count(client, db):
+    submission_id = client.post("/api/contact", json=FORM).json()["id"]
+
+    response = client.patch(f"/api/contact-submissions/{submission_id}", json={"status": "resolved"}, headers=ADMIN)
+    assert response.json()["changed"] is True
+    # Setting the same status again must not move the count twice
+    response = client.patch(f"/api/contact-submissions/{submission_id}", json={"status": "resolved"}, headers=ADMIN)
+    assert response.json()["changed"] is False
+
+    stats = client.get("/api/contact-submissions/stats", headers=ADMIN).json()
+    assert stats["by_status"] == {"resolved": 1}
+    assert db.contact_submissions.docs[0]["status"] == "resolved"
+
+
+def test_status_change_requires_admin_and_known_id(client):
+    assert client.patch("/api/contact-submissions/x", json={"status": "resolved"}).status_code == 401
+    response = client.patch("/api/contact-submissions/missing", json={"status": "resolved"}, headers=ADMIN)
+    assert response.status_code == 404
+
+
+def test_stats_filter_by_day_and_service(db):
+    base = datetime(2025, 3, 1, 23, 30)
+    for i in range(6):
+        db.lead_stats.docs.append({
+            "day": (base + timedelta(days=i)).strftime("%Y-%m-%d"),
+            "service": "Sound Healing" if i % 2 else "Yoga for Beginners",
+            "status": "new",
+            "count": i + 1,
+        })
+    stats = asyncio.run(read_stats(
+        db.lead_stats, since=datetime(2025, 3, 2).date(), until=datetime(2025, 3, 5).date(), service="Sound Healing"
+    ))
+    assert [(day["day"], day["total"]) for day in stats["by_day"]] == [("2025-03-02", 2), ("2025-03-04", 4)]
+    assert stats["total"] == 6
+
+
+def test_rebuild_repairs_drift(client, db):
+    base = datetime(2025, 1, 1, 9, 0)
+    for i in range(10):
+        db.contact_submissions.docs.append({
+            "id": str(uuid.UUID(int=i)),
+            "service": "Sound Healing" if i % 3 else "Yoga for Beginners",
+            "submitted_at": base + timedelta(hours=10 * i),
+            "status": "resolved" if i % 4 == 0 else "new",
+        })
+    db.lead_stats.docs.append({"day": "2025-01-01", "service": "Sound Healing", "status": "new", "count": 99})
+    db.lead_stats.docs.append({"day": "2024-12-31", "service": "Sound Healing", "status": "new", "count": 5})
+
+    asyncio.run(rebuild(db.contact_submissions, db.lead_stats, batch_size=3))
+
+    # Buckets are overwritten in place rather than deleted and inserted again
+    stale = [doc for doc in db.lead_stats.docs if doc["day"] == "2024-12-31"]
+    assert [doc["count"] for doc in stale] == [0]
+    stats = client.get("/api/contact-submissions/stats", headers=ADMIN).json()
+    assert stats["total"] == 10
+    assert stats["by_status"] == {"new": 7, "resolved": 3}
+    assert stats["by_service"] == {"Sound Healing": 6, "Yoga for Beginners": 4}
+    assert sum(day["total"] for day in stats["by_day"]) == 10
+
+
+def test_rebuild_counts_archived_submissions(client, db, tmp_path):
+    base = datetime(2025, 1, 1, 9, 0)
+    docs = [
+        {
+            "id": f"s{i}", "name": "Asha", "email": "asha@example.com", "message": "Hello",
+            "service": "Sound Healing", "submitted_at": base + timedelta(days=i), "status": "resolved",
+        }
+        for i in range(4)
+    ]
+    archive = SubmissionArchive(tmp_path, rescan_interval=0)
+    archive.write(docs[:3])
+    # s2 is also still in the collection, as after an interrupted archive run
+    db.contact_submissions.docs.extend(docs[2:])
+
+    asyncio.run(rebuild(db.contact_submissions, db.lead_stats, archive=archive))
+    stats = client.get("/api/contact-submissions/stats", headers=ADMIN).json()
+    assert stats["total"] == 4
+    assert [day["day"] for day in stats["by_day"]] == ["2025-01-01", "2025-01-02", "2025-01-03", "2025-01-04"]
@@ -0,0 +1,152 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+import server
+from idempotency import IdempotencyGuard, TTLCache
+from live_feed import SubmissionBroker, stream_events
+from submissions import cursor_for, ensure_indexes
+from tests.fake_mongo import FakeDatabase
+
+NOW = datetime(2025, 5, 1, 12, 0)
+FORM = {"name": "Asha", "email": "asha@example.com", "service": "Sound Healing", "message": "Hello"}
+
+
+def submission(i, **fields):
+    return {
+        "id": f"lead-{i}",
+        "name": f"Lead {i}",
+        "email": f"lead{i}@example.com",
+        "service": "Sound Healing",
+        "message": f"Message {i}",
+        "submitted_at": NOW + timedelta(seconds=i),
+        "status": "new",
+        **fields,
+    }
+
+
+def parse_event(frame):
+    fields = dict(line.split(": ", 1) for line in frame.decode().strip().splitlines())
+    return fields["id"], json.loads(fields["data"])
+
+
+@pytest.fixture
+def db():
+    db = FakeDatabase()
+    asyncio.run(ensure_indexes(db.contact_submissions))
+    db.contact_submissions.docs.extend(submission(i) for i in range(3))
+    return db
+
+
+def test_each_submission_is_encoded_once_for_every_subscriber():
+    broker = SubmissionBroker()
+    first, second = broker.subscribe(), broker.subscribe()
+    broker.publish(submission(0, idempotency_key="key"))
+
+    async def receive():
+        return await first.next(), await second.next()
+
+    one, two = asyncio.run(receive())
+    assert one is two
+    event_id, row = parse_event(one.frame)
+    assert event_id == cursor_for(submission(0))
+    assert row == {**submission(0), "submitted_at": NOW.isoformat()}
+
+
+def test_subscriber_that_falls_behind_is_dropped():
+    broker = SubmissionBroker(queue_size=2)
+    slow, fast = broker.subscribe(), broker.subscribe()
+
+    async def scenario():
+        for i in range(3):
+            broker.publish(submission(i))
+            assert (await fast.next()).id == f"lead-{i}"
+        assert await slow.next() is None
+
+    asyncio.run(scenario())
+    assert slow.closed and len(broker) == 1
+
+
+def test_reconnect_backfills_then_streams_live(db):
+    broker = SubmissionBroker(db.contact_submissions)
+
+    async def scenario():
+        subscription = broker.subscribe()
+        stream = stream_events(broker, subscription, cursor_for(submission(0)))
+        frames = [await stream.__anext__(), await stream.__anext__()]
+        # lead-2 was already sent by the backfill
+        broker.publish(submission(2))
+        broker.publish(submission(3))
+        frames.append(await stream.__anext__())
+        await broker.stop()
+        assert [frame async for frame in stream] == []
+        return frames
+
+    frames = asyncio.run(scenario())
+    assert [parse_event(frame)[1]["id"] for frame in frames] == ["lead-1", "lead-2", "lead-3"]
+    assert len(broker) == 0
+
+
+def test_long_backfill_ends_the_stream_for_the_next_reconnect(db):
+    broker = SubmissionBroker(db.contact_submissions)
+
+    async def collect(after):
+        subscription = broker.subscribe()
+        return [frame async for frame in stream_events(broker, subscription, after, backfill_limit=1)]
+
+    frames = asyncio.run(collect(cursor_for(submission(0))))
+    assert [parse_event(frame)[1]["id"] for frame in frames] == ["lead-1"]
+    assert len(broker) == 0
+
+
+def inserted(seconds):
+    return ObjectId.from_datetime(NOW + timedelta(seconds=seconds))
+
+
+def test_poll_brings_in_other_workers_submissions(db):
+    for doc in db.contact_submissions.docs:
+        doc["_id"] = inserted(int(doc["id"].split("-")[1]))
+    # Written late by another worker, e.g. replayed from its spool, so submitted_at is long past
+    db.contact_submissions.docs.append(submission(3, submitted_at=NOW - timedelta(hours=1), _id=inserted(2)))
+    broker = SubmissionBroker(db.contact_submissions, lookback=1, clock=lambda: NOW + timedelta(seconds=2))
+    subscription = broker.subscribe()
+    asyncio.run(broker.poll())
+    # Stored by this worker too, and published when it was
+    broker.publish(submission(2))
+    ids = [event.id for event in subscription._events]
+    assert ids == ["lead-1", "lead-2", "lead-3"]
+
+
+@pytest.fixture
+def feed(db, monkeypatch):
+    broker = SubmissionBroker(db.contact_submissions, max_subscribers=1)
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "submission_feed", broker)
+    monkeypatch.setattr(server, "contact_idempotency", IdempotencyGuard(TTLCache(max_entries=100, ttl=60)))
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    return broker
+
+
+def test_contact_submissions_are_pushed(feed):
+    subscription = feed.subscribe()
+    submission_id = TestClient(server.app).post("/api/contact", json=FORM).json()["id"]
+    event = asyncio.run(subscription.next())
+    assert event.id == submission_id
+    assert "idempotency_key" not in parse_event(event.frame)[1]
+
+
+def test_feed_requires_admin(feed):
+    assert TestClient(server.app).get("/api/contact-submissions/feed").status_code == 401
+
+
+def test_feed_rejects_bad_cursors_and_excess_subscribers(feed):
+    client = TestClient(server.app, headers={"X-Admin-Token": "secret"})
+    assert client.get("/api/contact-submissions/feed", headers={"Last-Event-ID": "bogus"}).status_code == 400
+    feed.subscribe()
+    response = client.get("/api/contact-submissions/feed")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "30"
@@ -0,0 +1,101 @@
+import re
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+import metrics
+from metrics import Histogram, MetricsMiddleware, MongoCommandMetrics, MongoPoolMetrics, render
+
+
+@pytest.fixture
+def client():
+    server.http_metrics.clear()
+    return TestClient(server.app)
+
+
+def sample(body, name, **labels):
+    label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(rf"^{re.escape(name)}{{{re.escape(label_text)}}} (\S+)$", body, re.M)
+    return float(match.group(1)) if match else None
+
+
+def test_routes_are_labelled_by_template(client):
+    client.get("/api/portfolio/hero")
+    client.get("/api/portfolio/about")
+    client.get("/api/portfolio/nope")
+    client.get("/api/does-not-exist")
+    body = client.get("/metrics").text
+
+    assert sample(body, "http_requests_total", method="GET", route="/api/portfolio/{section}", status=200) == 2
+    assert sample(body, "http_requests_total", method="GET", route="/api/portfolio/{section}", status=404) == 1
+    assert sample(body, "http_requests_total", method="GET", route="unmatched", status=404) == 1
+    assert sample(body, "http_request_duration_seconds_count", method="GET", route="/api/portfolio/{section}") == 3
+    assert sample(
+        body, "http_request_duration_seconds_bucket", method="GET", route="/api/portfolio/{section}", le="+Inf"
+    ) == 3
+    # The scrape itself is in flight while the body is rendered
+    assert sample(body, "http_requests_in_flight", method="GET", route="/metrics") == 1
+    assert sample(body, "http_requests_in_flight", method="GET", route="/api/portfolio/{section}") == 0
+
+
+def test_routes_are_matched_by_method_as_well_as_path(client):
+    # PATCH /api/contact-submissions/{submission_id} also matches these paths, but not for GET
+    client.get("/api/contact-submissions/export")
+    client.get("/api/contact-submissions/archive")
+    body = client.get("/metrics").text
+
+    def count(route):
+        return sample(body, "http_request_duration_seconds_count", method="GET", route=route)
+
+    assert count("/api/contact-submissions/export") == 1
+    assert count("/api/contact-submissions/archive") == 1
+    assert count("/api/contact-submissions/{submission_id}") is None
+
+
+def test_route_cache_keeps_recent_matches_only(monkeypatch):
+    monkeypatch.setattr(metrics, "ROUTE_CACHE_SIZE", 2)
+    middleware = MetricsMiddleware(None, metrics.HTTPMetrics(), server.app.routes)
+    assert middleware.route_for("GET", "/api/nope") == "unmatched"
+    for section in ("hero", "about", "services"):
+        assert middleware.route_for("GET", f"/api/portfolio/{section}") == "/api/portfolio/{section}"
+    middleware.route_for("GET", "/api/portfolio/about")
+    assert list(middleware._route_cache) == [("GET", "/api/portfolio/services"), ("GET", "/api/portfolio/about")]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 5.0):
+        histogram.observe(value)
+    lines = list(histogram.exposition("h", 'x="y"'))
+    assert lines[:3] == ['h_bucket{x="y",le="0.1"} 2', 'h_bucket{x="y",le="1.0"} 3', 'h_bucket{x="y",le="+Inf"} 4']
+    assert lines[-1] == 'h_count{x="y"} 4'
+
+
+def test_mongo_listeners():
+    commands = MongoCommandMetrics()
+    commands.succeeded(SimpleNamespace(command_name="find", duration_micros=1500))
+    commands.failed(SimpleNamespace(command_name="insert", duration_micros=200000))
+    pool = MongoPoolMetrics()
+    address = ("localhost", 27017)
+    pool.connection_created(SimpleNamespace(address=address))
+    pool.connection_created(SimpleNamespace(address=address))
+    pool.connection_checked_out(SimpleNamespace(address=address))
+    pool.connection_closed(SimpleNamespace(address=address))
+    body = render(commands, pool).decode()
+
+    assert sample(body, "mongodb_command_duration_seconds_count", command="find") == 1
+    assert sample(body, "mongodb_command_failures_total", command="insert") == 1
+    assert sample(body, "mongodb_pool_connections", address="localhost:27017") == 1
+    assert sample(body, "mongodb_pool_checked_out_connections", address="localhost:27017") == 1
+
+
+def test_listeners_are_registered_on_the_client():
+    mongo_client, _ = server.connect_database()
+    try:
+        listeners = mongo_client.delegate.options.event_listeners
+        assert server.mongo_command_metrics in listeners
+        assert server.mongo_pool_metrics in listeners
+    finally:
+        mongo_client.close()
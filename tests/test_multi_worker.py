@@ -0,0 +1,98 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import httpx
+import pytest
+
+pytest.importorskip("uvicorn")
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+WORKERS = 3
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def worker_pids(parent_pid):
+    children = Path(f"/proc/{parent_pid}/task/{parent_pid}/children")
+    if not children.exists():
+        pytest.skip("needs /proc to list worker processes")
+    pids = []
+    for pid in children.read_text().split():
+        # multiprocessing also starts a resource tracker next to the workers
+        cmdline = Path(f"/proc/{pid}/cmdline").read_bytes()
+        if b"resource_tracker" not in cmdline:
+            pids.append(int(pid))
+    return pids
+
+
+@pytest.fixture
+def server_url():
+    port = free_port()
+    env = dict(
+        os.environ,
+        # Nothing listens here: workers must still start and serve the seeded portfolio
+        MONGO_URL="mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=200",
+        DB_NAME="multi_worker_test",
+        RATE_LIMITS="",
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:create_app", "--factory",
+         "--host", "127.0.0.1", "--port", str(port), "--workers", str(WORKERS), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                if httpx.get(f"{url}/api/", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if process.poll() is not None or time.monotonic() > deadline:
+                pytest.fail("uvicorn workers did not come up")
+            time.sleep(0.1)
+        yield url, process
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def test_workers_serve_in_parallel(server_url):
+    url, process = server_url
+    # Workers bind the shared socket at different times; wait for all of them
+    deadline = time.monotonic() + 30
+    while len(worker_pids(process.pid)) < WORKERS and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert len(worker_pids(process.pid)) == WORKERS
+
+    def fetch(_):
+        with httpx.Client(base_url=url, timeout=10) as client:
+            return client.get("/api/portfolio", headers={"Accept-Encoding": "gzip"})
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        responses = list(pool.map(fetch, range(64)))
+
+    assert all(response.status_code == 200 for response in responses)
+    # Every worker warmed an identical cache, so the ETag does not depend on who answered
+    assert len({response.headers["etag"] for response in responses}) == 1
+    assert responses[0].json()["hero"]["name"]
+
+
+def test_shutdown_is_graceful(server_url):
+    url, process = server_url
+    assert httpx.get(f"{url}/api/portfolio/hero", timeout=10).status_code == 200
+    process.terminate()
+    assert process.wait(timeout=30) == 0
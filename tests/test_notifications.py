@@ -0,0 +1,205 @@
+import asyncio
+import socket
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from idempotency import IdempotencyGuard, TTLCache
+from notifications import DEAD, PENDING, SENT, NotificationOutbox, SMTPPool, ensure_outbox_indexes, outbox_entry
+from submissions import ensure_indexes
+from tests.fake_mongo import FakeDatabase
+
+pytest.importorskip("aiosmtpd")
+from aiosmtpd.controller import Controller  # noqa: E402
+
+NOW = datetime(2025, 5, 1, 12, 0)
+FORM = {"name": "Asha", "email": "asha@example.com", "service": "Sound Healing", "message": "Hello"}
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+class Inbox:
+    """aiosmtpd handler that keeps messages, or refuses recipients while refusing is set"""
+
+    def __init__(self):
+        self.messages = []
+        self.peers = set()
+        self.refusing = None
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if self.refusing:
+            return self.refusing
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope.content.decode())
+        self.peers.add(session.peer)
+        return "250 Message accepted for delivery"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def inbox():
+    handler = Inbox()
+    controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    handler.port = controller.port
+    yield handler
+    controller.stop()
+
+
+class Clock:
+    def __init__(self):
+        self.now = NOW
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def db():
+    db = FakeDatabase()
+    asyncio.run(ensure_indexes(db.contact_submissions))
+    asyncio.run(ensure_outbox_indexes(db.contact_submissions))
+    for i in range(5):
+        db.contact_submissions.docs.append({
+            "id": f"lead-{i}",
+            "name": f"Lead {i}",
+            "email": f"lead{i}@example.com",
+            "service": "Sound Healing",
+            "message": f"Message {i}",
+            "submitted_at": NOW,
+            "status": "new",
+            "notification": outbox_entry(NOW),
+        })
+    return db
+
+
+def make_outbox(db, port, clock, **options):
+    return NotificationOutbox(
+        db.contact_submissions,
+        SMTPPool(host="127.0.0.1", port=port, size=1, timeout=5),
+        sender="site@example.com",
+        recipient="gunjan@example.com",
+        clock=clock,
+        **options,
+    )
+
+
+def states(db):
+    return [doc["notification"]["state"] for doc in db.contact_submissions.docs]
+
+
+def test_batch_is_delivered_over_one_connection(db, inbox):
+    outbox = make_outbox(db, inbox.port, Clock(), batch_size=10)
+
+    async def deliver():
+        claimed = await outbox.process_batch()
+        await outbox.smtp.close()
+        return claimed
+
+    assert asyncio.run(deliver()) == 5
+    assert states(db) == [SENT] * 5
+    assert len(inbox.messages) == 5 and len(inbox.peers) == 1
+    assert "Subject: New contact from Lead 0 (Sound Healing)" in inbox.messages[0]
+    assert "Reply-To: lead0@example.com" in inbox.messages[0]
+    assert ("bulk_write", "contact_submissions") in db.operations
+
+
+def test_line_breaks_in_header_fields_are_flattened(db, inbox):
+    db.contact_submissions.docs[0]["name"] = "Lead\r\nBcc: victim@example.com"
+    db.contact_submissions.docs[0]["service"] = "Sound\nHealing"
+    outbox = make_outbox(db, inbox.port, Clock(), batch_size=10)
+
+    async def deliver():
+        await outbox.process_batch()
+        await outbox.smtp.close()
+
+    asyncio.run(deliver())
+    assert states(db) == [SENT] * 5
+    message = next(message for message in inbox.messages if "victim" in message)
+    assert "Subject: New contact from Lead Bcc: victim@example.com (Sound Healing)" in message
+    lines = message.splitlines()
+    headers = lines[:lines.index("")]
+    assert not [line for line in headers if line.startswith("Bcc:")]
+
+
+def test_claims_are_exclusive(db):
+    outbox = make_outbox(db, 1, Clock(), batch_size=3)
+    first = asyncio.run(outbox.claim())
+    second = asyncio.run(outbox.claim())
+    third = asyncio.run(outbox.claim())
+    assert len(first) == 3 and len(second) == 2 and third == []
+    assert {doc["id"] for doc in first}.isdisjoint(doc["id"] for doc in second)
+
+
+def test_failures_back_off_then_dead_letter(db):
+    clock = Clock()
+    # Nothing listens on the port, so every attempt fails
+    outbox = make_outbox(db, free_port(), clock, batch_size=10, max_attempts=3, retry_base=10)
+
+    assert asyncio.run(outbox.process_batch()) == 5
+    entry = db.contact_submissions.docs[0]["notification"]
+    assert entry["state"] == PENDING and entry["attempts"] == 1
+    assert entry["next_attempt_at"] == NOW + timedelta(seconds=10)
+    assert "claim" not in entry
+    # Not due yet
+    assert asyncio.run(outbox.process_batch()) == 0
+
+    clock.now += timedelta(seconds=10)
+    asyncio.run(outbox.process_batch())
+    assert db.contact_submissions.docs[0]["notification"]["next_attempt_at"] == clock.now + timedelta(seconds=20)
+
+    clock.now += timedelta(seconds=20)
+    asyncio.run(outbox.process_batch())
+    assert states(db) == [DEAD] * 5
+    assert db.contact_submissions.docs[0]["notification"]["last_error"]
+
+
+def test_refused_recipient_is_dead_lettered_at_once(db, inbox):
+    inbox.refusing = "550 No such user"
+    outbox = make_outbox(db, inbox.port, Clock(), batch_size=10)
+    asyncio.run(outbox.process_batch())
+    assert states(db) == [DEAD] * 5
+    assert db.contact_submissions.docs[0]["notification"]["attempts"] == 1
+
+
+def test_workers_deliver_in_background(db, inbox):
+    outbox = make_outbox(db, inbox.port, Clock(), workers=2, batch_size=2, poll_interval=0.05)
+
+    async def run():
+        await outbox.start()
+        for _ in range(200):
+            if len(inbox.messages) == 5:
+                break
+            await asyncio.sleep(0.01)
+        await outbox.stop()
+
+    asyncio.run(run())
+    assert states(db) == [SENT] * 5
+    assert sorted(message.count("Message ") for message in inbox.messages) == [1] * 5
+
+
+def test_request_path_only_queues(monkeypatch):
+    db = FakeDatabase()
+    asyncio.run(ensure_indexes(db.contact_submissions))
+    # The SMTP port is closed and the workers are not running: the request must not care
+    outbox = make_outbox(db, free_port(), Clock())
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "notification_outbox", outbox)
+    monkeypatch.setattr(server, "contact_idempotency", IdempotencyGuard(TTLCache(max_entries=100, ttl=60)))
+
+    response = TestClient(server.app).post("/api/contact", json=FORM)
+    assert response.status_code == 200
+    entry = db.contact_submissions.docs[0]["notification"]
+    assert entry["state"] == PENDING and entry["attempts"] == 0
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    listed = TestClient(server.app).get("/api/contact-submissions", headers=ADMIN).json()
+    assert "notification" not in listed[0]
@@ -0,0 +1,87 @@
+import gzip
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from response_cache import SerializedBody, SerializedCache
+
+
+@pytest.fixture
+def client():
+    server.portfolio_cache.invalidate()
+    return TestClient(server.app)
+
+
+def test_portfolio_body_matches_model(client):
+    response = client.get("/api/portfolio", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert "content-encoding" not in response.headers
+    expected = server.PortfolioData(**server.portfolio_data).model_dump()
+    assert response.json() == expected
+
+
+def test_portfolio_is_serialized_once(client, monkeypatch):
+    calls = []
+    original = server.serialize_portfolio
+
+    def counting():
+        calls.append(1)
+        return original()
+
+    monkeypatch.setattr(server, "serialize_portfolio", counting)
+    for _ in range(5):
+        assert client.get("/api/portfolio").status_code == 200
+    assert len(calls) == 1
+
+    monkeypatch.setitem(server.portfolio_store.versions, "hero", server.portfolio_store.versions["hero"] + 1)
+    client.get("/api/portfolio")
+    assert len(calls) == 2
+
+
+def test_portfolio_conditional_get(client, monkeypatch):
+    monkeypatch.setattr(server.portfolio_store, "loaded", True)
+    first = client.get("/api/portfolio", headers={"Accept-Encoding": "identity"})
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == server.PORTFOLIO_CACHE_CONTROL
+
+    second = client.get("/api/portfolio", headers={"If-None-Match": etag, "Accept-Encoding": "identity"})
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["etag"] == etag
+
+
+def test_seeded_portfolio_is_not_cached_before_the_store_loads(client, monkeypatch):
+    monkeypatch.setattr(server.portfolio_store, "loaded", False)
+    assert client.get("/api/portfolio").headers["cache-control"] == "no-cache"
+    assert client.get("/api/portfolio/hero").headers["cache-control"] == "no-cache"
+
+
+def test_portfolio_gzip_variant(client):
+    response = client.get("/api/portfolio", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    # httpx transparently decodes the body
+    assert response.json()["hero"]["name"] == server.portfolio_data["hero"]["name"]
+
+
+def test_variants_have_distinct_etags():
+    body = SerializedBody(json.dumps({"text": "x" * 2000}).encode())
+    assert gzip.decompress(body.gzip) == body.body
+    assert body.matches(body.etag)
+    assert body.matches(f'"nope", {body.etag[:-1]}-gzip"')
+    assert not body.matches('"nope"')
+
+
+def test_small_bodies_are_not_compressed():
+    body = SerializedBody(b"{}")
+    assert body.gzip is None and body.br is None
+
+
+def test_cache_rebuilds_on_version_change():
+    cache = SerializedCache()
+    first = cache.get("k", 1, lambda: b"{}")
+    assert cache.get("k", 1, lambda: b"[]") is first
+    assert cache.get("k", 2, lambda: b"[]").body == b"[]"
@@ -0,0 +1,71 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from portfolio import ProjectionError, field_index, parse_fields, project
+
+
+@pytest.fixture
+def client():
+    server.portfolio_cache.invalidate()
+    server.portfolio_projection_cache.invalidate()
+    return TestClient(server.app)
+
+
+def test_section_endpoint(client):
+    response = client.get("/api/portfolio/hero")
+    assert response.status_code == 200
+    assert response.json() == server.portfolio_data["hero"]
+    assert "etag" in response.headers
+
+
+def test_unknown_section_is_404(client):
+    assert client.get("/api/portfolio/secrets").status_code == 404
+
+
+def test_fields_projection(client):
+    response = client.get("/api/portfolio", params={"fields": "hero,services.title"})
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body) == {"hero", "services"}
+    assert body["hero"] == server.portfolio_data["hero"]
+    assert body["services"] == [{"title": s["title"]} for s in server.portfolio_data["services"]]
+
+
+def test_projection_is_cached_by_normalized_key(client, monkeypatch):
+    calls = []
+    original = server.project
+
+    def counting(data, projection):
+        calls.append(projection)
+        return original(data, projection)
+
+    monkeypatch.setattr(server, "project", counting)
+    client.get("/api/portfolio", params={"fields": "services.title,hero"})
+    client.get("/api/portfolio", params={"fields": "hero, services.title"})
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("fields", ["nope", "hero.nope", ",", "hero." + "x" * 600])
+def test_bad_projection_rejected_before_serialization(client, monkeypatch, fields):
+    monkeypatch.setattr(server, "project", lambda *args: pytest.fail("serialized a bad projection"))
+    assert client.get("/api/portfolio", params={"fields": fields}).status_code == 400
+
+
+def test_trailing_comma_is_ignored(client):
+    assert client.get("/api/portfolio", params={"fields": "services.title,"}).status_code == 200
+
+
+def test_parse_fields_normalizes():
+    index = field_index(server.portfolio_data)
+    assert parse_fields("services.title,services,hero.name", index) == (
+        ("hero", ("name",)),
+        ("services", None),
+    )
+    with pytest.raises(ProjectionError):
+        parse_fields("about.nope", index)
+
+
+def test_project_dict_section():
+    projection = (("hero", ("name",)),)
+    assert project(server.portfolio_data, projection) == {"hero": {"name": "Gunjan Jagtiani"}}
@@ -0,0 +1,122 @@
+import asyncio
+import copy
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from portfolio import PortfolioStore
+from tests.fake_mongo import FakeDatabase
+
+
+@pytest.fixture
+def db():
+    return FakeDatabase()
+
+
+@pytest.fixture
+def store(db):
+    return PortfolioStore(db.portfolio_content, copy.deepcopy(server.portfolio_data), max_staleness=0.01)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_seed_and_load(store, db):
+    async def scenario():
+        await store.seed()
+        assert not store.loaded
+        await store.refresh()
+
+    run(scenario())
+    assert store.loaded
+    assert len(db.portfolio_content.docs) == len(server.portfolio_data)
+    assert set(store.versions.values()) == {1}
+    assert store.sections == server.portfolio_data
+
+
+def test_refresh_only_reloads_changed_sections(store, db):
+    async def scenario():
+        await store.seed()
+        await store.refresh()
+        # An edit made by another worker
+        await db.portfolio_content.update_one(
+            {"section": "hero"}, {"$set": {"content": {"name": "New"}}, "$inc": {"version": 1}}
+        )
+        db.operations.clear()
+        await store.refresh()
+
+    run(scenario())
+    assert store.sections["hero"] == {"name": "New"}
+    assert store.versions["hero"] == 2
+    assert store.versions["about"] == 1
+    # One version probe plus one fetch of the changed section
+    assert db.operations == [("find", "portfolio_content"), ("find", "portfolio_content")]
+
+
+def test_steady_state_refresh_is_a_single_probe(store, db):
+    async def scenario():
+        await store.seed()
+        await store.refresh()
+        db.operations.clear()
+        await store.refresh()
+
+    run(scenario())
+    assert db.operations == [("find", "portfolio_content")]
+
+
+def test_background_refresh_bounds_staleness(store, db):
+    async def scenario():
+        await store.start()
+        await db.portfolio_content.update_one(
+            {"section": "about"}, {"$set": {"content": {"title": "Edited"}}, "$inc": {"version": 1}}
+        )
+        await asyncio.sleep(0.05)
+        await store.stop()
+
+    run(scenario())
+    assert store.sections["about"] == {"title": "Edited"}
+
+
+@pytest.fixture
+def client(store, monkeypatch):
+    monkeypatch.setattr(server, "portfolio_store", store)
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    server.portfolio_cache.invalidate()
+    server.portfolio_projection_cache.invalidate()
+    run(store.seed())
+    run(store.refresh())
+    return TestClient(server.app)
+
+
+def test_edit_invalidates_only_that_section(client, store, db):
+    hero_etag = client.get("/api/portfolio/hero").headers["etag"]
+    about_etag = client.get("/api/portfolio/about").headers["etag"]
+    full_etag = client.get("/api/portfolio").headers["etag"]
+
+    new_hero = {**server.portfolio_data["hero"], "tagline": "Breathe"}
+    response = client.put("/api/portfolio/hero", json=new_hero, headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.json()["version"] == 2
+    assert db.portfolio_content.docs[0]["content"]["tagline"] == "Breathe"
+
+    hero = client.get("/api/portfolio/hero")
+    assert hero.json()["tagline"] == "Breathe"
+    assert hero.headers["etag"] != hero_etag
+    assert client.get("/api/portfolio").headers["etag"] != full_etag
+    about = client.get("/api/portfolio/about", headers={"If-None-Match": about_etag})
+    assert about.status_code == 304
+
+
+def test_edit_requires_admin_token(client):
+    hero = server.portfolio_data["hero"]
+    assert client.put("/api/portfolio/hero", json=hero).status_code == 401
+    assert client.put("/api/portfolio/hero", json=hero, headers={"X-Admin-Token": "bad"}).status_code == 401
+
+
+def test_edit_validates_section_shape(client):
+    response = client.put("/api/portfolio/services", json={"not": "a list"}, headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 422
+    response = client.put("/api/portfolio/nope", json={}, headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 404
@@ -0,0 +1,86 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from prerender import ShellTemplate
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+TEMPLATE = """<!doctype html>
+<html><head>
+<meta name="description" content="A product" />
+<title>App</title>
+<link href="%PUBLIC_URL%/favicon.ico" />
+</head><body><div id="root"></div></body></html>"""
+
+
+def inlined(page):
+    match = re.search(r'<script id="portfolio-data" type="application/json">(.*?)</script>', page, re.S)
+    return json.loads(match.group(1))
+
+
+def test_render_inlines_the_portfolio_and_hero(tmp_path):
+    path = tmp_path / "index.html"
+    path.write_text(TEMPLATE)
+    portfolio = {"hero": {"name": "Asha & Co", "tagline": "Yoga", "description": "</script><b>hi</b>"}}
+    page = ShellTemplate(path, public_url="/site").render(portfolio, json.dumps(portfolio).encode()).decode()
+
+    # Nothing in the content can close the script element early
+    assert page.count("</script>") == 1
+    assert inlined(page) == portfolio
+    assert "<title>Asha &amp; Co | Yoga</title>" in page
+    assert '<meta name="description" content="&lt;/script&gt;&lt;b&gt;hi&lt;/b&gt;" />' in page
+    assert '<h1 class="text-5xl md:text-7xl font-bold text-slate-800 mb-6 leading-tight">Asha &amp; Co</h1>' in page
+    assert 'href="/site/favicon.ico"' in page
+
+
+def test_templates_without_a_root_element_are_refused(tmp_path):
+    path = tmp_path / "index.html"
+    path.write_text("<html><head></head><body></body></html>")
+    with pytest.raises(ValueError):
+        ShellTemplate(path)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    path = tmp_path / "index.html"
+    path.write_text(TEMPLATE)
+    monkeypatch.setattr(server, "shell_template", ShellTemplate(path))
+    server.shell_cache.invalidate()
+    return TestClient(server.create_app())
+
+
+def test_a_missing_shell_leaves_the_route_off():
+    env = dict(os.environ, FRONTEND_SHELL="/nonexistent/index.html")
+    result = subprocess.run(
+        [sys.executable, "-c", "import server; assert server.shell_template is None"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert "Not serving the frontend shell" in result.stderr
+
+
+def test_shell_is_served_with_the_current_portfolio(client, monkeypatch):
+    response = client.get("/", headers={"Accept-Encoding": "br, gzip"})
+    assert response.headers["content-type"] == "text/html; charset=utf-8"
+    assert response.headers["content-encoding"] in ("br", "gzip")
+    assert inlined(response.text) == server.PortfolioData(**server.portfolio_data).model_dump()
+    assert server.portfolio_data["hero"]["name"] in response.text.split('<div id="root">')[1]
+
+    etag = response.headers["etag"]
+    assert client.get("/", headers={"Accept-Encoding": "br, gzip", "If-None-Match": etag}).status_code == 304
+
+    # An edit moves the portfolio version, and the page is rendered again
+    hero = {**server.portfolio_store.sections["hero"], "name": "Gunjan J"}
+    monkeypatch.setitem(server.portfolio_store.sections, "hero", hero)
+    monkeypatch.setitem(server.portfolio_store.versions, "hero", server.portfolio_store.versions["hero"] + 1)
+    response = client.get("/", headers={"Accept-Encoding": "br, gzip", "If-None-Match": etag})
+    assert response.status_code == 200
+    assert inlined(response.text)["hero"]["name"] == "Gunjan J"
@@ -0,0 +1,119 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from rate_limit import LocalTokenBuckets, RateLimitMiddleware, client_id, parse_limits
+
+FORM = {"name": "Bot", "email": "bot@example.com", "service": "Sound Healing", "message": "spam"}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_parse_limits():
+    limits = parse_limits("POST /api/contact=10/minute:5; GET /api/portfolio=100/second")
+    assert limits[("POST", "/api/contact")] == (10 / 60, 5)
+    assert limits[("GET", "/api/portfolio")] == (100.0, 100)
+    assert parse_limits("") == {}
+    with pytest.raises(ValueError):
+        parse_limits("POST /api/contact=ten per minute")
+
+
+def test_bucket_allows_burst_then_refills():
+    clock = Clock()
+    buckets = LocalTokenBuckets(clock=clock)
+    assert [buckets.take("k", 1.0, 3) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert buckets.take("k", 1.0, 3) == pytest.approx(1.0)
+    clock.now = 0.5
+    assert buckets.take("k", 1.0, 3) == pytest.approx(0.5)
+    clock.now = 1.0
+    assert buckets.take("k", 1.0, 3) == 0.0
+    # A long idle period refills to the burst size, not beyond
+    clock.now = 100.0
+    assert [buckets.take("k", 1.0, 3) for _ in range(4)][-1] > 0
+
+
+def test_buckets_are_per_key():
+    buckets = LocalTokenBuckets(clock=Clock())
+    assert buckets.take("a", 1.0, 1) == 0.0
+    assert buckets.take("a", 1.0, 1) > 0
+    assert buckets.take("b", 1.0, 1) == 0.0
+
+
+def test_idle_buckets_are_evicted_shard_by_shard():
+    clock = Clock()
+    buckets = LocalTokenBuckets(shards=4, idle_ttl=10, sweep_interval=1, clock=clock)
+    for i in range(100):
+        buckets.take(f"client-{i}", 1.0, 5)
+    assert len(buckets) == 100
+    for step in range(1, 5):
+        clock.now = 20.0 + step
+        buckets.take("fresh", 1.0, 5)
+    assert len(buckets) == 1
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setitem(server.rate_limits, ("POST", "/api/contact"), (1.0, 2))
+    server.rate_limiter.clear()
+    return TestClient(server.app)
+
+
+def test_middleware_rejects_before_parsing(client, monkeypatch):
+    async def fail(*args, **kwargs):
+        pytest.fail("rate limited request reached the handler")
+
+    # Invalid bodies still consume tokens: they are rejected by validation, not the limiter
+    assert client.post("/api/contact", json={}).status_code == 422
+    assert client.post("/api/contact", json={}).status_code == 422
+
+    monkeypatch.setattr(server, "save_contact_submission", fail)
+    response = client.post("/api/contact", json=FORM)
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1"
+    assert response.json() == {"detail": "Too many requests"}
+
+
+def scope(forwarded_for=None, peer="10.0.0.9"):
+    headers = [(b"x-forwarded-for", value.encode()) for value in ([forwarded_for] if forwarded_for else [])]
+    return {"headers": headers, "client": (peer, 4321)}
+
+
+def test_client_id_ignores_forwarded_for_unless_proxies_are_trusted():
+    assert client_id(scope("203.0.113.7")) == "10.0.0.9"
+    assert client_id(scope()) == "10.0.0.9"
+    assert client_id({"headers": [], "client": None}) == "unknown"
+
+
+def test_client_id_counts_trusted_proxies_from_the_right():
+    # The leftmost entries are whatever the client put in the header
+    assert client_id(scope("spoofed, 203.0.113.7"), trusted_proxies=1) == "203.0.113.7"
+    assert client_id(scope("spoofed, 203.0.113.7, 10.0.0.1"), trusted_proxies=2) == "203.0.113.7"
+    # Fewer entries than proxies: the request did not come through all of them
+    assert client_id(scope("203.0.113.7"), trusted_proxies=2) == "10.0.0.9"
+
+
+def test_middleware_limits_clients_independently():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 204, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    limited = RateLimitMiddleware(app, {("POST", "/api/contact"): (1.0, 2)}, LocalTokenBuckets(), trusted_proxies=1)
+    client = TestClient(limited)
+
+    def post(forwarded_for):
+        return client.post("/api/contact", headers={"X-Forwarded-For": forwarded_for}).status_code
+
+    # Rotating the client-supplied part of the header does not buy new buckets
+    assert [post(f"192.0.2.{i}, 198.51.100.1") for i in range(3)] == [204, 204, 429]
+    assert post("198.51.100.2") == 204
+
+
+def test_unlimited_routes_pass_through(client):
+    for _ in range(5):
+        assert client.get("/api/").status_code == 200
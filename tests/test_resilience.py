@@ -0,0 +1,247 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+from pymongo.errors import DuplicateKeyError, ServerSelectionTimeoutError
+
+import server
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from idempotency import IdempotencyGuard, TTLCache
+from lead_stats import read_stats
+from search import InMemorySearchIndex
+from spool import REJECTED_FILE, DiskSpool, SpoolReplayer
+from submissions import ensure_indexes
+from tests.fake_mongo import FakeDatabase
+
+FORM = {"name": "Asha", "email": "asha@example.com", "service": "Sound Healing", "message": "Hello"}
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+async def unreachable():
+    raise ServerSelectionTimeoutError("No servers available")
+
+
+async def ok():
+    return "ok"
+
+
+def test_breaker_opens_fails_fast_and_recovers():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(ServerSelectionTimeoutError):
+                await breaker.call(unreachable)
+        assert breaker.state == OPEN and not breaker.allows()
+        with pytest.raises(CircuitOpenError):
+            await breaker.call(ok)
+
+        clock.now = 10
+        assert breaker.state == HALF_OPEN
+        # A failed probe opens the circuit again straight away
+        with pytest.raises(ServerSelectionTimeoutError):
+            await breaker.call(unreachable)
+        assert breaker.state == OPEN
+
+        clock.now = 20
+        assert await breaker.call(ok) == "ok"
+        assert breaker.state == CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_database_errors_do_not_trip_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=1)
+
+    async def duplicate():
+        raise DuplicateKeyError("E11000", 11000)
+
+    with pytest.raises(DuplicateKeyError):
+        asyncio.run(breaker.call(duplicate))
+    assert breaker.state == CLOSED
+
+
+def test_appends_share_fsyncs(tmp_path, monkeypatch):
+    spool = DiskSpool(tmp_path, fsync_interval=0.01, fsync_batch=1000)
+    fsyncs = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: fsyncs.append(fd) or real_fsync(fd))
+
+    async def append_many():
+        await asyncio.gather(*(spool.append({"id": str(i)}) for i in range(50)))
+        await spool.close()
+
+    asyncio.run(append_many())
+    assert spool.depth == 50
+    assert len(fsyncs) == 1
+    assert len(spool.segments()) == 1 and spool.pending() == 50
+
+
+def test_pending_is_a_running_count(tmp_path, monkeypatch):
+    # A segment left by a worker that has exited
+    (tmp_path / "00000000000000000001-1-dead.spool").write_bytes(b'{"id": "a"}\n{"id": "b"}\n')
+    spool = DiskSpool(tmp_path)
+
+    async def insert(document):
+        pass
+
+    async def scenario():
+        assert await spool.recount() == 2
+        await spool.append({"id": "c"})
+        # Health checks read the count, not the segments
+        monkeypatch.setattr(spool, "_count_records", lambda: pytest.fail("segments were read again"))
+        assert spool.pending() == 3
+        monkeypatch.undo()
+        await spool.replay(insert)
+        assert spool.pending() == 0
+
+    asyncio.run(scenario())
+
+
+def test_replay_in_order_and_resume(tmp_path):
+    spool = DiskSpool(tmp_path)
+    inserted = []
+    failing = {"on": "3"}
+
+    async def insert(document):
+        if document["id"] == failing["on"]:
+            raise ServerSelectionTimeoutError("down again")
+        if document["id"] in inserted:
+            raise DuplicateKeyError("E11000", 11000)
+        inserted.append(document["id"])
+
+    async def idempotent_insert(document):
+        try:
+            await insert(document)
+        except DuplicateKeyError:
+            pass
+
+    async def scenario():
+        for i in range(5):
+            await spool.append({"id": str(i)})
+        with pytest.raises(ServerSelectionTimeoutError):
+            await spool.replay(idempotent_insert)
+        assert spool.depth == 5
+        failing["on"] = None
+        assert await spool.replay(idempotent_insert) == 5
+
+    asyncio.run(scenario())
+    assert inserted == ["0", "1", "2", "3", "4"]
+    assert spool.depth == 0 and spool.segments() == []
+
+
+def test_torn_line_is_rejected_not_blocking(tmp_path):
+    segment = tmp_path / "00000000000000000001-1-dead.spool"
+    segment.write_bytes(b'{"id": "a"}\n{"id": "b", "na\n{"id": "c"}\n')
+    inserted = []
+
+    async def insert(document):
+        inserted.append(document["id"])
+
+    assert asyncio.run(DiskSpool(tmp_path).replay(insert)) == 3
+    assert inserted == ["a", "c"]
+    assert (tmp_path / REJECTED_FILE).read_bytes() == b'{"id": "b", "na\n'
+
+
+def test_segments_held_by_a_live_worker_are_skipped(tmp_path):
+    live, other = DiskSpool(tmp_path), DiskSpool(tmp_path)
+    inserted = []
+
+    async def insert(document):
+        inserted.append(document["id"])
+
+    async def scenario():
+        await live.append({"id": "live"})
+        assert await other.replay(insert) == 0
+        await live.close()
+        # Once its worker is gone the segment is an orphan any worker may replay
+        assert await other.replay(insert) == 1
+
+    asyncio.run(scenario())
+    assert inserted == ["live"]
+
+
+@pytest.fixture
+def outage(tmp_path, monkeypatch):
+    db = FakeDatabase()
+    asyncio.run(ensure_indexes(db.contact_submissions))
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+    spool = DiskSpool(tmp_path)
+    index = InMemorySearchIndex()
+    insert_one = db.contact_submissions.insert_one
+
+    async def down(document):
+        raise ServerSelectionTimeoutError("No servers available")
+
+    monkeypatch.setattr(db.contact_submissions, "insert_one", down)
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "db_breaker", breaker)
+    monkeypatch.setattr(server, "contact_spool", spool)
+    monkeypatch.setattr(server, "search_backend", index)
+    monkeypatch.setattr(server, "contact_idempotency", IdempotencyGuard(TTLCache(max_entries=100, ttl=60)))
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+
+    def recover():
+        monkeypatch.setattr(db.contact_submissions, "insert_one", insert_one)
+        clock.now += 10
+
+    return db, spool, index, recover
+
+
+def test_submissions_are_spooled_during_outage_and_replayed(outage):
+    db, spool, index, recover = outage
+    client = TestClient(server.app)
+
+    ids = [client.post("/api/contact", json={**FORM, "message": f"Hello {i}"}).json()["id"] for i in range(3)]
+    assert db.contact_submissions.docs == []
+    assert spool.pending() == 3
+    assert client.get("/api/health").json() == {"status": "degraded", "database": OPEN, "spool_depth": 3}
+    # Reads fail fast instead of waiting for server selection
+    assert client.get("/api/contact-submissions", headers=ADMIN).status_code == 503
+
+    recover()
+
+    async def ping():
+        return None
+
+    replayer = SpoolReplayer(spool, server.db_breaker, ping, server.store_spooled_submission)
+    assert asyncio.run(replayer.run_once()) == 3
+    assert [doc["id"] for doc in db.contact_submissions.docs] == ids
+    assert len(index) == 3
+    assert asyncio.run(read_stats(db.lead_stats))["total"] == 3
+    assert client.get("/api/health").json() == {"status": "ok", "database": CLOSED, "spool_depth": 0}
+
+
+def test_replay_skips_submissions_already_stored(outage):
+    db, spool, _, recover = outage
+    submission_id = TestClient(server.app).post("/api/contact", json=FORM).json()["id"]
+    recover()
+    # The insert reached mongod even though the client saw the connection drop
+    asyncio.run(db.contact_submissions.insert_one({**FORM, "id": submission_id}))
+
+    assert asyncio.run(spool.replay(server.store_spooled_submission)) == 1
+    assert [doc["id"] for doc in db.contact_submissions.docs] == [submission_id]
+    assert db.lead_stats.docs == []
+
+
+def test_replayed_submissions_get_a_fresh_id(outage):
+    db, spool, _, recover = outage
+    recover()
+    # Set by the driver on the write that failed, an hour before the replay
+    stale = ObjectId.from_datetime(datetime.utcnow() - timedelta(hours=1))
+    asyncio.run(spool.append({**FORM, "id": "late", "submitted_at": datetime.utcnow(), "status": "new", "_id": stale}))
+    assert asyncio.run(spool.replay(server.store_spooled_submission)) == 1
+    assert db.contact_submissions.docs[0]["_id"] > stale
@@ -0,0 +1,149 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from idempotency import IdempotencyGuard, TTLCache
+from search import InMemorySearchIndex, MongoTextSearch, decode_page, encode_page
+from submissions import CursorError, ensure_indexes
+from tests.fake_mongo import FakeDatabase
+
+ADMIN = {"X-Admin-Token": "secret"}
+MESSAGES = [
+    "Looking for prenatal yoga in the evenings",
+    "Do you offer sound healing for groups?",
+    "Prenatal and postnatal sessions, prenatal first please",
+    "Beginner yoga questions",
+]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeDatabase()
+    asyncio.run(ensure_indexes(db.contact_submissions))
+    for i in range(40):
+        db.contact_submissions.docs.append({
+            "id": str(uuid.UUID(int=i)),
+            "name": f"Lead {i}",
+            "email": f"lead{i}@{'studio.org' if i % 4 == 0 else 'example.com'}",
+            "service": "Prenatal & Postnatal Yoga" if i % 2 else "Sound Healing",
+            "message": MESSAGES[i % len(MESSAGES)],
+            "submitted_at": datetime(2025, 1, 1) + timedelta(hours=i),
+            "status": "new",
+        })
+    index = InMemorySearchIndex()
+    asyncio.run(index.start(db.contact_submissions))
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "search_backend", index)
+    monkeypatch.setattr(server, "contact_idempotency", IdempotencyGuard(TTLCache(max_entries=100, ttl=60)))
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    return db
+
+
+@pytest.fixture
+def client(db):
+    return TestClient(server.app, headers=ADMIN)
+
+
+def search(client, **params):
+    response = client.get("/api/contact-submissions/search", params=params)
+    assert response.status_code == 200
+    return response
+
+
+def test_results_are_ranked(client):
+    rows = search(client, q="prenatal", limit=100).json()
+    assert len(rows) == 20
+    # Messages mentioning the word twice rank above those mentioning it once
+    assert rows[0]["message"] == MESSAGES[2]
+    assert [row["score"] for row in rows] == sorted((row["score"] for row in rows), reverse=True)
+    assert set(rows[0]) == {"id", "name", "email", "service", "message", "submitted_at", "status", "score"}
+
+
+def test_search_by_name_and_email_domain(client):
+    assert [row["name"] for row in search(client, q="Lead 7").json()][0] == "Lead 7"
+    rows = search(client, q="studio.org", limit=100).json()
+    assert {row["email"].split("@")[1] for row in rows[:10]} == {"studio.org"}
+
+
+def test_pages_and_filters(client):
+    seen, cursor = [], None
+    while True:
+        response = search(client, q="yoga", limit=7, service="Sound Healing", **({"cursor": cursor} if cursor else {}))
+        seen.extend(row["id"] for row in response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+    # Even ids are Sound Healing, and of their messages only MESSAGES[0] mentions yoga
+    assert len(seen) == len(set(seen)) == 10
+
+    assert search(client, q="yoga", status="resolved").json() == []
+    assert client.get("/api/contact-submissions/search", params={"q": "yoga", "cursor": "bad"}).status_code == 400
+    assert client.get("/api/contact-submissions/search", params={"q": "yoga", "status": "spam"}).status_code == 422
+
+
+def test_search_requires_admin(client):
+    response = client.get("/api/contact-submissions/search", params={"q": "yoga"}, headers={"X-Admin-Token": "x"})
+    assert response.status_code == 401
+
+
+def test_new_submissions_and_status_changes_are_indexed(client):
+    form = {"name": "Meera", "email": "meera@example.com", "service": "Sound Healing", "message": "Chakra balancing"}
+    submission_id = client.post("/api/contact", json=form).json()["id"]
+    assert [row["id"] for row in search(client, q="chakra").json()] == [submission_id]
+
+    client.patch(f"/api/contact-submissions/{submission_id}", json={"status": "contacted"}, headers=ADMIN)
+    assert [row["id"] for row in search(client, q="chakra", status="contacted").json()] == [submission_id]
+
+
+def test_in_memory_index_reads_only_matching_postings():
+    index = InMemorySearchIndex()
+    for i in range(1000):
+        index.add({"id": str(i), "name": "", "email": "", "message": f"word{i}", "status": "new", "service": "s"})
+    index.add({"id": "x", "name": "", "email": "", "message": "rare", "status": "new", "service": "s"})
+    assert len(index) == 1001
+    assert [row["id"] for row in asyncio.run(index.search(None, "rare"))] == ["x"]
+
+    # Re-adding replaces the old postings
+    index.add({"id": "x", "name": "", "email": "", "message": "common", "status": "new", "service": "s"})
+    assert asyncio.run(index.search(None, "rare")) == []
+
+
+def test_mongo_backend_uses_text_index():
+    class RecordingCursor:
+        def __init__(self, calls):
+            self.calls = calls
+
+        def __getattr__(self, name):
+            def record(*args):
+                self.calls.append((name, args))
+                return self
+            return record
+
+        async def to_list(self, length):
+            return []
+
+    class RecordingCollection:
+        def __init__(self):
+            self.calls = []
+
+        def find(self, *args):
+            self.calls.append(("find", args))
+            return RecordingCursor(self.calls)
+
+    collection = RecordingCollection()
+    asyncio.run(MongoTextSearch().search(collection, "prenatal", status="new", offset=20, limit=11))
+    (_, (criteria, projection)), sort, skip, limit = collection.calls
+    assert criteria == {"$text": {"$search": "prenatal"}, "status": "new"}
+    assert projection["score"] == {"$meta": "textScore"}
+    assert sort == ("sort", ([("score", {"$meta": "textScore"}), ("id", 1)],))
+    assert skip == ("skip", (20,)) and limit == ("limit", (11,))
+
+
+def test_page_tokens():
+    assert decode_page(encode_page(40)) == 40
+    with pytest.raises(CursorError):
+        decode_page(encode_page(-1))
@@ -0,0 +1,123 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from lead_stats import ensure_rollup_indexes, read_stats, rebuild
+from status_workflow import StatusChangeError, apply_status_changes
+from submissions import ensure_indexes
+from tests.fake_mongo import FakeDatabase
+
+ADMIN = {"X-Admin-Token": "secret"}
+BASE = datetime(2025, 2, 1, 8, 0)
+
+
+def lead_id(i):
+    return str(uuid.UUID(int=i))
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeDatabase()
+    asyncio.run(ensure_indexes(db.contact_submissions))
+    asyncio.run(ensure_rollup_indexes(db.lead_stats))
+    for i in range(300):
+        db.contact_submissions.docs.append({
+            "id": lead_id(i),
+            "name": f"Lead {i}",
+            "email": f"lead{i}@example.com",
+            "service": "Sound Healing" if i % 2 else "Yoga for Beginners",
+            "message": "Hello",
+            "submitted_at": BASE + timedelta(hours=i),
+            "status": "new",
+        })
+    asyncio.run(rebuild(db.contact_submissions, db.lead_stats))
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    db.operations.clear()
+    return db
+
+
+@pytest.fixture
+def client(db):
+    return TestClient(server.app)
+
+
+def statuses(db):
+    return {doc["id"]: doc["status"] for doc in db.contact_submissions.docs}
+
+
+def test_bulk_update_is_one_round_trip(client, db):
+    updates = [{"id": lead_id(i), "status": "contacted", "expected_status": "new"} for i in range(250)]
+    response = client.patch("/api/contact-submissions", json={"updates": updates}, headers=ADMIN)
+
+    assert response.status_code == 200
+    assert len(response.json()["updated"]) == 250
+    assert [op for op in db.operations if op[0] != "find"] == [
+        ("bulk_write", "contact_submissions"), ("bulk_write", "lead_stats")
+    ]
+    assert sum(status == "contacted" for status in statuses(db).values()) == 250
+
+    stats = client.get("/api/contact-submissions/stats", headers=ADMIN).json()
+    assert stats["by_status"] == {"new": 50, "contacted": 250}
+
+
+def test_outcomes_are_reported_per_row(client, db):
+    db.contact_submissions.docs[1]["status"] = "resolved"
+    updates = [
+        {"id": lead_id(0), "status": "contacted"},
+        {"id": lead_id(1), "status": "contacted", "expected_status": "new"},
+        {"id": lead_id(2), "status": "new"},
+        {"id": "missing", "status": "contacted"},
+    ]
+    body = client.patch("/api/contact-submissions", json={"updates": updates}, headers=ADMIN).json()
+
+    assert body["updated"] == [lead_id(0)]
+    assert body["conflicts"] == [{"id": lead_id(1), "status": "resolved"}]
+    assert body["unchanged"] == [lead_id(2)]
+    assert body["not_found"] == ["missing"]
+    assert statuses(db)[lead_id(1)] == "resolved"
+
+
+def test_change_between_read_and_write_is_a_conflict(db):
+    collection = db.contact_submissions
+    bulk_write = collection.bulk_write
+
+    async def racing_bulk_write(requests, ordered=True):
+        # Another admin resolves the lead after it was read
+        collection.docs[0]["status"] = "resolved"
+        return await bulk_write(requests, ordered=ordered)
+
+    collection.bulk_write = racing_bulk_write
+    changes = [(lead_id(0), "contacted", None), (lead_id(1), "contacted", None)]
+    outcome = asyncio.run(apply_status_changes(collection, db.lead_stats, changes))
+
+    assert outcome["updated"] == [lead_id(1)]
+    assert outcome["conflicts"] == [{"id": lead_id(0), "status": "resolved"}]
+    assert statuses(db)[lead_id(0)] == "resolved"
+    # Only the change this call made reaches the rollup
+    assert asyncio.run(read_stats(db.lead_stats))["by_status"] == {"new": 299, "contacted": 1}
+
+
+def test_duplicate_ids_are_rejected(client, db):
+    with pytest.raises(StatusChangeError):
+        asyncio.run(apply_status_changes(db.contact_submissions, db.lead_stats, [("a", "new", None)] * 2))
+    updates = [{"id": lead_id(0), "status": "contacted"}] * 2
+    assert client.patch("/api/contact-submissions", json={"updates": updates}, headers=ADMIN).status_code == 400
+
+
+def test_single_update_conflict_and_validation(client, db):
+    url = f"/api/contact-submissions/{lead_id(0)}"
+    assert client.patch(url, json={"status": "archived"}, headers=ADMIN).status_code == 422
+    stale = {"status": "contacted", "expected_status": "resolved"}
+    assert client.patch(url, json=stale, headers=ADMIN).status_code == 409
+    response = client.patch(url, json={"status": "contacted", "expected_status": "new"}, headers=ADMIN)
+    assert response.json() == {"success": True, "id": lead_id(0), "status": "contacted", "changed": True}
+
+
+def test_bulk_update_requires_admin(client):
+    response = client.patch("/api/contact-submissions", json={"updates": [{"id": lead_id(0), "status": "contacted"}]})
+    assert response.status_code == 401
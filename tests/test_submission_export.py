@@ -0,0 +1,103 @@
+import asyncio
+import csv
+import io
+import json
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+import submissions
+from submissions import export_rows
+from tests.fake_mongo import FakeDatabase
+
+BASE = datetime(2025, 1, 1, 12, 0, 0)
+
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeDatabase()
+    for i in range(30):
+        db.contact_submissions.docs.append({
+            "_id": i,
+            "id": str(uuid.UUID(int=i)),
+            "name": f"Lead, {i}",
+            "email": f"lead{i}@example.com",
+            "service": "Sound Healing" if i % 3 else "Yoga for Beginners",
+            "message": "Line one\nline two",
+            "submitted_at": BASE + timedelta(minutes=i // 2),
+            "status": "new",
+        })
+    monkeypatch.setattr(server, "db", db)
+    return db
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    return TestClient(server.app, headers=ADMIN)
+
+
+def test_ndjson_export_is_oldest_first_without_mongo_ids(client, db):
+    response = client.get("/api/contact-submissions/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == [doc["id"] for doc in db.contact_submissions.docs]
+    assert "_id" not in rows[0]
+    assert rows[0]["submitted_at"] == BASE.isoformat()
+
+
+def test_csv_export_quotes_fields(client):
+    response = client.get("/api/contact-submissions/export", params={"format": "csv", "service": "Yoga for Beginners"})
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 10
+    assert rows[0]["name"] == "Lead, 0"
+    assert rows[0]["message"] == "Line one\nline two"
+
+
+def test_export_requires_the_admin_token(client):
+    response = client.get("/api/contact-submissions/export", headers={"X-Admin-Token": "wrong"})
+    assert response.status_code == 401
+
+
+def test_csv_cells_cannot_start_formulas(client, db):
+    db.contact_submissions.docs[0]["name"] = "=HYPERLINK(\"http://evil.example\")"
+    db.contact_submissions.docs[0]["message"] = "-1+2"
+    response = client.get("/api/contact-submissions/export", params={"format": "csv"})
+    row = next(csv.DictReader(io.StringIO(response.text)))
+    assert row["name"] == "'=HYPERLINK(\"http://evil.example\")"
+    assert row["message"] == "'-1+2"
+    # NDJSON carries the text as submitted
+    ndjson = client.get("/api/contact-submissions/export").text.splitlines()
+    assert json.loads(ndjson[0])["message"] == "-1+2"
+
+
+def test_resume_from_checkpoint(client, db):
+    first = client.get("/api/contact-submissions/export", params={"include_cursor": "true"})
+    rows = [json.loads(line) for line in first.text.splitlines()]
+    # Pretend the connection dropped after row 12
+    resumed = client.get("/api/contact-submissions/export", params={"resume": rows[12]["cursor"]})
+    rest = [json.loads(line)["id"] for line in resumed.text.splitlines()]
+    assert rest == [row["id"] for row in rows[13:]]
+
+
+def test_unknown_format_rejected(client):
+    assert client.get("/api/contact-submissions/export", params={"format": "xml"}).status_code == 422
+
+
+def test_rows_are_streamed_in_bounded_chunks(db, monkeypatch):
+    monkeypatch.setattr(submissions, "EXPORT_CHUNK_SIZE", 512)
+
+    async def collect():
+        return [chunk async for chunk in export_rows(db.contact_submissions, {}, batch_size=5)]
+
+    chunks = asyncio.run(collect())
+    assert len(chunks) > 1
+    assert all(len(chunk) < 512 + 1024 for chunk in chunks)
+    assert sum(chunk.count(b"\n") for chunk in chunks) == 30
@@ -0,0 +1,130 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from submissions import (
+    INDEXES, LISTING_SORT, TENANT_INDEXES, build_filter, decode_cursor, encode_cursor, ensure_indexes,
+)
+from tests.fake_mongo import FakeDatabase
+
+BASE = datetime(2025, 1, 1, 12, 0, 0)
+SERVICES = ["Yoga for Beginners", "Sound Healing"]
+
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeDatabase()
+    for i in range(25):
+        db.contact_submissions.docs.append({
+            "id": str(uuid.UUID(int=i)),
+            "name": f"Lead {i}",
+            "email": f"lead{i}@example.com",
+            "service": SERVICES[i % 2],
+            "message": "Hello",
+            # Pairs of rows share a timestamp to exercise the id tie-breaker
+            "submitted_at": BASE + timedelta(minutes=i // 2),
+            "status": "resolved" if i % 5 == 0 else "new",
+        })
+    monkeypatch.setattr(server, "db", db)
+    return db
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    return TestClient(server.app, headers=ADMIN)
+
+
+def expected_order(db, predicate=lambda doc: True):
+    docs = [doc for doc in db.contact_submissions.docs if predicate(doc)]
+    return [doc["id"] for doc in sorted(docs, key=lambda d: (d["submitted_at"], d["id"]), reverse=True)]
+
+
+def walk(client, **params):
+    seen, cursor = [], None
+    while True:
+        response = client.get("/api/contact-submissions", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        seen.append([row["id"] for row in response.json()])
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            return seen
+
+
+def test_pages_cover_every_row_once(client, db):
+    pages = walk(client, limit=7)
+    assert [len(page) for page in pages] == [7, 7, 7, 4]
+    assert [row for page in pages for row in page] == expected_order(db)
+
+
+def test_default_page_matches_previous_listing(client, db):
+    response = client.get("/api/contact-submissions")
+    assert len(response.json()) == 25
+    assert "x-next-cursor" not in response.headers
+
+
+def test_filters(client, db):
+    pages = walk(client, limit=4, service="Sound Healing", status="new")
+    rows = [row for page in pages for row in page]
+    assert rows == expected_order(db, lambda d: d["service"] == "Sound Healing" and d["status"] == "new")
+
+    since, until = BASE + timedelta(minutes=3), BASE + timedelta(minutes=6)
+    response = client.get("/api/contact-submissions", params={"since": since.isoformat(), "until": until.isoformat()})
+    assert [row["id"] for row in response.json()] == expected_order(db, lambda d: since <= d["submitted_at"] < until)
+
+
+def test_invalid_cursor_is_400(client):
+    assert client.get("/api/contact-submissions", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+@pytest.mark.parametrize("path", ["/api/contact-submissions", "/api/contact-submissions/export"])
+def test_unknown_status_is_422(client, path):
+    assert client.get(path, params={"status": "closed"}).status_code == 422
+
+
+@pytest.mark.parametrize("limit", [0, 501])
+def test_limit_is_bounded(client, limit):
+    assert client.get("/api/contact-submissions", params={"limit": limit}).status_code == 422
+
+
+def test_cursor_round_trip():
+    token = encode_cursor(BASE, "abc")
+    assert decode_cursor(token) == (BASE, "abc")
+    assert "=" not in token
+
+
+def test_keyset_filter_shape():
+    query = build_filter(status="new", after=encode_cursor(BASE, "abc"))
+    assert query["status"] == "new"
+    assert query["$or"] == [{"submitted_at": {"$lt": BASE}}, {"submitted_at": BASE, "id": {"$lt": "abc"}}]
+
+
+def test_every_listing_filter_has_a_matching_index():
+    db = FakeDatabase()
+    asyncio.run(ensure_indexes(db.contact_submissions))
+    keys = [keys for keys, _ in db.contact_submissions.indexes]
+    assert LISTING_SORT in keys
+    for field in ("status", "service"):
+        assert [(field, 1)] + LISTING_SORT in keys
+    assert len(keys) == len(INDEXES)
+
+    # Main-site listings never filter on tenant, so no main index carries it
+    assert not any(field == "tenant" for index in keys for field, _ in index)
+    asyncio.run(ensure_indexes(db.tenant_contact_submissions, TENANT_INDEXES))
+    tenant_keys = [keys for keys, _ in db.tenant_contact_submissions.indexes]
+    assert [("tenant", 1)] + LISTING_SORT in tenant_keys
+    assert [("tenant", 1), ("status", 1)] + LISTING_SORT in tenant_keys
+
+
+def test_fast_path_matches_model_serialization(client, db):
+    db.contact_submissions.docs[0]["submitted_at"] = BASE.replace(microsecond=123000)
+    rows = client.get("/api/contact-submissions", params={"limit": 500}).json()
+    by_id = {row["id"]: row for row in rows}
+    for doc in db.contact_submissions.docs:
+        assert by_id[doc["id"]] == server.ContactSubmission(**doc).model_dump(mode="json")
@@ -0,0 +1,178 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from idempotency import IdempotencyGuard, TTLCache
+from lead_stats import read_stats
+from live_feed import SubmissionBroker
+from rate_limit import RateLimitMiddleware, parse_limits
+from response_cache import ByteBudgetCache
+from search import InMemorySearchIndex
+from submissions import TENANT_INDEXES, ensure_indexes
+from tenants import TenantNotFound, TenantPortfolios, ensure_tenant_indexes
+from tests.fake_mongo import FakeDatabase
+
+FORM = {"name": "Asha", "email": "asha@example.com", "service": "Sound Healing", "message": "Hello"}
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def portfolio(name):
+    return {**server.portfolio_data, "hero": {**server.portfolio_data["hero"], "name": name}}
+
+
+def finds(db):
+    return sum(1 for operation in db.operations if operation == ("find", "tenant_portfolios"))
+
+
+def test_cache_evicts_least_recently_used_within_its_budget():
+    cache = ByteBudgetCache(100)
+    cache.put("a", "A", 40)
+    cache.put("b", "B", 40)
+    assert cache.get("a") == "A"
+    cache.put("c", "C", 40)
+    assert cache.get("b") is None
+    assert cache.bytes == 80 and len(cache) == 2
+    # Larger than the whole budget: served but never cached
+    cache.put("huge", "H", 101)
+    assert cache.peek("huge") is None and cache.bytes == 80
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 1, 1)
+    assert "cache_evictions_total 1" in list(cache.exposition())
+
+
+@pytest.fixture
+def store():
+    db = FakeDatabase()
+    asyncio.run(ensure_tenant_indexes(db.tenant_portfolios))
+    clock = Clock()
+    tenants = TenantPortfolios(db.tenant_portfolios, ByteBudgetCache(1024 * 1024), max_staleness=5, clock=clock)
+    asyncio.run(tenants.put("anna", portfolio("Anna")))
+    db.operations.clear()
+    return db, tenants, clock
+
+
+def test_fresh_portfolios_are_served_without_mongo(store):
+    db, tenants, clock = store
+    body = asyncio.run(tenants.get("anna"))
+    assert json.loads(body.body)["hero"]["name"] == "Anna"
+    assert asyncio.run(tenants.get("anna")) is body
+    assert db.operations == []
+
+
+def test_stale_entries_are_revalidated_by_version(store):
+    db, tenants, clock = store
+    body = asyncio.run(tenants.get("anna"))
+    clock.now = 5
+    assert asyncio.run(tenants.get("anna")) is body
+    assert finds(db) == 1
+
+    # Edited through another worker
+    db.tenant_portfolios.docs[0].update(content=portfolio("Anna B"), version=2)
+    clock.now = 10
+    assert json.loads(asyncio.run(tenants.get("anna")).body)["hero"]["name"] == "Anna B"
+
+
+def test_unknown_tenants_are_remembered(store):
+    db, tenants, clock = store
+    for _ in range(3):
+        with pytest.raises(TenantNotFound):
+            asyncio.run(tenants.get("nobody"))
+    assert finds(db) == 1
+
+
+def test_concurrent_misses_share_one_load(store):
+    db, tenants, clock = store
+    tenants.cache.pop("anna")
+
+    async def many():
+        return await asyncio.gather(*(tenants.get("anna") for _ in range(10)))
+
+    bodies = asyncio.run(many())
+    assert all(body is bodies[0] for body in bodies)
+    assert finds(db) == 1
+
+
+def test_wildcard_rate_limits_keep_a_bucket_per_path():
+    middleware = RateLimitMiddleware(None, parse_limits("POST /api/contact=1/minute; POST /api/*/contact=2/minute"))
+    assert middleware.limit_for("POST", "/api/contact") == (1 / 60, 1)
+    assert middleware.limit_for("POST", "/api/anna/contact") == (2 / 60, 2)
+    assert middleware.limit_for("POST", "/api/anna/b/contact") is None
+
+
+@pytest.fixture
+def client(monkeypatch):
+    db = FakeDatabase()
+    asyncio.run(ensure_indexes(db.contact_submissions))
+    asyncio.run(ensure_indexes(db.tenant_contact_submissions, TENANT_INDEXES))
+    tenants = TenantPortfolios(db.tenant_portfolios, ByteBudgetCache(1024 * 1024, name="tenant_portfolio_cache"))
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "tenant_portfolios", tenants)
+    monkeypatch.setattr(server, "contact_idempotency", IdempotencyGuard(TTLCache(max_entries=100, ttl=60)))
+    monkeypatch.setattr(server, "search_backend", InMemorySearchIndex())
+    monkeypatch.setattr(server, "notification_outbox", SimpleNamespace(wake=lambda: None))
+    monkeypatch.setattr(server, "submission_feed", SubmissionBroker(db.contact_submissions))
+    return TestClient(server.app)
+
+
+def test_tenant_portfolios_are_created_and_served(client):
+    assert client.get("/api/anna/portfolio").status_code == 404
+    response = client.put("/api/anna/portfolio", json=portfolio("Anna"), headers=ADMIN)
+    assert response.json() == {"success": True, "slug": "anna", "version": 1}
+    assert client.get("/api/anna/portfolio").json()["hero"]["name"] == "Anna"
+    # The main site is unaffected
+    assert client.get("/api/portfolio").json()["hero"]["name"] == "Gunjan Jagtiani"
+    assert "tenant_portfolio_cache_hits_total 1" in client.get("/metrics").text
+
+
+def test_reserved_and_malformed_slugs_are_refused(client):
+    for slug in ("contact", "Anna", "-anna"):
+        assert client.put(f"/api/{slug}/portfolio", json=portfolio("Anna"), headers=ADMIN).status_code == 400
+    assert client.put("/api/anna/portfolio", json={"hero": {}}, headers=ADMIN).status_code == 422
+
+
+def test_tenant_contact_submissions_are_kept_apart(client):
+    for slug in ("anna", "bela"):
+        client.put(f"/api/{slug}/portfolio", json=portfolio(slug), headers=ADMIN)
+    feed = server.submission_feed.subscribe()
+    assert client.post("/api/nobody/contact", json=FORM).status_code == 404
+
+    anna = client.post("/api/anna/contact", json=FORM).json()["id"]
+    # The same message to another tenant is not a retry of the first
+    bela = client.post("/api/bela/contact", json=FORM).json()["id"]
+    assert anna != bela
+    assert client.post("/api/anna/contact", json=FORM).headers["idempotent-replayed"] == "true"
+
+    assert client.get("/api/anna/contact-submissions").status_code == 401
+    listed = client.get("/api/anna/contact-submissions", headers=ADMIN).json()
+    assert [(row["id"], row["tenant"]) for row in listed] == [(anna, "anna")]
+    # Tenant submissions have a collection of their own
+    assert {doc["id"] for doc in server.db.tenant_contact_submissions.docs} == {anna, bela}
+    assert server.db.contact_submissions.docs == []
+
+    # Neither the live feed nor its poll for other workers' submissions sees them
+    asyncio.run(server.submission_feed.poll())
+    assert not feed._events
+
+    # The main site's listing, search and stats leave tenants out
+    main = client.post("/api/contact", json=FORM).json()["id"]
+    assert [row["id"] for row in client.get("/api/contact-submissions", headers=ADMIN).json()] == [main]
+    assert [row["id"] for row in client.get("/api/contact-submissions/search?q=hello", headers=ADMIN).json()] == [main]
+    assert client.get("/api/contact-submissions/stats", headers=ADMIN).json()["total"] == 1
+    assert asyncio.run(read_stats(server.db.lead_stats, tenant="anna"))["total"] == 1
+
+    # Only the main site's submission is queued for a notification
+    stored = server.db.contact_submissions.docs + server.db.tenant_contact_submissions.docs
+    assert {doc["id"] for doc in stored if "notification" in doc} == {main}
+    assert [event.id for event in feed._events] == [main]
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from idempotency import IdempotencyGuard, TTLCache
+from submissions import ensure_indexes
+from tests.fake_mongo import FakeDatabase
+
+FORM = {"name": "Asha", "email": "asha@example.com", "service": "Sound Healing", "message": "Hello"}
+
+
+def parse_server_timing(header):
+    timings = {}
+    for metric in header.split(", "):
+        name, *params = metric.split(";")
+        timings[name] = float(dict(param.split("=", 1) for param in params)["dur"])
+    return timings
+
+
+@pytest.fixture
+def client(monkeypatch):
+    db = FakeDatabase()
+    asyncio.run(ensure_indexes(db.contact_submissions))
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "contact_idempotency", IdempotencyGuard(TTLCache(max_entries=100, ttl=60)))
+    return TestClient(server.app)
+
+
+def test_contact_post_reports_every_phase(client):
+    response = client.post("/api/contact", json=FORM)
+    assert response.status_code == 200
+    timings = parse_server_timing(response.headers["server-timing"])
+    assert list(timings) == ["body", "validate", "handler", "db", "serialize", "total"]
+    assert timings["db"] <= timings["handler"]
+    assert timings["body"] + timings["validate"] + timings["handler"] + timings["serialize"] <= timings["total"] + 0.05
+
+
+def test_validation_failures_are_timed(client):
+    response = client.post("/api/contact", json={**FORM, "email": "not-an-email"})
+    assert response.status_code == 422
+    timings = parse_server_timing(response.headers["server-timing"])
+    assert "handler" not in timings and "total" in timings
+
+
+def test_timings_are_logged(client, caplog):
+    with caplog.at_level(logging.INFO, logger="tracing"):
+        client.get("/api/")
+    record = caplog.records[-1]
+    assert record.getMessage().startswith("GET /api/ 200 ")
+    assert set(record.timings) == {"validate", "handler", "serialize", "total"}
+
+
+def test_admin_can_profile_a_request(client, monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    response = client.post("/api/contact", json=FORM, headers={"X-Profile": "1", "X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/plain; charset=utf-8"
+    assert "server-timing" in response.headers
+    for line in response.text.splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert stack and int(count) > 0
+    # The submission was still stored
+    assert len(server.db.contact_submissions.docs) == 1
+
+
+def test_profile_header_needs_the_admin_token(client, monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    response = client.get("/api/", headers={"X-Profile": "1", "X-Admin-Token": "wrong"})
+    assert response.json() == {"message": "Gunjan Jagtiani Wellness Portfolio API"}
+    monkeypatch.delenv("ADMIN_TOKEN")
+    response = client.get("/api/", headers={"X-Profile": "1", "X-Admin-Token": ""})
+    assert response.json() == {"message": "Gunjan Jagtiani Wellness Portfolio API"}